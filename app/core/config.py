@@ -19,6 +19,50 @@ class Settings(BaseSettings):
     ENV: str = "dev"
     DEBUG: bool = True
 
+    EXERCISE_REP_BATCH_MAX_ITEMS: int = 1000  # Reps accepted by one /exercise/session/{id}/data/batch request
+    EXERCISE_REP_WRITE_BEHIND: bool = False  # Acknowledge reps once in a local write-ahead log and insert them in bulk
+    EXERCISE_REP_LOG_DIR: str = "data/rep_log"  # Write-ahead log directory, on a durable local disk
+    EXERCISE_REP_MAX_LAG: float = 1.0  # Target seconds between acknowledging a rep and committing it
+    EXERCISE_REP_FLUSH_ROWS: int = 500  # Pending reps that trigger a bulk insert before EXERCISE_REP_MAX_LAG
+    EXERCISE_REP_MAX_PENDING: int = 100000  # Pending reps before new ones are refused with 503
+
+    POSE_POOL_SIZE: int = 2
+    POSE_POOL_MAX_USES: int = 1000
+    POSE_POOL_CHECKOUT_TIMEOUT: float = 5.0  # Seconds a request waits for a free detector before a 503
+    POSE_BATCH_MAX_FRAMES: int = 32
+    POSE_DECODE_THREADS: int = 4
+    POSE_STREAM_MAX_SESSIONS: int = 16
+    POSE_STREAM_ROI_TRACKING: bool = True  # Crop stream frames around the previous pose
+    POSE_BACKEND: str = "mediapipe"  # Pose inference engine: mediapipe or onnx
+    POSE_ONNX_MODELS: str = ""  # ONNX model path, or complexity=path pairs, e.g. "0=pose_int8.onnx,1=pose.onnx"
+    POSE_ONNX_FORMAT: str = "movenet"  # ONNX model output layout; only movenet has a full-frame person stage
+    POSE_ONNX_THREADS: int = 1  # ONNX Runtime intra-op threads per detector
+    POSE_STREAM_SMOOTHING: bool = True  # One Euro filter stream landmarks and bridge short detection gaps
+    POSE_SMOOTHING_MIN_CUTOFF: float = 1.0  # Hz at rest; lower removes more jitter
+    POSE_SMOOTHING_BETA: float = 10.0  # Cutoff increase with speed; higher reduces lag on fast movement
+    POSE_INFERENCE_WORKERS: int = 0  # Inference processes; 0 runs inference on POSE_POOL_SIZE threads
+    POSE_INFERENCE_MAX_PENDING: int = 32
+    POSE_INFERENCE_DEADLINE: float = 2.0
+    POSE_FRAME_RING_SLOTS: int = 16  # Shared-memory frame slots for inference processes; 0 pickles frames
+    POSE_FRAME_RING_MAX_HEIGHT: int = 720
+    POSE_FRAME_RING_MAX_WIDTH: int = 1280
+    POSE_MICROBATCH_WINDOW_MS: float = 0.0  # Collect process_frame requests into batches; 0 disables
+    POSE_MICROBATCH_MAX_SIZE: int = 8
+    POSE_ADAPTIVE_QUALITY: bool = False  # Trade model complexity and resolution for latency under load
+    POSE_TARGET_LATENCY_MS: float = 80.0
+    POSE_MOTION_THRESHOLD: float = 2.0  # Mean grayscale difference below which frames reuse landmarks; 0 disables
+    POSE_MOTION_MAX_SKIP: int = 5  # Force inference after this many skipped frames
+    POSE_MOTION_MAX_SESSIONS: int = 256  # process_frame sessions whose motion gate is kept
+    POSE_DEDUP_CACHE_SIZE: int = 256  # Results cached by frame hash for retried requests; 0 disables
+    POSE_ANALYZER_MAX_SESSIONS: int = 4096  # Live server-side rep detectors before the least recent is snapshotted
+    POSE_ANALYZER_IDLE_TIMEOUT: float = 120.0  # Seconds without landmarks before a session's detector is snapshotted
+    POSE_ANALYZER_SNAPSHOT_TTL: float = 86400.0  # Seconds a snapshot of an abandoned session is kept
+    POSE_ANALYZER_MAX_FRAMES: int = 600  # Landmark frames per request (20 s at 30 fps)
+    POSE_SESSION_STORE: str = "memory"  # Rep detector state: memory (per worker), shared_memory (one host) or redis
+    POSE_SESSION_STORE_URL: str = "redis://127.0.0.1:6379/0"  # Redis-protocol server of the redis store
+    POSE_SESSION_STORE_NAME: str = "fittrack-sessions"  # Shared memory block of the shared_memory store
+    POSE_SESSION_STORE_SLOTS: int = 65536  # Sessions the shared_memory store holds
+
     class Config:
         env_file = ".env.development"
         extra = "ignore"
@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -7,6 +8,7 @@ from app.models.user import User
 from sqlalchemy.orm import Session
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     credentials_exception = HTTPException(
@@ -25,3 +27,17 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if user is None:
         raise credentials_exception
     return user
+
+def get_token_user_id(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[int]:
+    """Id of the user a valid bearer token was issued to, or None without one.
+
+    Only checks the token signature, without the database lookup of
+    get_current_user, for per-frame endpoints that merely scope state by user.
+    """
+    if token is None:
+        return None
+    try:
+        user_id = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+        return int(user_id) if user_id is not None else None
+    except (JWTError, ValueError):
+        return None
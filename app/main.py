@@ -1,10 +1,19 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.routes import auth, pose_routes
 from app.routes import exercise_routes
 from app.routes import progress_routes
 from app.routes import upload_routes      
 
-app = FastAPI(title="FitTrack API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pose_routes.startup()
+    exercise_routes.startup()
+    yield
+    exercise_routes.shutdown()
+    pose_routes.shutdown()
+
+app = FastAPI(title="FitTrack API", lifespan=lifespan)
 
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(exercise_routes.router)
@@ -10,7 +10,7 @@ class ExerciseSession(Base):
     exercise_name = Column(String(50))
     start_time = Column(DateTime, default=datetime.utcnow)
     end_time = Column(DateTime)
-    total_reps = Column(Integer, default=0)
+    total_reps = Column(Integer)  # Counted from streamed landmarks, else taken from /end; NULL before either
     avg_score = Column(Float, default=0.0)
 
     reps = relationship("RepRecord", back_populates="session")
@@ -24,5 +24,10 @@ class RepRecord(Base):
     correctness = Column(Float)
     feedback = Column(String(255))
     landmarks = Column(JSON)
+    # Set only by the write-behind log, which needs the column to dedupe replays; unmapped, so the ORM never
+    # reads or writes it and databases without it keep working (see ExerciseRepository.has_record_ids)
+    record_id = Column(String(32), unique=True)
 
     session = relationship("ExerciseSession", back_populates="reps")
+
+    __mapper_args__ = {"exclude_properties": ["record_id"]}
@@ -0,0 +1,175 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.pose.pose_backends import MediaPipeBackend
+from app.pose.pose_detector import PoseDetector
+
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no detector becomes available within the checkout timeout."""
+
+
+def static_detector() -> PoseDetector:
+    """Detector for pools: checkouts come from unrelated clients, so no tracking state may carry over."""
+    return PoseDetector(backend=MediaPipeBackend(static_image_mode=True))
+
+
+class _PooledDetector:
+    def __init__(self, detector: PoseDetector):
+        self.detector = detector
+        self.uses = 0
+
+
+class DetectorPool:
+    def __init__(self, size: int = 2, max_uses: int = 1000,
+                 factory: Optional[Callable[[], PoseDetector]] = None):
+        """Initialize a pool of reusable PoseDetector instances.
+
+        Args:
+            size: Maximum number of detectors alive at the same time
+            max_uses: Number of checkouts after which a detector is released and recreated
+            factory: Callable creating a new detector (defaults to `static_detector`); pooled detectors
+                serve unrelated clients, so they should not track poses across frames
+        """
+        self.size = size
+        self.max_uses = max_uses
+        self.factory = factory or static_detector
+
+        self._idle: List[_PooledDetector] = []  # Most recently returned last
+        self._lock = threading.Lock()
+        # Signalled when a detector is returned or a slot frees up for a replacement
+        self._available = threading.Condition(self._lock)
+        self._created = 0
+        self._in_use = 0
+
+        # Metrics
+        self._checkouts = 0
+        self._recycled = 0
+        self._errors = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def warm(self):
+        """Create detectors up to the pool size so requests never pay model load."""
+        with self._lock:
+            missing = max(self.size - self._created, 0)
+            self._created += missing
+        blank = np.zeros((256, 256, 3), dtype=np.uint8)
+        for created in range(missing):
+            try:
+                detector = self.factory()
+            except Exception:
+                self._free_slots(missing - created)
+                raise
+            try:
+                # The first process() call initialises the inference graph
+                detector.detect_landmarks(blank)
+            except Exception:
+                detector.release()
+                self._free_slots(missing - created)
+                raise
+            with self._available:
+                self._idle.append(_PooledDetector(detector))
+                self._available.notify()
+
+    def _free_slots(self, count: int):
+        with self._available:
+            self._created -= count
+            self._available.notify(count)
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator[PoseDetector]:
+        """Borrow a detector for the duration of the context.
+
+        Detectors that raise while checked out are discarded, as are detectors
+        that reached `max_uses`; a replacement is created on the next checkout.
+
+        Args:
+            timeout: Maximum seconds to wait for a free detector (None waits forever)
+
+        Raises:
+            PoolExhaustedError: If no detector became available within the timeout
+        """
+        start = time.perf_counter()
+        entry = self._acquire(timeout)
+        waited = time.perf_counter() - start
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        failed = False
+        try:
+            yield entry.detector
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._release(entry, failed)
+
+    def _acquire(self, timeout: Optional[float]) -> _PooledDetector:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolExhaustedError(f"No pose detector available after {timeout}s")
+                self._available.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        try:
+            return _PooledDetector(self.factory())
+        except Exception:
+            self._free_slots(1)
+            raise
+
+    def _release(self, entry: _PooledDetector, failed: bool):
+        entry.uses += 1
+        recycle = failed or entry.uses >= self.max_uses
+
+        with self._available:
+            self._in_use -= 1
+            if failed:
+                self._errors += 1
+            if recycle:
+                # Frees a slot: a waiter creates the replacement instead of waiting out its timeout
+                self._created -= 1
+                self._recycled += 1
+            else:
+                self._idle.append(entry)
+            self._available.notify()
+
+        if recycle:
+            entry.detector.release()
+
+    def stats(self) -> Dict:
+        """Return pool size, utilisation and checkout wait-time metrics."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'recycled': self._recycled,
+                'errors': self._errors,
+                'wait_ms_avg': (self._wait_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                'wait_ms_max': self._wait_max * 1000,
+            }
+
+    def close(self):
+        """Release every idle detector held by the pool."""
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._available.notify(len(idle))
+        for entry in idle:
+            entry.detector.release()
@@ -1,12 +1,22 @@
 # exercise_app.py
+import argparse
 import cv2
 import mediapipe as mp
 import numpy as np
-from exercise_detector import ExerciseDetector, EXERCISES
+from app.pose.exercise_detector import ExerciseDetector, EXERCISES
+from app.pose.landmark_buffer import LandmarkBuffer
+from app.pose.pipeline import FramePipeline, format_stats, open_capture, source_fps
 
 class ExerciseApp:
-    def __init__(self, exercise_name='squat'):
-        """Initialize the exercise application."""
+    def __init__(self, exercise_name='squat', source=0, headless=False, pace=True):
+        """Initialize the exercise application.
+        
+        Args:
+            exercise_name: Exercise to count and give feedback on
+            source: Camera index or video file path
+            headless: Run without a window, e.g. to benchmark the pipeline on a recorded clip
+            pace: Read video files at their recorded frame rate, like a camera
+        """
         self.exercise_name = exercise_name
         self.detector = ExerciseDetector(exercise_name)
         self.mp_pose = mp.solutions.pose
@@ -15,42 +25,56 @@ class ExerciseApp:
             min_tracking_confidence=0.7
         )
         self.mp_draw = mp.solutions.drawing_utils
-        self.cap = cv2.VideoCapture(0)
+        self.landmark_buffer = LandmarkBuffer()
+        self.cap = open_capture(source)
         
         # Set up display window
         self.window_name = f"Exercise: {exercise_name.capitalize()}"
-        cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+        if not headless:
+            cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
         
-    def run(self):
-        """Run the main application loop."""
-        while self.cap.isOpened():
-            success, frame = self.cap.read()
-            if not success:
-                break
-                
-            # Flip the frame for mirror effect
-            frame = cv2.flip(frame, 1)
-            
-            # Process the frame with MediaPipe
-            results = self.process_frame(frame)
+        # Capture, inference and rendering run concurrently and drop stale frames
+        self.pipeline = FramePipeline(
+            self.cap, self.infer, self.render,
+            show=None if headless else (lambda image: cv2.imshow(self.window_name, image)),
+            pace_fps=source_fps(self.cap) if pace and isinstance(source, str) else None
+        )
+        
+    def run(self, max_frames=None):
+        """Run the main application loop until the source ends or 'q' is pressed.
+        
+        Returns:
+            Per-stage pipeline statistics
+        """
+        try:
+            return self.pipeline.run(max_frames)
+        finally:
+            self.cleanup()
             
-            # If pose is detected, analyze it
-            if results.pose_landmarks:
-                landmarks = self.get_landmarks(results)
-                analysis = self.detector.analyze_pose(landmarks)
-                
-                # Draw landmarks and feedback
-                self.draw_landmarks(frame, results)
-                self.draw_feedback(frame, analysis)
-                
-            # Display the frame
-            cv2.imshow(self.window_name, frame)
+    def infer(self, frame):
+        """Detect the pose and update the rep count (inference thread).
+        
+        Analysis runs here rather than in the render stage so that every
+        inferred frame counts toward reps, even those the renderer drops.
+        """
+        results = self.process_frame(frame)
+        if not results.pose_landmarks:
+            return None
+        landmarks = self.get_landmarks(results)
+        return results.pose_landmarks, self.detector.analyze_pose(landmarks)
+        
+    def render(self, frame, result):
+        """Draw landmarks, feedback and stage FPS onto a frame (render thread)."""
+        # If pose is detected, draw it
+        if result is not None:
+            pose_landmarks, analysis = result
+            self.draw_landmarks(frame, pose_landmarks)
+            self.draw_feedback(frame, analysis)
             
-            # Exit on 'q' key
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-                
-        self.cleanup()
+        cv2.putText(frame, self.pipeline.describe(),
+                   (20, frame.shape[0] - 20),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        return frame
         
     def process_frame(self, frame):
         """Process a frame with MediaPipe Pose."""
@@ -59,15 +83,14 @@ class ExerciseApp:
         return self.pose.process(frame_rgb)
         
     def get_landmarks(self, results):
-        """Extract landmarks in a numpy array format."""
-        landmarks = results.pose_landmarks.landmark
-        return np.array([[lm.x, lm.y, lm.visibility] for lm in landmarks])
+        """Extract landmarks into a reused (33, 4) float32 buffer slot (x, y, visibility, z)."""
+        return self.landmark_buffer.fill(results.pose_landmarks)
         
-    def draw_landmarks(self, frame, results):
+    def draw_landmarks(self, frame, pose_landmarks):
         """Draw pose landmarks on the frame."""
         self.mp_draw.draw_landmarks(
             frame,
-            results.pose_landmarks,
+            pose_landmarks,
             self.mp_pose.POSE_CONNECTIONS,
             landmark_drawing_spec=mp.solutions.drawing_styles.get_default_pose_landmarks_style()
         )
@@ -87,7 +110,9 @@ class ExerciseApp:
         
     def cleanup(self):
         """Release resources."""
+        self.pipeline.stop()
         self.cap.release()
+        self.pose.close()
         cv2.destroyAllWindows()
 
 def show_exercise_menu():
@@ -106,11 +131,20 @@ def show_exercise_menu():
             print("Please enter a valid number.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exercise rep counting and form feedback")
+    parser.add_argument('--exercise', choices=list(EXERCISES.keys()), help="Skip the exercise menu")
+    parser.add_argument('--video', help="Read this video file instead of the camera")
+    parser.add_argument('--headless', action='store_true', help="Run without a window and print stage FPS")
+    parser.add_argument('--no-pace', action='store_true', help="Read video files as fast as possible")
+    parser.add_argument('--max-frames', type=int)
+    args = parser.parse_args()
+    
     # Select exercise
-    exercise_name = show_exercise_menu()
+    exercise_name = args.exercise or show_exercise_menu()
     
     # Start the application
-    app = ExerciseApp(exercise_name)
+    app = ExerciseApp(exercise_name, args.video if args.video else 0, args.headless, not args.no_pace)
     print(f"\nStarting {exercise_name} detection...")
-    print("Press 'q' to quit")
-    app.run()
\ No newline at end of file
+    if not args.headless:
+        print("Press 'q' to quit")
+    print(format_stats(app.run(args.max_frames)))
@@ -1,169 +1,86 @@
 # exercise_detector.py
 import numpy as np
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
-import math
+from typing import Dict, List, Sequence, Tuple
+from app.pose.exercise_rules import EXERCISE_RULES
+from app.pose.exercises import EXERCISES
+from app.pose.joint_angles import AngleTable, joint_angles
 
-@dataclass
-class ExerciseConfig:
-    name: str
-    key_points: List[int]  # Indices of key body points
-    angle_ranges: Dict[str, Tuple[float, float]]  # Expected angle ranges
-    feedback_messages: Dict[str, str]  # Feedback for common mistakes
+# Single triple used by calculate_angle
+_POINT_TRIPLE = AngleTable({'angle': (0, 1, 2)})
 
-# Define exercise configurations
-EXERCISES = {
-    'squat': ExerciseConfig(
-        name='Squat',
-        key_points=[23, 24, 25, 26],  # Hips and knees
-        angle_ranges={
-            'knee': (80, 100),  # Knee angle at bottom
-            'hip': (160, 190)    # Hip angle
-        },
-        feedback_messages={
-            'knee': 'Keep your knees behind your toes',
-            'hip': 'Keep your back straight'
-        }
-    ),
-    'pushup': ExerciseConfig(
-        name='Push-up',
-        key_points=[11, 12, 13, 14, 15, 16],  # Shoulders, elbows, wrists
-        angle_ranges={
-            'elbow': (75, 90),  # Elbow angle at bottom
-        },
-        feedback_messages={
-            'elbow': 'Lower your body until elbows are at 90 degrees',
-            'back': 'Keep your body straight'
-        }
-    ),
-    'lunge': ExerciseConfig(
-        name='Lunge',
-        key_points=[23, 24, 25, 26, 27, 28],  # Hips, knees, ankles
-        angle_ranges={
-            'front_knee': (80, 100),  # Front knee angle
-            'back_knee': (80, 100)    # Back knee angle
-        },
-        feedback_messages={
-            'front_knee': 'Keep front knee above ankle',
-            'back_knee': 'Lower back knee toward floor'
-        }
-    ),
-    'shoulder_press': ExerciseConfig(
-        name='Shoulder Press',
-        key_points=[11, 12, 13, 14, 15, 16],  # Shoulders, elbows, wrists
-        angle_ranges={
-            'shoulder': (160, 180),  # Shoulder angle at top
-            'elbow': (160, 180)      # Elbow angle at top
-        },
-        feedback_messages={
-            'shoulder': 'Fully extend arms overhead',
-            'elbow': 'Keep elbows from flaring out'
-        }
-    ),
-    'bicep_curl': ExerciseConfig(
-        name='Bicep Curl',
-        key_points=[11, 12, 13, 14, 15, 16],  # Shoulders, elbows, wrists
-        angle_ranges={
-            'elbow': (30, 50),  # Elbow angle at top
-        },
-        feedback_messages={
-            'elbow': 'Keep elbows close to your body',
-            'shoulder': 'Keep shoulders still'
-        }
-    )
-}
+# (exercise name, rep count, phase, feedback) as returned by ExerciseDetector.snapshot
+DetectorState = Tuple[str, int, str, Tuple[str, ...]]
 
 class ExerciseDetector:
+    # Servers keep one detector per live session; slots keep each one small
+    __slots__ = ('exercise_name', 'exercise', 'exercise_index', 'rep_count', 'current_phase', 'feedback')
+
     def __init__(self, exercise_name: str):
         """Initialize with a specific exercise."""
-        self.exercise = EXERCISES.get(exercise_name.lower())
+        self.exercise_name = exercise_name.lower()
+        self.exercise = EXERCISES.get(self.exercise_name)
         if not self.exercise:
             raise ValueError(f"Exercise '{exercise_name}' not found")
+        self.exercise_index = EXERCISE_RULES.index(self.exercise_name)
         
         self.rep_count = 0
         self.current_phase = 'up'  # 'up' or 'down'
         self.feedback = []
 
+    def snapshot(self) -> DetectorState:
+        """Return the detector's rep state as an immutable tuple."""
+        return self.exercise_name, self.rep_count, self.current_phase, tuple(self.feedback)
+
+    @classmethod
+    def restore(cls, state: DetectorState) -> "ExerciseDetector":
+        """Create a detector that continues from a `snapshot`."""
+        exercise_name, rep_count, current_phase, feedback = state
+        detector = cls(exercise_name)
+        detector.rep_count = rep_count
+        detector.current_phase = current_phase
+        detector.feedback = list(feedback)
+        return detector
+
     def calculate_angle(self, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> float:
         """Calculate the angle between three points."""
-        ba = a - b
-        bc = c - b
-        cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
-        return np.degrees(np.arccos(np.clip(cosine_angle, -1.0, 1.0)))
+        points = np.stack([a, b, c])
+        return joint_angles(points, _POINT_TRIPLE, dims=points.shape[1])[0]
 
     def analyze_pose(self, landmarks: np.ndarray) -> Dict:
         """Analyze the current pose and provide feedback."""
         if landmarks is None or len(landmarks) < 33:
             return {'feedback': ['No pose detected'], 'rep_count': self.rep_count}
-
-        self.feedback = []
-        results = {}
-        
-        # Exercise-specific analysis
-        if self.exercise.name == 'Squat':
-            self._analyze_squat(landmarks)
-        elif self.exercise.name == 'Push-up':
-            self._analyze_pushup(landmarks)
-        # Add other exercise analyses...
-
-        results['feedback'] = self.feedback
-        results['rep_count'] = self.rep_count
-        return results
-
-    def _analyze_squat(self, landmarks: np.ndarray):
-        """Specific analysis for squats."""
-        # Get key points
-        left_hip = landmarks[23][:2]
-        right_hip = landmarks[24][:2]
-        left_knee = landmarks[25][:2]
-        right_knee = landmarks[26][:2]
-        left_ankle = landmarks[27][:2]
-        right_ankle = landmarks[28][:2]
-
-        # Calculate knee angles
-        left_knee_angle = self.calculate_angle(left_hip, left_knee, left_ankle)
-        right_knee_angle = self.calculate_angle(right_hip, right_knee, right_ankle)
-        avg_knee_angle = (left_knee_angle + right_knee_angle) / 2
-
-        # Check form
-        if avg_knee_angle < 80:
-            self.feedback.append(self.exercise.feedback_messages['knee'])
-        if avg_knee_angle > 100:
-            self.feedback.append('Stand up straight')
-
-        # Count reps
-        if avg_knee_angle < 90 and self.current_phase == 'up':
-            self.current_phase = 'down'
-        elif avg_knee_angle > 160 and self.current_phase == 'down':
-            self.current_phase = 'up'
-            self.rep_count += 1
-
-    def _analyze_pushup(self, landmarks: np.ndarray):
-        """Specific analysis for push-ups."""
-        left_shoulder = landmarks[11][:2]
-        right_shoulder = landmarks[12][:2]
-        left_elbow = landmarks[13][:2]
-        right_elbow = landmarks[14][:2]
-        left_wrist = landmarks[15][:2]
-        right_wrist = landmarks[16][:2]
-
-        # Calculate elbow angles
-        left_elbow_angle = self.calculate_angle(left_shoulder, left_elbow, left_wrist)
-        right_elbow_angle = self.calculate_angle(right_shoulder, right_elbow, right_wrist)
-        avg_elbow_angle = (left_elbow_angle + right_elbow_angle) / 2
-
-        # Check form
-        if avg_elbow_angle > 100:
-            self.feedback.append('Lower your body more')
-        elif avg_elbow_angle < 80:
-            self.feedback.append('Push up higher')
-
-        # Count reps
-        if avg_elbow_angle > 90 and self.current_phase == 'up':
-            self.current_phase = 'down'
-        elif avg_elbow_angle < 80 and self.current_phase == 'down':
-            self.current_phase = 'up'
-            self.rep_count += 1
+        return analyze_sessions([self], [np.asarray(landmarks)[None]])[0]
+
+def analyze_sessions(detectors: Sequence[ExerciseDetector], frames: Sequence[np.ndarray]) -> List[Dict]:
+    """Analyze frames of many sessions, each with its own detector, in one batched evaluation.
+
+    Args:
+        detectors: One ExerciseDetector per session; rep counts and phases are updated in place
+        frames: Per session, landmarks of shape (T, 33, C) in time order
+
+    Returns:
+        Per session, the analysis of its last frame ({'feedback', 'rep_count'})
+    """
+    if not detectors:
+        return []
+    counts = [len(session_frames) for session_frames in frames]
+    landmarks = np.concatenate([np.asarray(session_frames).reshape(-1, 33, np.shape(session_frames)[-1])
+                                for session_frames in frames])
+    exercises = np.repeat([detector.exercise_index for detector in detectors], counts)
+    sessions = np.repeat(np.arange(len(detectors)), counts)
+    initial_down = np.array([detector.current_phase == 'down' for detector in detectors], dtype=bool)
+    evaluation = EXERCISE_RULES.evaluate(landmarks, exercises, sessions, initial_down)
+
+    results = []
+    last_frames = np.cumsum(counts) - 1
+    for session, detector in enumerate(detectors):
+        detector.rep_count += int(evaluation.reps[session])
+        detector.current_phase = 'down' if evaluation.final_down[session] else 'up'
+        if counts[session]:
+            detector.feedback = evaluation.feedback(last_frames[session])
+        results.append({'feedback': detector.feedback, 'rep_count': detector.rep_count})
+    return results
 
 # Example usage:
 if __name__ == "__main__":
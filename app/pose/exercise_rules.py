@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+from typing import List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.pose.exercises import EXERCISES, ExerciseConfig
+from app.pose.joint_angles import BODY_JOINTS, AngleTable, joint_angles
+
+_PHASES = {None: -1, 'up': 0, 'down': 1}
+
+
+@dataclass
+class RuleEvaluation:
+    """Per-frame results of ExerciseRules.evaluate, in input frame order."""
+    angles: np.ndarray  # (N, A) joint angles in degrees
+    rep_angle: np.ndarray  # (N,) angle driving the rep phase
+    down: np.ndarray  # (N,) rep phase after each frame, True for 'down'
+    rep_completed: np.ndarray  # (N,) whether the frame completed a rep
+    violations: np.ndarray  # (N, R) feedback index per rule, -1 where the rule passed
+    sessions: np.ndarray  # (N,) session index of each frame
+    final_down: np.ndarray  # (S,) rep phase of each session after its last frame
+    reps: np.ndarray  # (S,) reps completed per session
+    messages: List[str]
+
+    def feedback(self, frame: int) -> List[str]:
+        """Return the feedback messages of one frame, without duplicates."""
+        found = self.violations[frame]
+        return list(dict.fromkeys(self.messages[i] for i in found[found >= 0]))
+
+
+class ExerciseRules:
+    def __init__(self, exercises: Mapping[str, ExerciseConfig] = EXERCISES,
+                 joints: Mapping[str, Tuple[int, int, int]] = BODY_JOINTS):
+        """Compile exercise configurations into threshold tables for batched evaluation.
+
+        Every exercise is described by data only: the angles averaged into
+        its rep angle, the rep hysteresis range and its form rules. Averaged
+        angles become rows of weight matrices over the joint angle table, so
+        one matrix product evaluates every exercise on every frame.
+
+        Args:
+            exercises: Exercise configurations keyed by name
+            joints: Named joint triples the configurations refer to
+        """
+        self.names = list(exercises)
+        self.angle_table = AngleTable(joints)
+        self.messages: List[str] = []
+        message_index = {}
+
+        def weights(angles: Tuple[str, ...]) -> np.ndarray:
+            row = np.zeros(len(self.angle_table))
+            for name in angles:
+                row[self.angle_table.index(name)] += 1.0 / len(angles)
+            return row
+
+        def feedback(config: ExerciseConfig, code: Optional[str]) -> int:
+            if code is None:
+                return -1
+            message = config.feedback_messages.get(code, code)
+            if message not in message_index:
+                message_index[message] = len(self.messages)
+                self.messages.append(message)
+            return message_index[message]
+
+        rep_weights, rep_low, rep_high = [], [], []
+        rule_weights, rule_low, rule_high, rule_exercise, rule_phase, low_feedback, high_feedback = [], [], [], [], [], [], []
+        for index, name in enumerate(self.names):
+            config = exercises[name]
+            low, high = config.rep_range
+            if low >= high:
+                raise ValueError(f"Exercise '{name}' rep_range must be increasing, got {config.rep_range}")
+            rep_weights.append(weights(config.rep_angles))
+            rep_low.append(low)
+            rep_high.append(high)
+            for rule in config.form_rules:
+                rule_weights.append(weights(rule.angles))
+                rule_low.append(-np.inf if rule.low is None else rule.low)
+                rule_high.append(np.inf if rule.high is None else rule.high)
+                rule_exercise.append(index)
+                rule_phase.append(_PHASES[rule.phase])
+                low_feedback.append(feedback(config, rule.too_low))
+                high_feedback.append(feedback(config, rule.too_high))
+
+        self.rep_weights = np.array(rep_weights).reshape(len(self.names), len(self.angle_table))
+        self.rep_low = np.array(rep_low)
+        self.rep_high = np.array(rep_high)
+        self.rule_weights = np.array(rule_weights).reshape(-1, len(self.angle_table))
+        self.rule_low = np.array(rule_low)
+        self.rule_high = np.array(rule_high)
+        self.rule_exercise = np.array(rule_exercise, dtype=np.intp)
+        self.rule_phase = np.array(rule_phase, dtype=np.int8)
+        self.low_feedback = np.array(low_feedback, dtype=np.intp)
+        self.high_feedback = np.array(high_feedback, dtype=np.intp)
+
+    def index(self, exercise_name: str) -> int:
+        """Return the compiled index of an exercise."""
+        return self.names.index(exercise_name.lower())
+
+    def evaluate(self, landmarks: np.ndarray, exercises: np.ndarray,
+                 sessions: Optional[np.ndarray] = None, initial_down: Optional[np.ndarray] = None) -> RuleEvaluation:
+        """Evaluate frames of any number of sessions and exercises in one pass.
+
+        Frames of one session must be in time order; sessions may interleave.
+
+        Args:
+            landmarks: Landmarks of shape (N, 33, C)
+            exercises: (N,) compiled exercise index of every frame
+            sessions: (N,) session index of every frame in 0..S-1 (None puts all frames in one session)
+            initial_down: (S,) rep phase of every session before its first frame (None starts all 'up')
+
+        Returns:
+            RuleEvaluation with per-frame and per-session results
+        """
+        exercises = np.asarray(exercises, dtype=np.intp)
+        frames = len(exercises)
+        sessions = np.zeros(frames, dtype=np.intp) if sessions is None else np.asarray(sessions, dtype=np.intp)
+        session_count = len(initial_down) if initial_down is not None else (int(sessions.max()) + 1 if frames else 0)
+        initial_down = np.zeros(session_count, dtype=bool) if initial_down is None else np.asarray(initial_down, dtype=bool)
+
+        angles = joint_angles(landmarks, self.angle_table).reshape(frames, len(self.angle_table))
+        rep_angle = np.einsum('na,na->n', angles, self.rep_weights[exercises])
+
+        # Hysteresis: below the range enters 'down', above it returns 'up'. The phase after a
+        # frame is set by the latest such event in its session, found with a running maximum
+        # over session-ordered frames.
+        order = np.argsort(sessions, kind='stable')
+        ordered_sessions = sessions[order]
+        ordered_angle = rep_angle[order]
+        ordered_exercises = exercises[order]
+        enter = ordered_angle < self.rep_low[ordered_exercises]
+        leave = ordered_angle > self.rep_high[ordered_exercises]
+        position = np.arange(frames)
+        starts = np.ones(frames, dtype=bool)
+        starts[1:] = ordered_sessions[1:] != ordered_sessions[:-1]
+        session_start = np.maximum.accumulate(np.where(starts, position, 0)) if frames else position
+        last_event = np.maximum.accumulate(np.where(enter | leave, position, -1)) if frames else position
+        has_event = last_event >= session_start
+        ordered_down = np.where(has_event, enter[np.maximum(last_event, 0)], initial_down[ordered_sessions])
+        before = np.empty(frames, dtype=bool)
+        before[starts] = initial_down[ordered_sessions[starts]]
+        before[~starts] = ordered_down[:-1][~starts[1:]] if frames else before[~starts]
+        ordered_completed = before & leave
+
+        down = np.empty(frames, dtype=bool)
+        down[order] = ordered_down
+        rep_completed = np.empty(frames, dtype=bool)
+        rep_completed[order] = ordered_completed
+
+        final_down = initial_down.copy()
+        ends = np.ones(frames, dtype=bool)
+        ends[:-1] = starts[1:]
+        final_down[ordered_sessions[ends]] = ordered_down[ends]
+        reps = np.bincount(sessions[rep_completed], minlength=session_count)
+
+        # Form rules of every exercise are evaluated together and masked to the frame's exercise
+        values = angles @ self.rule_weights.T
+        applies = self.rule_exercise[None, :] == exercises[:, None]
+        applies &= (self.rule_phase[None, :] < 0) | (self.rule_phase[None, :] == down[:, None])
+        violations = np.full(values.shape, -1, dtype=np.intp)
+        too_low = applies & (values < self.rule_low) & (self.low_feedback >= 0)
+        too_high = applies & (values > self.rule_high) & (self.high_feedback >= 0)
+        violations[too_low] = np.broadcast_to(self.low_feedback, values.shape)[too_low]
+        violations[too_high] = np.broadcast_to(self.high_feedback, values.shape)[too_high]
+
+        return RuleEvaluation(angles, rep_angle, down, rep_completed, violations, sessions,
+                              final_down, reps, self.messages)
+
+
+# Registry compiled once at import
+EXERCISE_RULES = ExerciseRules()
@@ -1,15 +1,24 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional
-import numpy as np
+
+@dataclass(frozen=True)
+class FormRule:
+    angles: Tuple[str, ...]  # BODY_JOINTS angle names, averaged
+    low: Optional[float]  # Angles below this trigger too_low (None disables)
+    high: Optional[float]  # Angles above this trigger too_high (None disables)
+    too_low: Optional[str] = None  # Feedback code when below low
+    too_high: Optional[str] = None  # Feedback code when above high
+    phase: Optional[str] = None  # Only check in this rep phase ('up' or 'down'); None checks every frame
 
 @dataclass
 class ExerciseConfig:
     name: str
     description: str
     key_points: List[int]  # Indices of key body points used for this exercise
-    angle_thresholds: Dict[str, Tuple[float, float]]  # Joint angle ranges for correct form
-    feedback_messages: Dict[str, str]  # Feedback messages for common form errors
-    rep_phase_threshold: float  # Threshold to count a repetition
+    rep_angles: Tuple[str, ...]  # BODY_JOINTS angle names averaged into the rep angle
+    rep_range: Tuple[float, float]  # Rep angle below the first enters 'down', above the second completes a rep
+    form_rules: List[FormRule]  # Form checks, evaluated on every frame
+    feedback_messages: Dict[str, str] = field(default_factory=dict)  # Feedback message per code
 
 # Define exercise configurations
 EXERCISES = {
@@ -17,76 +26,72 @@ EXERCISES = {
         name="Squat",
         description="Stand with feet shoulder-width apart, lower your body by bending your knees.",
         key_points=[23, 24, 25, 26, 27, 28],  # Hips, knees, ankles
-        angle_thresholds={
-            'knee': (80, 100),  # Knee angle at bottom of squat
-            'torso': (160, 190)  # Torso angle (relative to vertical)
-        },
+        rep_angles=('left_knee', 'right_knee'),
+        rep_range=(90, 160),
+        form_rules=[
+            FormRule(('left_knee', 'right_knee'), 80, 100, too_low='knee_too_far', too_high='stand_up'),
+            FormRule(('left_hip', 'right_hip'), 50, None, too_low='back_bent', phase='down'),
+        ],
         feedback_messages={
             'knee_too_far': "Keep your knees behind your toes",
-            'knee_collapse': "Push your knees outward",
+            'stand_up': "Stand up straight",
             'back_bent': "Keep your back straight"
-        },
-        rep_phase_threshold=0.7
+        }
     ),
     'pushup': ExerciseConfig(
         name="Push-up",
         description="Keep your body straight, lower until your chest nearly touches the floor.",
         key_points=[11, 12, 13, 14, 15, 16, 23, 24],  # Shoulders, elbows, wrists, hips
-        angle_thresholds={
-            'elbow': (75, 90),  # Elbow angle at bottom
-            'shoulder': (0, 30)  # Shoulder angle
-        },
+        rep_angles=('left_elbow', 'right_elbow'),
+        rep_range=(90, 160),
+        form_rules=[
+            FormRule(('left_hip', 'right_hip'), 150, None, too_low='hips_bent'),
+            FormRule(('left_elbow', 'right_elbow'), 60, None, too_low='too_deep', phase='down'),
+        ],
         feedback_messages={
-            'hips_too_low': "Keep your body straight",
-            'hips_too_high': "Lower your hips",
-            'depth_insufficient': "Go lower"
-        },
-        rep_phase_threshold=0.6
+            'hips_bent': "Keep your body straight",
+            'too_deep': "Push up higher"
+        }
     ),
     'lunge': ExerciseConfig(
         name="Lunge",
         description="Step forward and lower your hips until both knees are bent at 90 degrees.",
         key_points=[23, 24, 25, 26, 27, 28],  # Hips, knees, ankles
-        angle_thresholds={
-            'front_knee': (80, 100),  # Front knee angle at bottom
-            'back_knee': (80, 100),   # Back knee angle at bottom
-        },
+        rep_angles=('left_knee', 'right_knee'),
+        rep_range=(110, 160),
+        form_rules=[
+            FormRule(('left_knee',), 70, None, too_low='front_knee_over'),
+            FormRule(('right_knee',), 70, None, too_low='front_knee_over'),
+        ],
         feedback_messages={
-            'front_knee_over': "Don't let your front knee go past your toes",
-            'torso_lean': "Keep your torso upright",
-            'knee_collapse': "Keep your front knee in line with your foot"
-        },
-        rep_phase_threshold=0.7
+            'front_knee_over': "Don't let your front knee go past your toes"
+        }
     ),
     'shoulder_press': ExerciseConfig(
         name="Shoulder Press",
         description="Press weights overhead until arms are fully extended.",
         key_points=[11, 12, 13, 14, 15, 16],  # Shoulders, elbows, wrists
-        angle_thresholds={
-            'elbow': (160, 180),  # Elbow angle at top
-            'shoulder': (160, 180)  # Shoulder angle at top
-        },
+        rep_angles=('left_elbow', 'right_elbow'),
+        rep_range=(100, 160),
+        form_rules=[
+            FormRule(('left_shoulder', 'right_shoulder'), 60, None, too_low='elbows_low'),
+        ],
         feedback_messages={
-            'elbows_low': "Raise your elbows higher",
-            'arms_not_straight': "Fully extend your arms",
-            'back_arch': "Don't arch your back"
-        },
-        rep_phase_threshold=0.8
+            'elbows_low': "Raise your elbows higher"
+        }
     ),
     'bicep_curl': ExerciseConfig(
         name="Bicep Curl",
         description="Keep elbows close to your torso, curl the weights up to shoulder level.",
         key_points=[11, 12, 13, 14, 15, 16],  # Shoulders, elbows, wrists
-        angle_thresholds={
-            'elbow': (30, 50),    # Elbow angle at top of curl
-            'shoulder': (0, 20)   # Shoulder stability
-        },
+        rep_angles=('left_elbow', 'right_elbow'),
+        rep_range=(60, 150),
+        form_rules=[
+            FormRule(('left_shoulder', 'right_shoulder'), None, 30, too_high='elbows_moving'),
+        ],
         feedback_messages={
-            'elbows_moving': "Keep your elbows still",
-            'range_insufficient': "Complete the full range of motion",
-            'shoulders_rising': "Keep your shoulders down"
-        },
-        rep_phase_threshold=0.7
+            'elbows_moving': "Keep your elbows still"
+        }
     )
 }
 
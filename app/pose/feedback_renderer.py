@@ -1,6 +1,31 @@
 import cv2
 import numpy as np
-from typing import Optional, Dict, List, Tuple
+from typing import Iterable, Optional, Dict, List, Tuple
+from app.pose.landmark_buffer import coordinates
+from app.pose.skeleton import SkeletonRasterizer
+
+# Side panel geometry: width and margin from the frame edges, in pixels
+PANEL_WIDTH = 300
+PANEL_MARGIN = 20
+PANEL_ALPHA = 0.7
+
+# Connections drawn by draw_pose: body without hands and feet, plus the face
+MIRROR_CONNECTIONS = (
+    # Torso
+    (11, 12), (11, 23), (12, 24), (23, 24),
+    # Left arm
+    (11, 13), (13, 15),
+    # Right arm
+    (12, 14), (14, 16),
+    # Left leg
+    (23, 25), (25, 27),
+    # Right leg
+    (24, 26), (26, 28),
+    # Face: eyes to ears, and mouth
+    (0, 1), (1, 2), (2, 3), (3, 7),
+    (0, 4), (4, 5), (5, 6), (6, 8),
+    (9, 10),
+)
 
 class FeedbackRenderer:
     def __init__(self, window_name: str = "Smart Mirror Mode"):
@@ -23,44 +48,47 @@ class FeedbackRenderer:
         self.neutral_color = (255, 255, 255)  # White
         self.background_color = (50, 50, 50)  # Dark gray
         
-    def draw_pose(self, image: np.ndarray, landmarks: np.ndarray, similarity: float = 1.0) -> np.ndarray:
+        # Body and face skeleton, validated once
+        self.skeleton = SkeletonRasterizer(MIRROR_CONNECTIONS, self.line_thickness, point_radius=4)
+        
+        # Reused output buffer all draw calls render into
+        self._output: Optional[np.ndarray] = None
+        # Panel background, title and help text per frame size
+        self._static_layers: Dict[Tuple[int, int], np.ndarray] = {}
+        # Static layer plus feedback text, re-rasterized only when the text changes
+        self._text_key = None
+        self._text_layer: Optional[np.ndarray] = None
+        # Text layer plus the per-frame similarity bar, blended into the frame
+        self._panel: Optional[np.ndarray] = None
+        
+    def _canvas(self, image: np.ndarray) -> np.ndarray:
+        """Return the reused output buffer holding `image`, copying it in unless it already is the buffer."""
+        if image is self._output:
+            return image
+        if self._output is None or self._output.shape != image.shape:
+            self._output = np.empty_like(image)
+        np.copyto(self._output, image)
+        return self._output
+    
+    def draw_pose(self, image: np.ndarray, landmarks: np.ndarray, similarity: float = 1.0,
+                  highlight_joints: Optional[Iterable[int]] = None) -> np.ndarray:
         """Draw the detected pose on the image with color coding based on similarity.
         
         Args:
             image: Input image in BGR format
-            landmarks: Numpy array of shape (33, 3) containing landmark coordinates
+            landmarks: Numpy array of shape (33, C) with normalized (x, y) in the first two columns
             similarity: Similarity score (0-1) to determine color coding
+            highlight_joints: Landmark indices whose bones are drawn in the incorrect color
             
         Returns:
-            Image with pose drawn
+            Image with pose drawn, in the renderer's reused output buffer (valid until
+            the next draw call on another image)
         """
         if landmarks is None:
             return image
             
-        # Create a copy of the image to draw on
-        img_copy = image.copy()
-        
-        # Define connections between landmarks (MediaPipe pose connections)
-        connections = [
-            # Torso
-            (11, 12), (11, 23), (12, 24), (23, 24),
-            # Left arm
-            (11, 13), (13, 15),
-            # Right arm
-            (12, 14), (14, 16),
-            # Left leg
-            (23, 25), (25, 27),
-            # Right leg
-            (24, 26), (26, 28),
-            # Face (simplified)
-            (0, 1), (1, 2), (2, 3), (3, 7),  # Right eyebrow
-            (0, 4), (4, 5), (5, 6), (6, 8),  # Left eyebrow
-            (9, 10),  # Nose bridge
-            (17, 18), (18, 19), (19, 20), (20, 21),  # Right eye
-            (22, 23), (23, 24), (24, 25), (25, 26),  # Left eye
-            (30, 31), (31, 32), (32, 33), (33, 34),  # Mouth outer
-            (35, 36), (36, 37), (37, 38), (38, 39), (39, 40), (40, 41), (41, 36),  # Lips
-        ]
+        # Draw into the reused output buffer (in place when chaining draw calls)
+        img_copy = self._canvas(image)
         
         # Determine color based on similarity
         if similarity > 0.8:
@@ -76,27 +104,12 @@ class FeedbackRenderer:
         else:
             color = self.incorrect_color
         
-        # Draw connections
-        for connection in connections:
-            start_idx, end_idx = connection
-            if (0 <= start_idx < len(landmarks)) and (0 <= end_idx < len(landmarks)):
-                start_point = (
-                    int(landmarks[start_idx, 0] * img_copy.shape[1]),
-                    int(landmarks[start_idx, 1] * img_copy.shape[0])
-                )
-                end_point = (
-                    int(landmarks[end_idx, 0] * img_copy.shape[1]),
-                    int(landmarks[end_idx, 1] * img_copy.shape[0])
-                )
-                cv2.line(img_copy, start_point, end_point, color, self.line_thickness)
-        
-        # Draw keypoints
-        for idx, landmark in enumerate(landmarks):
-            x = int(landmark[0] * img_copy.shape[1])
-            y = int(landmark[1] * img_copy.shape[0])
-            cv2.circle(img_copy, (x, y), 4, color, -1)
-        
-        return img_copy
+        # Bones touching joints with form errors are drawn in the incorrect color
+        bone_colors = None
+        if highlight_joints is not None:
+            bone_colors = self.skeleton.bone_colors(color, highlight_joints, self.incorrect_color)
+        
+        return self.skeleton.draw(img_copy, landmarks, color, bone_colors)
     
     def draw_reference_overlay(self, image: np.ndarray, reference_pose: np.ndarray) -> np.ndarray:
         """Draw a semi-transparent reference pose overlay.
@@ -111,121 +124,159 @@ class FeedbackRenderer:
         if reference_pose is None:
             return image
             
-        # Create a transparent overlay
-        overlay = image.copy()
-        overlay = self.draw_pose(overlay, reference_pose, 1.0)
+        canvas = self._canvas(image)
+        height, width = canvas.shape[:2]
+        
+        # Blend only the box around the reference skeleton, padded for line and keypoint size
+        points = coordinates(reference_pose) * (width, height)
+        pad = 4 + self.line_thickness
+        x0, y0 = np.clip(np.floor(points.min(axis=0)).astype(int) - pad, 0, (width, height))
+        x1, y1 = np.clip(np.ceil(points.max(axis=0)).astype(int) + pad + 1, 0, (width, height))
+        if x1 <= x0 or y1 <= y0:
+            return canvas
+        roi = canvas[y0:y1, x0:x1]
+        original = roi.copy()
         
-        # Blend the overlay with the original image
-        return cv2.addWeighted(overlay, 0.3, image, 0.7, 0)
+        # Draw the reference in place, then blend it at 30% opacity over the original pixels
+        self.draw_pose(canvas, reference_pose, 1.0)
+        cv2.addWeighted(roi, 0.3, original, 0.7, 0, dst=roi)
+        return canvas
+    
+    def _panel_rect(self, height: int, width: int) -> Tuple[int, int, int, int]:
+        # (x0, y0, x1, y1) of the panel on the right side of the screen, clipped to the frame
+        x0 = max(width - PANEL_WIDTH - PANEL_MARGIN, 0)
+        x1 = min(x0 + PANEL_WIDTH, width)
+        return x0, min(PANEL_MARGIN, height), x1, max(height - PANEL_MARGIN, PANEL_MARGIN)
+    
+    def _fit_scale(self, text: str, scale: float, thickness: int, max_width: int) -> float:
+        # Shrink the font scale until the text fits the panel width
+        text_width = cv2.getTextSize(text, self.font, scale, thickness)[0][0]
+        return scale if text_width <= max_width else scale * max_width / text_width
+    
+    def _static_layer(self, height: int, width: int) -> np.ndarray:
+        """Panel background, title and help text for a frame size, rasterized once."""
+        key = (height, width)
+        if key not in self._static_layers:
+            x0, y0, x1, y1 = self._panel_rect(height, width)
+            panel_width = x1 - x0
+            layer = np.empty((y1 - y0, panel_width, 3), dtype=np.uint8)
+            layer[:] = self.background_color
+            
+            # Add title
+            title = "Smart Mirror Feedback"
+            scale = self._fit_scale(title, self.font_scale + 0.3, self.text_thickness + 1, panel_width - 10)
+            (text_width, text_height), _ = cv2.getTextSize(title, self.font, scale, self.text_thickness + 1)
+            cv2.putText(layer, title,
+                       ((panel_width - text_width) // 2, 40),
+                       self.font, scale, self.text_color, self.text_thickness + 1, cv2.LINE_AA)
+            
+            # Add help text at the bottom (frame coordinates height - 60 + i * 25)
+            help_text = [
+                "Press 'r' to set reference pose",
+                "Press 'q' to quit"
+            ]
+            for i, text in enumerate(help_text):
+                cv2.putText(layer, text,
+                           (10, height - 60 + i * 25 - y0),
+                           self.font, self.font_scale * 0.7, (180, 180, 180), 1, cv2.LINE_AA)
+            self._static_layers[key] = layer
+        return self._static_layers[key]
+    
+    def _similarity_status(self, similarity: float) -> Tuple[Tuple[int, int, int], str]:
+        # Bar color and status text for a similarity score
+        if similarity > 0.8:
+            return self.correct_color, "Excellent!"
+        elif similarity > 0.6:
+            return (0, 200, 255), "Good"  # Orange
+        elif similarity > 0.4:
+            return (0, 165, 255), "Needs Work"  # Orange-Red
+        return self.incorrect_color, "Needs Improvement"
+    
+    def _bar_rect(self, panel_width: int) -> Tuple[int, int, int, int]:
+        # Similarity bar (x0, y0, x1, y1) in panel coordinates
+        bar_width, bar_height = 200, 20
+        bar_x = (panel_width - bar_width) // 2
+        return bar_x, 80, bar_x + bar_width, 80 + bar_height
+    
+    def _text_layer_for(self, height: int, width: int, status: str, messages: Tuple[str, ...]) -> np.ndarray:
+        """Static layer plus status and feedback text, rebuilt only when the text changes."""
+        key = (height, width, status, messages)
+        if key != self._text_key:
+            layer = self._static_layer(height, width).copy()
+            panel_width = layer.shape[1]
+            bar_x0, bar_y0, bar_x1, bar_y1 = self._bar_rect(panel_width)
+            
+            # Add similarity status above the bar
+            cv2.putText(layer, status,
+                       (bar_x0 + (bar_x1 - bar_x0 - cv2.getTextSize(status, self.font, self.font_scale, self.text_thickness)[0][0]) // 2,
+                        bar_y0 - 10),
+                       self.font, self.font_scale, self.text_color, self.text_thickness, cv2.LINE_AA)
+            
+            # Add feedback messages
+            y_offset = bar_y1 + 40
+            if messages:
+                cv2.putText(layer, "Feedback:",
+                           (10, y_offset),
+                           self.font, self.font_scale, self.text_color, self.text_thickness, cv2.LINE_AA)
+                y_offset += 30
+                
+                for i, message in enumerate(messages):
+                    text = f"• {message}"
+                    scale = self._fit_scale(text, self.font_scale * 0.8, self.text_thickness, panel_width - 25)
+                    cv2.putText(layer, text,
+                               (20, y_offset + i * 30),
+                               self.font, scale, self.text_color, self.text_thickness, cv2.LINE_AA)
+            else:
+                cv2.putText(layer, "No specific feedback",
+                           (10, y_offset),
+                           self.font, self.font_scale * 0.8, self.text_color, self.text_thickness, cv2.LINE_AA)
+            
+            self._text_key = key
+            self._text_layer = layer
+            self._panel = layer.copy()
+        return self._text_layer
     
     def draw_feedback_panel(self, image: np.ndarray, feedback: Dict) -> np.ndarray:
         """Draw a feedback panel with similarity score and instructions.
         
+        Static parts of the panel are cached per frame size and text is only
+        re-rasterized when the feedback changes; each frame redraws the
+        similarity bar and blends the panel region alone.
+        
         Args:
             image: Input image in BGR format
             feedback: Dictionary containing feedback information
             
         Returns:
-            Image with feedback panel
+            Image with feedback panel, in the renderer's reused output buffer (valid
+            until the next draw call on another image)
         """
-        img_copy = image.copy()
-        height, width = img_copy.shape[:2]
-        
-        # Create a semi-transparent overlay for the panel
-        overlay = np.zeros_like(img_copy, dtype=np.uint8)
-        
-        # Panel dimensions and position (right side of the screen)
-        panel_width = 300
-        panel_x = width - panel_width - 20
-        panel_y = 20
-        panel_height = height - 40
-        
-        # Draw panel background
-        cv2.rectangle(overlay, 
-                     (panel_x, panel_y), 
-                     (panel_x + panel_width, panel_y + panel_height),
-                     self.background_color, -1)
-        
-        # Add title
-        title = "Smart Mirror Feedback"
-        (text_width, text_height), _ = cv2.getTextSize(title, self.font, self.font_scale + 0.3, self.text_thickness + 1)
-        cv2.putText(overlay, title,
-                   (panel_x + (panel_width - text_width) // 2, panel_y + 40),
-                   self.font, self.font_scale + 0.3, self.text_color, self.text_thickness + 1, cv2.LINE_AA)
-        
-        # Add similarity score
-        similarity = feedback.get('similarity', 0)
-        similarity_text = f"Similarity: {similarity*100:.1f}%"
-        
-        # Determine color based on similarity
-        if similarity > 0.8:
-            color = self.correct_color
-            status = "Excellent!"
-        elif similarity > 0.6:
-            color = (0, 200, 255)  # Orange
-            status = "Good"
-        elif similarity > 0.4:
-            color = (0, 165, 255)  # Orange-Red
-            status = "Needs Work"
-        else:
-            color = self.incorrect_color
-            status = "Needs Improvement"
+        canvas = self._canvas(image)
+        height, width = canvas.shape[:2]
+        x0, y0, x1, y1 = self._panel_rect(height, width)
+        if x1 <= x0 or y1 <= y0:
+            return canvas
         
-        # Draw similarity bar
-        bar_width = 200
-        bar_height = 20
-        bar_x = panel_x + (panel_width - bar_width) // 2
-        bar_y = panel_y + 80
+        similarity = feedback.get('similarity', 0)
+        color, status = self._similarity_status(similarity)
+        text_layer = self._text_layer_for(height, width, status, tuple(feedback.get('feedback', [])[:4]))  # Show up to 4 messages
         
+        # Redraw the similarity bar over the cached text layer
+        bar_x0, bar_y0, bar_x1, bar_y1 = self._bar_rect(x1 - x0)
+        panel = self._panel
+        panel[bar_y0:bar_y1 + 1, bar_x0:bar_x1 + 1] = text_layer[bar_y0:bar_y1 + 1, bar_x0:bar_x1 + 1]
         # Background bar
-        cv2.rectangle(overlay, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height),
-                     (100, 100, 100), -1)
+        cv2.rectangle(panel, (bar_x0, bar_y0), (bar_x1, bar_y1), (100, 100, 100), -1)
         # Filled bar based on similarity
-        fill_width = int(bar_width * min(max(similarity, 0), 1))
-        cv2.rectangle(overlay, (bar_x, bar_y), (bar_x + fill_width, bar_y + bar_height),
-                     color, -1)
+        fill_width = int((bar_x1 - bar_x0) * min(max(similarity, 0), 1))
+        cv2.rectangle(panel, (bar_x0, bar_y0), (bar_x0 + fill_width, bar_y1), color, -1)
         # Border
-        cv2.rectangle(overlay, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height),
-                     (200, 200, 200), 1)
-        
-        # Add similarity text
-        cv2.putText(overlay, status,
-                   (bar_x + (bar_width - cv2.getTextSize(status, self.font, self.font_scale, self.text_thickness)[0][0]) // 2,
-                    bar_y - 10),
-                   self.font, self.font_scale, self.text_color, self.text_thickness, cv2.LINE_AA)
-        
-        # Add feedback messages
-        feedback_messages = feedback.get('feedback', [])
-        y_offset = bar_y + bar_height + 40
-        
-        if feedback_messages:
-            cv2.putText(overlay, "Feedback:",
-                       (panel_x + 10, y_offset),
-                       self.font, self.font_scale, self.text_color, self.text_thickness, cv2.LINE_AA)
-            y_offset += 30
-            
-            for i, message in enumerate(feedback_messages[:4]):  # Show up to 4 messages
-                cv2.putText(overlay, f"• {message}",
-                           (panel_x + 20, y_offset + i * 30),
-                           self.font, self.font_scale * 0.8, self.text_color, self.text_thickness, cv2.LINE_AA)
-        else:
-            cv2.putText(overlay, "No specific feedback",
-                       (panel_x + 10, y_offset),
-                       self.font, self.font_scale * 0.8, self.text_color, self.text_thickness, cv2.LINE_AA)
-        
-        # Add help text at the bottom
-        help_text = [
-            "Press 'r' to set reference pose",
-            "Press 'q' to quit"
-        ]
-        
-        for i, text in enumerate(help_text):
-            cv2.putText(overlay, text,
-                       (panel_x + 10, height - 60 + i * 25),
-                       self.font, self.font_scale * 0.7, (180, 180, 180), 1, cv2.LINE_AA)
-        
-        # Blend the overlay with the original image
-        return cv2.addWeighted(overlay, 0.7, img_copy, 0.3, 0)
+        cv2.rectangle(panel, (bar_x0, bar_y0), (bar_x1, bar_y1), (200, 200, 200), 1)
+        
+        # Blend the panel into its region of the frame only
+        roi = canvas[y0:y1, x0:x1]
+        cv2.addWeighted(panel, PANEL_ALPHA, roi, 1 - PANEL_ALPHA, 0, dst=roi)
+        return canvas
     
     def show_image(self, image: np.ndarray, window_name: str = None):
         """Display the image in a window.
@@ -0,0 +1,64 @@
+import base64
+import binascii
+import time
+from concurrent.futures import Executor
+from typing import List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+
+def decode_image_bytes(buffer: Union[bytes, bytearray, memoryview]) -> Optional[np.ndarray]:
+    """Decode raw JPEG/PNG bytes into a BGR frame without copying the input buffer.
+
+    Args:
+        buffer: Encoded image bytes, e.g. a request body
+
+    Returns:
+        Decoded BGR image or None if the buffer is not a valid image
+    """
+    encoded = np.frombuffer(memoryview(buffer), dtype=np.uint8)
+    if encoded.size == 0:
+        return None
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+
+def decode_base64_image(image_base64: str) -> Optional[np.ndarray]:
+    """Decode a base64 encoded JPEG/PNG image into a BGR frame.
+
+    Args:
+        image_base64: Base64 image payload, optionally prefixed with a data URL header
+
+    Returns:
+        Decoded BGR image or None if the payload is not a valid image
+    """
+    if image_base64.startswith("data:"):
+        image_base64 = image_base64.partition(",")[2]
+    try:
+        raw = base64.b64decode(image_base64)
+    except (binascii.Error, ValueError):
+        return None
+    return decode_image_bytes(raw)
+
+
+def decode_base64_images(images: List[str], executor: Optional[Executor] = None) -> List[Tuple[Optional[np.ndarray], float]]:
+    """Decode several base64 images, in parallel when an executor is given.
+
+    cv2.imdecode releases the GIL, so a thread pool decodes frames concurrently.
+
+    Args:
+        images: Base64 image payloads
+        executor: Optional executor used to decode the images in parallel
+
+    Returns:
+        List of (image or None, decode time in ms) tuples in input order
+    """
+    if executor is None:
+        return [_timed_decode(image) for image in images]
+    return list(executor.map(_timed_decode, images))
+
+
+def _timed_decode(image_base64: str) -> Tuple[Optional[np.ndarray], float]:
+    start = time.perf_counter()
+    image = decode_base64_image(image_base64)
+    return image, (time.perf_counter() - start) * 1000
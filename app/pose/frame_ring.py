@@ -0,0 +1,110 @@
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+_HEADER_DTYPE = np.int32  # Per slot (height, width) of the frame it currently holds
+
+
+class SharedFrameRing:
+    def __init__(self, slots: int, max_height: int, max_width: int, name: Optional[str] = None):
+        """Ring of fixed-size BGR frame slots in shared memory.
+
+        The owning (API) process creates the ring by calling the constructor
+        without a name, writes decoded frames into free slots and hands only
+        the slot index to inference processes, which `attach` to the same
+        block and read the frame in place as a regular ndarray.
+
+        Args:
+            slots: Number of frame slots
+            max_height: Largest frame height a slot can hold
+            max_width: Largest frame width a slot can hold
+            name: Name of an existing ring to attach to (None creates a new one)
+        """
+        self.slots = slots
+        self.max_height = max_height
+        self.max_width = max_width
+        self.slot_bytes = max_height * max_width * 3
+        self.owner = name is None
+
+        header_bytes = slots * 2 * np.dtype(_HEADER_DTYPE).itemsize
+        size = header_bytes + slots * self.slot_bytes
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+
+        self._shapes = np.ndarray((slots, 2), dtype=_HEADER_DTYPE, buffer=self._shm.buf)
+        self._frames = np.ndarray((slots, self.slot_bytes), dtype=np.uint8,
+                                  buffer=self._shm.buf, offset=header_bytes)
+
+        # Free-slot bookkeeping only lives in the owning process
+        self._free = list(range(slots)) if self.owner else []
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.rejected = 0
+
+    @classmethod
+    def attach(cls, spec: Dict) -> "SharedFrameRing":
+        """Attach to a ring created by another process from its `spec()`."""
+        return cls(spec['slots'], spec['max_height'], spec['max_width'], name=spec['name'])
+
+    def spec(self) -> Dict:
+        """Return the picklable description other processes need to attach."""
+        return {'name': self.name, 'slots': self.slots,
+                'max_height': self.max_height, 'max_width': self.max_width}
+
+    def fits(self, frame: np.ndarray) -> bool:
+        """Check whether a frame fits in a slot."""
+        return (frame.ndim == 3 and frame.shape[2] == 3 and frame.dtype == np.uint8
+                and frame.shape[0] <= self.max_height and frame.shape[1] <= self.max_width)
+
+    def write(self, frame: np.ndarray) -> Optional[int]:
+        """Copy a frame into a free slot.
+
+        Args:
+            frame: BGR uint8 image no larger than the slot size
+
+        Returns:
+            Slot index, or None if the frame does not fit or every slot is in use
+        """
+        if not self.fits(frame):
+            self.rejected += 1
+            return None
+        with self._lock:
+            if not self._free:
+                self.rejected += 1
+                return None
+            slot = self._free.pop()
+            self.writes += 1
+
+        height, width = frame.shape[:2]
+        self._shapes[slot] = (height, width)
+        np.copyto(self.view(slot), frame)
+        return slot
+
+    def view(self, slot: int) -> np.ndarray:
+        """Return the frame held in a slot as an ndarray backed by shared memory."""
+        height, width = self._shapes[slot]
+        return self._frames[slot, :height * width * 3].reshape(height, width, 3)
+
+    def release(self, slot: int):
+        """Return a slot to the free list once no process reads it anymore."""
+        with self._lock:
+            self._free.append(slot)
+
+    def stats(self) -> Dict:
+        """Return slot usage counters."""
+        with self._lock:
+            in_use = self.slots - len(self._free)
+        return {'slots': self.slots, 'in_use': in_use, 'writes': self.writes, 'rejected': self.rejected}
+
+    def close(self):
+        """Detach from the shared memory block, removing it if this process owns it."""
+        self._shapes = None
+        self._frames = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
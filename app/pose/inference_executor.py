@@ -0,0 +1,384 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.pose.detector_pool import DetectorPool, PoolExhaustedError
+from app.pose.frame_ring import SharedFrameRing
+from app.pose.pose_backends import create_backend
+from app.pose.pose_detector import PoseDetector
+from app.pose.quality_governor import DEFAULT_TIER, QualityGovernor, QualityTier, downscale
+
+# Detector pool of the current process, created by _init_worker in every inference worker
+_worker_pool: Optional[DetectorPool] = None
+# Shared frame ring attached by inference processes
+_worker_ring: Optional[SharedFrameRing] = None
+# Seconds a worker waits for a pooled detector before failing the request
+_checkout_timeout: Optional[float] = None
+
+
+class InferenceOverloadedError(RuntimeError):
+    """Raised when the inference queue is full and the request is shed."""
+
+
+class InferenceTimeoutError(TimeoutError):
+    """Raised when inference does not finish before the request deadline."""
+
+
+def _init_worker(pool_size: int, max_uses: int, ring_spec: Optional[Dict] = None,
+                 model_complexities: Tuple[int, ...] = (), backend: str = 'mediapipe',
+                 backend_options: Optional[Dict] = None, checkout_timeout: Optional[float] = None):
+    global _worker_pool, _worker_ring, _checkout_timeout
+
+    options = dict(backend_options or {})
+    if backend == 'mediapipe':
+        # Pooled detectors serve unrelated frames (detect_many, other clients); MediaPipe must not track across them
+        options.setdefault('static_image_mode', True)
+
+    def factory():
+        detector = PoseDetector(backend=create_backend(backend, **options))
+        detector.preload(model_complexities)
+        return detector
+
+    _checkout_timeout = checkout_timeout
+    _worker_pool = DetectorPool(size=pool_size, max_uses=max_uses, factory=factory)
+    _worker_pool.warm()
+    if ring_spec is not None:
+        _worker_ring = SharedFrameRing.attach(ring_spec)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _detect(detector: PoseDetector, image: np.ndarray, tier: QualityTier) -> Tuple[Optional[np.ndarray], float]:
+    # The quality governor is fed this time: downscaling and inference, without queueing or transfer
+    start = time.perf_counter()
+    detector.set_model_complexity(tier.model_complexity)
+    landmarks = detector.detect_landmarks(downscale(image, tier))
+    inference_ms = (time.perf_counter() - start) * 1000
+    # Pooled detectors serve other requests next; hand back an owned copy, not a buffer slot
+    return (None if landmarks is None else landmarks.copy()), inference_ms
+
+
+def detect_frame(image: np.ndarray, tier: QualityTier = DEFAULT_TIER) -> Tuple[Optional[np.ndarray], float]:
+    """Detect landmarks in one frame on an inference worker.
+
+    Returns:
+        Tuple of (landmarks or None, inference time in ms)
+    """
+    with _worker_pool.checkout(timeout=_checkout_timeout) as detector:
+        return _detect(detector, image, tier)
+
+
+def detect_frames(images: List[np.ndarray], tier: QualityTier = DEFAULT_TIER,
+                  track: bool = False) -> List[Tuple[Optional[np.ndarray], float]]:
+    """Detect landmarks in frames with one detector checkout.
+
+    Pooled detectors run in static image mode, so no frame's result depends
+    on another client's frame. With `track`, the frames are one client's in
+    time order and the detector follows the pose from frame to frame with
+    its ROI tracking, which keeps its state outside the MediaPipe graph and
+    is reset before and after the batch.
+
+    Returns:
+        List of (landmarks or None, inference time in ms) tuples in input order
+    """
+    with _worker_pool.checkout(timeout=_checkout_timeout) as detector:
+        if not track:
+            return [_detect(detector, image, tier) for image in images]
+        detector.roi_tracking = True
+        detector.reset_tracking()
+        try:
+            return [_detect(detector, image, tier) for image in images]
+        finally:
+            detector.roi_tracking = False
+            detector.reset_tracking()
+
+
+def detect_slot(slot: int, tier: QualityTier = DEFAULT_TIER) -> Tuple[Optional[np.ndarray], float]:
+    """Detect landmarks in a frame read in place from the shared frame ring."""
+    return detect_frame(_worker_ring.view(slot), tier)
+
+
+def detect_slots(slots: List[int], tier: QualityTier = DEFAULT_TIER,
+                 track: bool = False) -> List[Tuple[Optional[np.ndarray], float]]:
+    """Ordered-batch variant of detect_slot."""
+    return detect_frames([_worker_ring.view(slot) for slot in slots], tier, track)
+
+
+class InferenceExecutor:
+    def __init__(self, workers: int = 0, threads: int = 2, max_pending: int = 32,
+                 deadline: float = 2.0, max_uses: int = 1000, ring_slots: int = 0,
+                 ring_max_size: Tuple[int, int] = (720, 1280), governor: Optional[QualityGovernor] = None,
+                 backend: str = 'mediapipe', backend_options: Optional[Dict] = None,
+                 checkout_timeout: Optional[float] = None):
+        """Initialize the pose inference executor.
+
+        Inference runs in `workers` processes, each holding its own warm
+        PoseDetector, so throughput scales with cores instead of one GIL. With
+        `workers=0` it runs on `threads` threads backed by an in-process
+        detector pool instead.
+
+        With `ring_slots` set, frames reach worker processes through a shared
+        memory ring and only slot indices and landmarks are pickled. Frames
+        larger than `ring_max_size` or arriving when the ring is full are
+        pickled as before.
+
+        With a `governor`, every request runs at the quality tier it picks
+        and its per-frame latency and the queue depth are fed back to it.
+
+        Args:
+            workers: Number of inference processes (0 runs inference in this process)
+            threads: Number of inference threads and pooled detectors when workers is 0
+            max_pending: Maximum queued plus running requests before new ones are shed
+            deadline: Seconds a request may wait for its result
+            max_uses: Detector checkouts before a detector is recycled
+            ring_slots: Number of shared-memory frame slots (0 disables the ring)
+            ring_max_size: (height, width) of the largest frame a ring slot holds
+            governor: Optional adaptive quality governor (fixed full quality without one)
+            backend: Pose backend name, see create_backend
+            backend_options: Backend constructor arguments; must be picklable for worker processes
+            checkout_timeout: Seconds a request waits for a free pooled detector (None waits forever)
+        """
+        self.workers = workers
+        self.threads = threads
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.max_uses = max_uses
+        self.ring_slots = ring_slots
+        self.ring_max_size = ring_max_size
+        self.governor = governor
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.checkout_timeout = checkout_timeout
+        self._executor: Optional[Executor] = None
+        self._ring: Optional[SharedFrameRing] = None
+
+        # Metrics; futures complete on executor threads, so counters are updated under a lock
+        self._count_lock = threading.Lock()
+        self._pending = 0
+        self._abandoned = 0
+        self._max_pending_seen = 0
+        self._completed = 0
+        self._shed = 0
+        self._timeouts = 0
+        self._restarts = 0
+        self._latency_total = 0.0
+
+    def start(self):
+        """Start the workers and load their models."""
+        if self.workers > 0:
+            if self.ring_slots > 0:
+                self._ring = SharedFrameRing(self.ring_slots, *self.ring_max_size)
+            self._executor = self._create_process_executor()
+            # Processes start on demand; one task per worker starts and warms them all
+            wait([self._executor.submit(_worker_ready) for _ in range(self.workers)])
+        else:
+            _init_worker(self.threads, self.max_uses, None, self._model_complexities(),
+                         self.backend, self.backend_options, self.checkout_timeout)
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="pose-inference")
+
+    def _model_complexities(self) -> Tuple[int, ...]:
+        # Models the governor may need under load; more accurate tiers are only chosen when
+        # inference is idle, so they are loaded on first use instead of held by every detector
+        if self.governor is None:
+            return ()
+        tiers = self.governor.tiers
+        return tuple(sorted({tier.model_complexity for tier in tiers[tiers.index(self.governor.tier):]}))
+
+    def _create_process_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            # Forking a process that already runs MediaPipe threads is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(1, self.max_uses, self._ring.spec() if self._ring is not None else None,
+                      self._model_complexities(), self.backend, self.backend_options, self.checkout_timeout),
+        )
+
+    async def run(self, fn: Callable, *args, on_done: Optional[Callable[[], None]] = None):
+        """Run an inference function on the executor within the request deadline.
+
+        Args:
+            fn: Picklable inference function, e.g. detect_frame
+            *args: Arguments passed to fn
+            on_done: Called once the executor is finished with the request, which
+                can be after the deadline has already expired for the caller
+
+        Raises:
+            InferenceOverloadedError: If `max_pending` requests are already in flight, or no
+                detector became free within `checkout_timeout`
+            InferenceTimeoutError: If the result is not ready before the deadline
+        """
+        with self._count_lock:
+            if self._pending >= self.max_pending:
+                self._shed += 1
+                raise InferenceOverloadedError(f"{self._pending} inference requests already pending")
+            self._pending += 1
+            self._max_pending_seen = max(self._max_pending_seen, self._pending)
+        executor = self._executor
+        start = time.perf_counter()
+        abandoned = False
+
+        def finished(_=None):
+            # Work that outlived its deadline still holds a worker, so it counts until it ends
+            with self._count_lock:
+                self._pending -= 1
+                if abandoned:
+                    self._abandoned -= 1
+            if on_done is not None:
+                on_done()
+
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            finished()
+            raise
+        future.add_done_callback(finished)
+        try:
+            # Cancelling a request that is still queued also removes it from the executor
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.deadline)
+        except asyncio.TimeoutError:
+            with self._count_lock:
+                self._timeouts += 1
+                if not future.done():
+                    abandoned = True
+                    self._abandoned += 1
+            raise InferenceTimeoutError(f"Inference exceeded {self.deadline}s deadline")
+        except PoolExhaustedError as e:
+            raise InferenceOverloadedError(str(e))
+        except BrokenProcessPool:
+            # A worker died (e.g. a native crash); replace the pool for later requests
+            if self._executor is executor:
+                with self._count_lock:
+                    self._restarts += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_process_executor()
+            raise InferenceOverloadedError("Inference worker crashed")
+
+        latency = time.perf_counter() - start
+        with self._count_lock:
+            self._completed += 1
+            self._latency_total += latency
+        return result
+
+    def _tier(self) -> QualityTier:
+        return self.governor.tier if self.governor is not None else DEFAULT_TIER
+
+    @property
+    def pending(self) -> int:
+        """Requests queued or still running on the executor."""
+        return self._pending
+
+    def _observe(self, results: List[Tuple[Optional[np.ndarray], float]]):
+        # Pure per-frame inference time, the same signal the stream endpoint reports
+        if self.governor is not None and results:
+            latency_ms = sum(inference_ms for _, inference_ms in results) / len(results)
+            self.governor.observe(latency_ms, self._pending)
+
+    async def detect(self, image: np.ndarray) -> Tuple[Optional[np.ndarray], str]:
+        """Detect landmarks in one frame, passing it through the frame ring when possible.
+
+        Returns:
+            Tuple of (landmarks or None, name of the quality tier used)
+        """
+        tier = self._tier()
+        ring = self._ring
+        slot = ring.write(image) if ring is not None else None
+        if slot is None:
+            landmarks, inference_ms = await self.run(detect_frame, image, tier)
+        else:
+            landmarks, inference_ms = await self.run(detect_slot, slot, tier, on_done=lambda: ring.release(slot))
+        self._observe([(landmarks, inference_ms)])
+        return landmarks, tier.name
+
+    async def detect_batch(self, images: List[np.ndarray],
+                           track: bool = True) -> List[Tuple[Optional[np.ndarray], float, str]]:
+        """Detect landmarks in ordered frames on one worker, see detect_frames.
+
+        Args:
+            images: Frames to detect landmarks in
+            track: Whether the frames are one client's in time order, tracked from frame to frame
+
+        Returns:
+            List of (landmarks or None, inference time in ms, quality tier name) tuples in input order
+        """
+        tier = self._tier()
+        ring = self._ring
+        slots = []
+        if ring is not None:
+            for image in images:
+                slot = ring.write(image)
+                if slot is None:
+                    break
+                slots.append(slot)
+            if len(slots) < len(images):
+                self._release_slots(ring, slots)
+                slots = []
+        if not slots:
+            results = await self.run(detect_frames, images, tier, track)
+        else:
+            results = await self.run(detect_slots, slots, tier, track,
+                                     on_done=lambda: self._release_slots(ring, slots))
+        self._observe(results)
+        return [(landmarks, inference_ms, tier.name) for landmarks, inference_ms in results]
+
+    async def detect_many(self, images: List[np.ndarray]) -> List[Tuple[Optional[np.ndarray], float, str]]:
+        """Detect landmarks in unrelated frames (e.g. from different users) spread over all workers.
+
+        Returns:
+            List of (landmarks or None, inference time in ms, quality tier name) tuples in input order
+        """
+        workers = min(self.workers or self.threads, len(images))
+        chunks = await asyncio.gather(*[self.detect_batch(images[i::workers], track=False) for i in range(workers)])
+        results = [None] * len(images)
+        for i, chunk in enumerate(chunks):
+            results[i::workers] = chunk
+        return results
+
+    @staticmethod
+    def _release_slots(ring: SharedFrameRing, slots: List[int]):
+        for slot in slots:
+            ring.release(slot)
+
+    def stats(self) -> Dict:
+        """Return queue depth, load shedding and latency metrics."""
+        with self._count_lock:
+            stats = {
+                'mode': 'process' if self.workers > 0 else 'thread',
+                'workers': self.workers or self.threads,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'max_pending_seen': self._max_pending_seen,
+                'completed': self._completed,
+                'shed': self._shed,
+                'timeouts': self._timeouts,
+                'abandoned': self._abandoned,
+                'restarts': self._restarts,
+                'latency_ms_avg': (self._latency_total / self._completed * 1000) if self._completed else 0.0,
+            }
+        if self.workers == 0 and _worker_pool is not None:
+            stats['detector_pool'] = _worker_pool.stats()
+        if self._ring is not None:
+            stats['frame_ring'] = self._ring.stats()
+        if self.governor is not None:
+            stats['quality'] = self.governor.stats()
+        return stats
+
+    def shutdown(self):
+        """Stop the workers and release in-process detectors."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.workers == 0 and _worker_pool is not None:
+            _worker_pool.close()
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
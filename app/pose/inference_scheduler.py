@@ -0,0 +1,108 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.pose.inference_executor import InferenceOverloadedError
+from app.pose.metrics import Histogram
+
+
+class MicroBatchScheduler:
+    def __init__(self, run_batch: Callable[[List[np.ndarray]], Awaitable[List]],
+                 window_ms: float = 5.0, max_batch: int = 8, max_queue: int = 256):
+        """Collect frames from concurrent requests into micro-batches.
+
+        The first frame to arrive opens a batch; frames arriving within
+        `window_ms` join it until `max_batch` is reached. Each batch is run
+        with a single `run_batch` call and results are fanned back out to the
+        waiting requests in order.
+
+        Args:
+            run_batch: Coroutine function mapping a list of frames to a list of results
+            window_ms: How long an open batch waits for more frames
+            max_batch: Maximum number of frames per batch
+            max_queue: Maximum queued frames before new ones are shed
+        """
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_depths = Histogram([0, 1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self._shed = 0
+
+    async def submit(self, image: np.ndarray):
+        """Queue a frame for the next batch and wait for its result.
+
+        Raises:
+            InferenceOverloadedError: If `max_queue` frames are already waiting
+        """
+        if self._collector is None:
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.create_task(self._collect())
+        if self._queue.qsize() >= self.max_queue:
+            self._shed += 1
+            raise InferenceOverloadedError(f"{self._queue.qsize()} frames already queued for batching")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((image, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batch_sizes.observe(len(batch))
+            self.queue_depths.observe(self._queue.qsize())
+            # Keep collecting the next batch while this one runs
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            results = await self.run_batch([image for image, _ in batch])
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            # The request may have been cancelled while its batch was running
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Return queue depth and batch size histograms."""
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'shed': self._shed,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_depth': self.queue_depths.snapshot(),
+        }
+
+    def stop(self):
+        """Stop collecting batches and cancel batches still running."""
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector = None
+        for task in list(self._dispatches):
+            task.cancel()
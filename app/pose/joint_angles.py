@@ -0,0 +1,62 @@
+import numpy as np
+from typing import Dict, Mapping, Sequence, Tuple
+
+# Named joint angles as (end point, vertex, end point) landmark indices
+BODY_JOINTS: Dict[str, Tuple[int, int, int]] = {
+    'left_elbow': (11, 13, 15),     # Shoulder, Elbow, Wrist
+    'right_elbow': (12, 14, 16),
+    'left_shoulder': (13, 11, 23),  # Elbow, Shoulder, Hip
+    'right_shoulder': (14, 12, 24),
+    'left_hip': (11, 23, 25),       # Shoulder, Hip, Knee
+    'right_hip': (12, 24, 26),
+    'left_knee': (23, 25, 27),      # Hip, Knee, Ankle
+    'right_knee': (24, 26, 28),
+}
+
+
+class AngleTable:
+    def __init__(self, joints: Mapping[str, Sequence[int]]):
+        """Compile named joint triples into index arrays for `joint_angles`.
+
+        Args:
+            joints: Mapping of angle name to (a, b, c) landmark indices, where b is the vertex
+        """
+        for name, indices in joints.items():
+            if len(indices) != 3:
+                raise ValueError(f"Joint '{name}' needs 3 landmark indices, got {len(indices)}")
+        self.names = list(joints)
+        triples = np.array([joints[name] for name in self.names], dtype=np.intp).reshape(-1, 3)
+        self.a, self.b, self.c = triples.T.copy()
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def index(self, name: str) -> int:
+        """Column of a named angle in the `joint_angles` output."""
+        return self._index[name]
+
+    def to_dict(self, angles: np.ndarray) -> Dict[str, float]:
+        """Map one frame's angles to their names."""
+        return dict(zip(self.names, angles.tolist()))
+
+
+def joint_angles(landmarks: np.ndarray, table: AngleTable, dims: int = 2) -> np.ndarray:
+    """Calculate every angle in a table for one frame or a batch of frames in one pass.
+
+    Args:
+        landmarks: Landmarks of shape (33, C) or (N, 33, C)
+        table: Compiled joint triples
+        dims: Number of coordinates used, 2 for (x, y) or 3 to include z
+
+    Returns:
+        Angles in degrees of shape (len(table),) or (N, len(table))
+    """
+    points = np.asarray(landmarks)[..., :dims]
+    vertex = points[..., table.b, :]
+    ba = points[..., table.a, :] - vertex
+    bc = points[..., table.c, :] - vertex
+    dot = np.einsum('...ij,...ij->...i', ba, bc)
+    norms = np.sqrt(np.einsum('...ij,...ij->...i', ba, ba) * np.einsum('...ij,...ij->...i', bc, bc))
+    cosine = np.clip(dot / (norms + 1e-6), -1.0, 1.0)
+    return np.degrees(np.arccos(cosine))
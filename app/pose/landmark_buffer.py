@@ -0,0 +1,71 @@
+import numpy as np
+
+NUM_LANDMARKS = 33
+# Column layout of landmark arrays: (x, y, visibility) first so [:, :3] keeps the
+# original layout, then z
+X, Y, VISIBILITY, Z = range(4)
+LANDMARK_COLUMNS = 4
+
+
+def coordinates(landmarks: np.ndarray) -> np.ndarray:
+    """View of the normalized (x, y) columns."""
+    return landmarks[..., :2]
+
+
+def visibility(landmarks: np.ndarray) -> np.ndarray:
+    """View of the visibility column."""
+    return landmarks[..., VISIBILITY]
+
+
+def depth(landmarks: np.ndarray) -> np.ndarray:
+    """View of the z column (relative depth, hips at 0)."""
+    return landmarks[..., Z]
+
+
+class LandmarkBuffer:
+    def __init__(self, slots: int = 4, columns: int = LANDMARK_COLUMNS):
+        """Preallocated float32 ring of landmark arrays.
+
+        Each fill writes the next slot in place and returns it, so steady-state
+        extraction allocates no landmark arrays. A returned array stays valid
+        until the ring wraps around `slots` fills later; callers that keep
+        landmarks longer (reference poses, results handed to other requests)
+        must copy them.
+
+        Args:
+            slots: Number of landmark arrays in the ring
+            columns: Columns per landmark, LANDMARK_COLUMNS for (x, y, visibility, z)
+        """
+        self.columns = columns
+        self._slots = np.zeros((slots, NUM_LANDMARKS, columns), dtype=np.float32)
+        self._views = list(self._slots)  # Slot views created once, so handing one out allocates nothing
+        self._next = 0
+
+    def next_slot(self) -> np.ndarray:
+        """Advance the ring and return the slot to write, of shape (33, columns)."""
+        slot = self._views[self._next]
+        self._next = (self._next + 1) % len(self._slots)
+        return slot
+
+    def fill(self, landmark_list) -> np.ndarray:
+        """Copy a MediaPipe NormalizedLandmarkList into the next slot.
+
+        Args:
+            landmark_list: results.pose_landmarks of a MediaPipe Pose result
+
+        Returns:
+            Array of shape (33, 4) with (x, y, visibility, z) per landmark
+        """
+        slot = self.next_slot()
+        read_landmark_list(landmark_list, slot)
+        return slot
+
+
+def read_landmark_list(landmark_list, out: np.ndarray):
+    """Copy a MediaPipe NormalizedLandmarkList into a (33, 4) array in place."""
+    for index, landmark in enumerate(landmark_list.landmark):
+        # Scalar stores allocate no per-landmark tuple or row view
+        out[index, X] = landmark.x
+        out[index, Y] = landmark.y
+        out[index, VISIBILITY] = landmark.visibility
+        out[index, Z] = landmark.z
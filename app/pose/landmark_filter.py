@@ -0,0 +1,118 @@
+import math
+import time
+from typing import Optional
+
+import numpy as np
+
+from app.pose.landmark_buffer import LandmarkBuffer
+
+
+def _alpha(cutoff: np.ndarray, dt: float) -> np.ndarray:
+    # Smoothing factor of a first-order low-pass filter with the given cutoff frequency (Hz)
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 10.0, d_cutoff: float = 1.0,
+                 min_visibility: float = 0.5, max_gap: float = 0.5):
+        """One Euro filter over all 33 landmarks at once.
+
+        Each landmark's (x, y) is low-pass filtered with a cutoff that rises
+        with its speed: slow movement (jitter while holding a position) is
+        smoothed strongly, fast movement follows with little lag. Landmarks
+        below `min_visibility` are blended in proportionally less, so a
+        briefly occluded joint holds its last good position.
+
+        When no pose is detected, or a frame was skipped, the last filtered
+        pose is extrapolated along its filtered velocity for up to `max_gap`
+        seconds; after that the filter resets.
+
+        Args:
+            min_cutoff: Cutoff frequency (Hz) at rest; lower smooths more
+            beta: How fast the cutoff rises with speed (normalized units per second)
+            d_cutoff: Cutoff frequency (Hz) for the velocity estimate
+            min_visibility: Visibility at or above which a landmark gets its full filter weight
+            max_gap: Seconds a lost pose is extrapolated before the filter resets
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.min_visibility = min_visibility
+        self.max_gap = max_gap
+        self.interpolated = 0  # Frames answered by extrapolation
+        self.reset()
+
+    def reset(self):
+        """Forget the filtered pose, e.g. when a new person steps in."""
+        self._position: Optional[np.ndarray] = None  # (33, 2) filtered x, y
+        self._velocity: Optional[np.ndarray] = None  # (33, 2) filtered x, y per second
+        self._attributes: Optional[np.ndarray] = None  # (33, C - 2) visibility and any further columns
+        self._buffer: Optional[LandmarkBuffer] = None
+        self._timestamp: Optional[float] = None
+        self._last_seen: Optional[float] = None
+
+    def __call__(self, landmarks: Optional[np.ndarray], timestamp: Optional[float] = None) -> Optional[np.ndarray]:
+        """Filter one frame's landmarks.
+
+        Args:
+            landmarks: Raw landmarks of shape (33, C) (x, y, visibility, ...) or None if no pose was detected
+            timestamp: Frame time in seconds (defaults to now)
+
+        Returns:
+            Smoothed landmarks of shape (33, C) in a reused float32 buffer slot,
+            an extrapolated pose while a lost pose is within max_gap, or None
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        if self._position is None:
+            if landmarks is None:
+                return None
+            self._position = landmarks[:, :2].astype(np.float64)
+            self._velocity = np.zeros_like(self._position)
+            self._attributes = landmarks[:, 2:].astype(np.float32)
+            self._buffer = LandmarkBuffer(columns=landmarks.shape[1])
+            self._timestamp = self._last_seen = timestamp
+            return self._output()
+
+        dt = timestamp - self._timestamp
+        if dt <= 0:
+            # Repeated or out-of-order timestamps carry no time to filter over; keep the filtered pose
+            return self._output()
+        if landmarks is None:
+            return self.predict(timestamp)
+        self._last_seen = timestamp
+
+        raw = landmarks[:, :2]
+        weight = np.clip(landmarks[:, 2] / self.min_visibility, 0.0, 1.0)[:, None]
+        velocity = (raw - self._position) / dt
+        self._velocity += _alpha(self.d_cutoff, dt) * weight * (velocity - self._velocity)
+        speed = np.linalg.norm(self._velocity, axis=1, keepdims=True)
+        alpha = _alpha(self.min_cutoff + self.beta * speed, dt)
+        self._position += alpha * weight * (raw - self._position)
+        self._attributes[:] = landmarks[:, 2:]
+        self._timestamp = timestamp
+        return self._output()
+
+    def predict(self, timestamp: float) -> Optional[np.ndarray]:
+        """Extrapolate the last filtered pose to a frame without a detection.
+
+        Returns:
+            Extrapolated landmarks, or None once the pose has been lost for more than max_gap
+        """
+        if self._position is None:
+            return None
+        if timestamp - self._last_seen > self.max_gap:
+            self.reset()
+            return None
+        dt = timestamp - self._timestamp
+        self._position += self._velocity * dt
+        self._timestamp = timestamp
+        self.interpolated += 1
+        return self._output()
+
+    def _output(self) -> np.ndarray:
+        output = self._buffer.next_slot()
+        output[:, :2] = self._position
+        output[:, 2:] = self._attributes
+        return output
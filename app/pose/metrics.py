@@ -0,0 +1,31 @@
+import bisect
+from typing import Dict, Sequence
+
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float]):
+        """Fixed-bucket histogram for cheap in-process metrics.
+
+        Args:
+            bounds: Sorted inclusive upper bounds of the buckets; larger values go to an overflow bucket
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        """Record one value."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> Dict:
+        """Return the count, mean and per-bucket counts."""
+        buckets = {f"le_{bound:g}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets['inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'buckets': buckets,
+        }
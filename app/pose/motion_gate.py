@@ -0,0 +1,154 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    def __init__(self, threshold: float = 2.0, max_skip: int = 5, size: Tuple[int, int] = (64, 48),
+                 extrapolate: bool = False):
+        """Skip pose inference on frames that barely differ from the last inferred one.
+
+        Frames are compared as small grayscale thumbnails; the mean absolute
+        difference (0-255) against the last inferred frame decides whether
+        the frame moved enough to need inference.
+
+        Args:
+            threshold: Mean absolute grayscale difference below which a frame is skipped
+            max_skip: Maximum consecutive skipped frames before inference is forced
+            size: (width, height) of the comparison thumbnail
+            extrapolate: Extrapolate skipped landmarks from the last two inferences instead of reusing them
+        """
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.size = size
+        self.extrapolate = extrapolate
+
+        self._reference: Optional[np.ndarray] = None  # Thumbnail of the frame _landmarks belong to
+        self._pending: Optional[np.ndarray] = None  # Thumbnail of the frame let through, until recorded
+        self._landmarks: Optional[np.ndarray] = None
+        self._velocity: Optional[np.ndarray] = None
+        self._recorded = False  # Whether _landmarks holds a result, which may be None (no pose)
+        self._skipped = 0
+        self.last_motion = 0.0
+        self.frames_seen = 0
+        self.frames_skipped = 0
+
+    @property
+    def skip_rate(self) -> float:
+        """Fraction of frames answered without inference."""
+        return self.frames_skipped / self.frames_seen if self.frames_seen else 0.0
+
+    def check(self, image: np.ndarray) -> Tuple[bool, Optional[np.ndarray]]:
+        """Decide whether a frame needs inference.
+
+        A frame that needs inference becomes the reference once its result is
+        passed to `record`. If inference fails and nothing is recorded, later
+        frames are still compared with the frame of the landmarks they reuse.
+
+        Args:
+            image: Input image in BGR format
+
+        Returns:
+            Tuple of (whether to run inference, reused or extrapolated landmarks when skipped)
+        """
+        self.frames_seen += 1
+        thumbnail = cv2.cvtColor(cv2.resize(image, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+        if self._recorded and self._skipped < self.max_skip:
+            self.last_motion = float(cv2.absdiff(thumbnail, self._reference).mean())
+            if self.last_motion < self.threshold:
+                self._skipped += 1
+                self.frames_skipped += 1
+                if self.extrapolate and self._velocity is not None:
+                    landmarks = self._landmarks.copy()
+                    landmarks[:, :2] += self._velocity * self._skipped
+                    return False, landmarks
+                return False, self._landmarks
+
+        self._pending = thumbnail
+        return True, None
+
+    def record(self, landmarks: Optional[np.ndarray]):
+        """Store the inference result for the frame `check` last let through.
+
+        The gate keeps its own copy; detectors return reused buffer slots that
+        later inferences overwrite.
+        """
+        if landmarks is not None and self._landmarks is not None:
+            self._velocity = (landmarks[:, :2] - self._landmarks[:, :2]) / (self._skipped + 1)
+        else:
+            self._velocity = None
+        self._landmarks = None if landmarks is None else landmarks.copy()
+        self._reference, self._pending = self._pending, None
+        self._recorded = True
+        self._skipped = 0
+
+    def process(self, image: np.ndarray,
+                detect: Callable[[np.ndarray], Optional[np.ndarray]]) -> Tuple[Optional[np.ndarray], bool]:
+        """Return landmarks for a frame, running `detect` only if the frame moved.
+
+        Args:
+            image: Input image in BGR format
+            detect: Inference function, e.g. PoseDetector.detect_landmarks
+
+        Returns:
+            Tuple of (landmarks or None, whether inference actually ran)
+        """
+        infer, landmarks = self.check(image)
+        if not infer:
+            return landmarks, False
+        landmarks = detect(image)
+        self.record(landmarks)
+        return landmarks, True
+
+    def stats(self) -> Dict:
+        """Return skip counters."""
+        return {'frames_seen': self.frames_seen, 'frames_skipped': self.frames_skipped,
+                'skip_rate': self.skip_rate, 'last_motion': self.last_motion}
+
+
+class FrameDedupCache:
+    def __init__(self, max_entries: int = 256):
+        """LRU of results keyed by a hash of the encoded frame, for clients that resend identical frames.
+
+        Args:
+            max_entries: Maximum number of cached results
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(payload: Union[bytes, str]) -> bytes:
+        """Hash an encoded frame (raw bytes or base64 text)."""
+        if isinstance(payload, str):
+            payload = payload.encode()
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Return the cached result for a frame hash, or None."""
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: bytes, result: Any):
+        """Cache a result, evicting the least recently used one when full."""
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Return size and hit counters."""
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,229 @@
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from app.pose.detector_pool import DetectorPool
+from app.pose.exercise_detector import ExerciseDetector, analyze_sessions
+from app.pose.pose_backends import MediaPipeBackend
+from app.pose.pose_detector import PoseDetector, landmark_box
+
+Box = Tuple[float, float, float, float]  # Normalized (x0, y0, x1, y1)
+
+
+def _overlaps(boxes: np.ndarray, others: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Pairwise intersection areas (N, M) and the areas of both box sets
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    others = np.asarray(others, dtype=np.float64).reshape(-1, 4)
+    width = np.minimum(boxes[:, None, 2], others[None, :, 2]) - np.maximum(boxes[:, None, 0], others[None, :, 0])
+    height = np.minimum(boxes[:, None, 3], others[None, :, 3]) - np.maximum(boxes[:, None, 1], others[None, :, 1])
+    area = lambda b: (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return np.clip(width, 0, None) * np.clip(height, 0, None), area(boxes), area(others)
+
+
+def box_iou(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Intersection over union of every pair of boxes.
+
+    Args:
+        boxes: Array of shape (N, 4) with (x0, y0, x1, y1) boxes
+        others: Array of shape (M, 4)
+
+    Returns:
+        Array of shape (N, M)
+    """
+    intersection, area, other_area = _overlaps(boxes, others)
+    union = area[:, None] + other_area[None, :] - intersection
+    return np.where(union > 0, intersection / np.where(union > 0, union, 1), 0.0)
+
+
+class HogPersonDetector:
+    def __init__(self, max_width: int = 640, min_score: float = 0.3, nms_threshold: float = 0.4,
+                 padding: float = 0.1):
+        """Person boxes from OpenCV's built-in HOG people detector.
+
+        Needs no model download. Frames are downscaled to `max_width` first;
+        the multi-person pipeline only runs it every few frames.
+
+        Args:
+            max_width: Width frames are downscaled to before detection
+            min_score: Minimum SVM score of a kept box
+            nms_threshold: IoU above which overlapping boxes are merged
+            padding: Padding added around each box, as a fraction of its size
+        """
+        self.max_width = max_width
+        self.min_score = min_score
+        self.nms_threshold = nms_threshold
+        self.padding = padding
+        self._hog = cv2.HOGDescriptor()
+        self._hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """Return normalized person boxes of shape (N, 4)."""
+        height, width = image.shape[:2]
+        scale = min(1.0, self.max_width / width)
+        small = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        rects, scores = self._hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if len(rects) == 0:
+            return np.empty((0, 4))
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        keep = cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), self.min_score, self.nms_threshold)
+        rects = np.asarray(rects, dtype=np.float64)[np.asarray(keep, dtype=np.intp).reshape(-1)]
+        x, y, w, h = rects.T
+        boxes = np.stack([x - w * self.padding, y - h * self.padding,
+                          x + w * (1 + self.padding), y + h * (1 + self.padding)], axis=1)
+        return np.clip(boxes / [small.shape[1], small.shape[0], small.shape[1], small.shape[0]], 0.0, 1.0)
+
+
+@dataclass
+class PersonTrack:
+    track_id: int
+    box: Box
+    exercise: ExerciseDetector
+    landmarks: Optional[np.ndarray] = None  # Latest landmarks, owned by the track
+    missed: int = 0  # Consecutive frames without a pose in the track's box
+
+
+class IouTracker:
+    def __init__(self, exercise_name: str = 'squat', iou_threshold: float = 0.3, max_missed: int = 15,
+                 duplicate_iou: float = 0.6, covered: float = 0.6):
+        """Assign stable IDs to people across frames by box overlap.
+
+        Detection boxes are matched to track boxes with an optimal assignment
+        on IoU. Landmark boxes are tighter than person detector boxes, so a
+        detection that mostly contains an existing track's box does not start a
+        new track even below the IoU threshold. Every track carries its own ExerciseDetector, so reps and
+        phases are counted per person.
+
+        Args:
+            exercise_name: Exercise every new track is analyzed for
+            iou_threshold: Minimum IoU for a detection to continue a track
+            max_missed: Frames a track survives without a pose before it is dropped
+            duplicate_iou: IoU above which two tracks are taken to follow the same person
+            covered: Share of a track box inside an unmatched detection that marks the detection as known
+        """
+        self.exercise_name = exercise_name
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.duplicate_iou = duplicate_iou
+        self.covered = covered
+        self.tracks: List[PersonTrack] = []
+        self._ids = itertools.count(1)
+
+    def match(self, boxes: np.ndarray):
+        """Associate detection boxes with tracks and start tracks for unmatched ones.
+
+        Tracks that currently have no pose move to their matched detection box;
+        tracks with a pose keep their tighter landmark box.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        matched = np.zeros(len(boxes), dtype=bool)
+        if self.tracks and len(boxes):
+            track_boxes = [track.box for track in self.tracks]
+            iou = box_iou(track_boxes, boxes)
+            rows, columns = linear_sum_assignment(-iou)
+            for row, column in zip(rows, columns):
+                if iou[row, column] >= self.iou_threshold:
+                    matched[column] = True
+                    if self.tracks[row].missed:
+                        self.tracks[row].box = tuple(boxes[column].tolist())
+            intersection, track_area, _ = _overlaps(track_boxes, boxes)
+            matched |= (intersection / np.maximum(track_area, 1e-9)[:, None] >= self.covered).any(axis=0)
+        for box in boxes[~matched]:
+            self.tracks.append(PersonTrack(next(self._ids), tuple(box.tolist()), ExerciseDetector(self.exercise_name)))
+
+    def update(self, track: PersonTrack, landmarks: Optional[np.ndarray]):
+        """Record the pose found in a track's box this frame (None if none was found)."""
+        box = landmark_box(landmarks)
+        if box is None:
+            track.missed += 1
+            return
+        track.landmarks = landmarks
+        track.box = box
+        track.missed = 0
+
+    def prune(self):
+        """Drop lost tracks and the newer of two tracks that converged on one person."""
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        if len(self.tracks) < 2:
+            return
+        iou = box_iou([track.box for track in self.tracks], [track.box for track in self.tracks])
+        duplicate = np.triu(iou > self.duplicate_iou, k=1).any(axis=0)  # Tracks are ordered oldest first
+        self.tracks = [track for track, drop in zip(self.tracks, duplicate) if not drop]
+
+
+class MultiPersonPipeline:
+    def __init__(self, exercise_name: str = 'squat', workers: Optional[int] = None, detect_every: int = 10,
+                 person_detector: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                 detector_factory: Optional[Callable[[], PoseDetector]] = None, max_missed: int = 15):
+        """Pose and exercise analysis for every person in a shared camera view.
+
+        A person detector finds people every `detect_every` frames; in
+        between, each person's box follows their landmarks. Every box is
+        cropped and run through a pool of PoseDetector instances on `workers`
+        threads, and all people's exercise state is updated in one batched
+        evaluation.
+
+        Args:
+            exercise_name: Exercise analyzed for every person
+            workers: Inference threads and pooled detectors (defaults to the CPU count)
+            detect_every: Frames between person detector runs
+            person_detector: Callable returning normalized (N, 4) person boxes (defaults to HOG)
+            detector_factory: Callable creating pooled detectors (defaults to MediaPipe in static
+                image mode, since one detector sees crops of different people)
+            max_missed: Frames a person may go without a pose before their track is dropped
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.detect_every = detect_every
+        self.person_detector = person_detector or HogPersonDetector().detect
+        factory = detector_factory or (lambda: PoseDetector(backend=MediaPipeBackend(static_image_mode=True)))
+        self.pool = DetectorPool(size=self.workers, max_uses=100000, factory=factory)
+        self.tracker = IouTracker(exercise_name, max_missed=max_missed)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pose-person")
+        self.frames = 0
+
+    def _detect_crop(self, image: np.ndarray, box: Box) -> Optional[np.ndarray]:
+        with self.pool.checkout() as detector:
+            landmarks = detector.detect_in_box(image, box)
+            # Pooled detectors reuse their buffers for the next crop
+            return None if landmarks is None else landmarks.copy()
+
+    def process(self, image: np.ndarray) -> List[Dict]:
+        """Detect, track and analyze every person in a frame.
+
+        Args:
+            image: Input image in BGR format
+
+        Returns:
+            One entry per tracked person with id, box, landmarks (None while
+            their pose is lost), rep_count and feedback
+        """
+        if self.frames % self.detect_every == 0 or not self.tracker.tracks:
+            self.tracker.match(self.person_detector(image))
+        self.frames += 1
+
+        tracks = list(self.tracker.tracks)
+        for track, landmarks in zip(tracks, self._executor.map(lambda t: self._detect_crop(image, t.box), tracks)):
+            self.tracker.update(track, landmarks)
+        self.tracker.prune()
+
+        posed = [track for track in self.tracker.tracks if track.missed == 0]
+        analyses = dict(zip((track.track_id for track in posed),
+                            analyze_sessions([track.exercise for track in posed],
+                                             [track.landmarks[None] for track in posed])))
+        return [{
+            'id': track.track_id,
+            'box': list(track.box),
+            'landmarks': track.landmarks if track.missed == 0 else None,
+            'rep_count': track.exercise.rep_count,
+            'feedback': analyses.get(track.track_id, {}).get('feedback', track.exercise.feedback),
+        } for track in self.tracker.tracks]
+
+    def close(self):
+        """Stop the inference threads and release the pooled detectors."""
+        self._executor.shutdown(wait=True)
+        self.pool.close()
@@ -0,0 +1,302 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Union
+
+import cv2
+import numpy as np
+
+
+class LatestValue:
+    def __init__(self):
+        """Single-slot queue between two pipeline stages that keeps only the newest value.
+
+        `put` never blocks: a value the consumer has not taken yet is
+        replaced and counted as dropped, so a slow consumer always works on
+        the freshest item instead of a backlog of stale ones.
+        """
+        self._condition = threading.Condition()
+        self._value: Any = None
+        self._pending = False
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, value: Any):
+        """Publish a value, replacing one that was not taken yet."""
+        with self._condition:
+            if self._pending:
+                self.dropped += 1
+            self._value = value
+            self._pending = True
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Take the newest value, waiting for one to be published.
+
+        Args:
+            timeout: Seconds to wait (None waits until a value arrives or the queue is closed)
+
+        Returns:
+            The value, or None on timeout or once the queue is closed and drained
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending or self.closed, timeout):
+                return None
+            if not self._pending:
+                return None
+            value, self._value, self._pending = self._value, None, False
+            return value
+
+    def close(self):
+        """Wake the consumer; values published before closing can still be taken."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class StageMeter:
+    def __init__(self, window: float = 1.0):
+        """Throughput and busy time of one pipeline stage.
+
+        Args:
+            window: Seconds of recent completions the FPS is computed over
+        """
+        self.window = window
+        self.frames = 0
+        self.busy = 0.0
+        self._completed = deque()
+        self._lock = threading.Lock()
+
+    def record(self, started: float, finished: float):
+        """Record one item processed between two `time.perf_counter()` readings."""
+        with self._lock:
+            self.frames += 1
+            self.busy += finished - started
+            self._completed.append(finished)
+            while self._completed[0] < finished - self.window:
+                self._completed.popleft()
+
+    @property
+    def fps(self) -> float:
+        """Items completed per second over the recent window."""
+        with self._lock:
+            if len(self._completed) < 2:
+                return 0.0
+            span = self._completed[-1] - self._completed[0]
+            return (len(self._completed) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self) -> Dict:
+        """Return the recent FPS, processed count and mean busy time per item in ms."""
+        return {
+            'fps': self.fps,
+            'frames': self.frames,
+            'busy_ms': self.busy * 1000 / self.frames if self.frames else 0.0,
+        }
+
+
+@dataclass
+class FramePacket:
+    index: int
+    captured: float  # time.perf_counter() when the frame was read
+    image: np.ndarray
+    result: Any = None
+
+
+def open_capture(source: Union[int, str], width: Optional[int] = None,
+                 height: Optional[int] = None) -> cv2.VideoCapture:
+    """Open a camera index or a video file.
+
+    Args:
+        source: Camera index or path of a video file
+        width: Requested camera frame width (ignored for files)
+        height: Requested camera frame height (ignored for files)
+
+    Returns:
+        Opened cv2.VideoCapture
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise RuntimeError(f"Cannot open video source {source!r}")
+    if isinstance(source, int):
+        if width:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return capture
+
+
+def source_fps(capture: cv2.VideoCapture) -> Optional[float]:
+    """Frame rate a video file was recorded at, or None if the container does not say."""
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    return fps if fps and fps > 0 else None
+
+
+def format_stats(stats: Dict) -> str:
+    """Summarize `FramePipeline.stats()` as one line per stage."""
+    lines = [f"{name:<10} {stage['fps']:6.1f} fps  {stage['frames']:6d} frames  {stage['busy_ms']:7.2f} ms busy"
+             f"  {stage.get('dropped', 0):6d} dropped"
+             for name, stage in stats.items() if isinstance(stage, dict)]
+    lines.append(f"capture to display latency {stats['latency_ms']:.1f} ms")
+    return "\n".join(lines)
+
+
+class FramePipeline:
+    def __init__(self, source, infer: Callable[[np.ndarray], Any],
+                 render: Callable[[np.ndarray, Any], np.ndarray],
+                 show: Optional[Callable[[np.ndarray], None]] = None,
+                 on_key: Optional[Callable[[int, Any], bool]] = None,
+                 mirror: bool = True, pace_fps: Optional[float] = None):
+        """Capture, inference and render stages running concurrently.
+
+        A capture thread reads frames, an inference thread runs `infer` on
+        the newest captured frame, and `run` renders and shows the newest
+        inferred frame on the calling thread (OpenCV windows must be driven
+        from one thread). Stages are connected by LatestValue queues, so a
+        slow stage drops stale frames instead of stalling the others and
+        throughput is set by the slowest stage rather than the sum of all.
+
+        `infer` runs on the inference thread while the previous result is
+        being rendered; results must not share buffers that `infer`
+        overwrites later (copy detector buffer slots before returning them).
+
+        Args:
+            source: Object with a cv2.VideoCapture-style `read()` returning (success, frame)
+            infer: Callable mapping a BGR frame to a result (detection plus any stateful analysis)
+            render: Callable drawing a result onto its frame and returning the image to show
+            show: Callable displaying a rendered image; None runs headless
+            on_key: Called with each key press and the displayed result; returning False stops
+                the pipeline ('q' always stops it)
+            mirror: Flip frames horizontally on capture
+            pace_fps: Read at most this many frames per second, for video files standing in for
+                a camera (None reads as fast as the source delivers)
+        """
+        self.source = source
+        self.infer = infer
+        self.render = render
+        self.show = show
+        self.on_key = on_key
+        self.mirror = mirror
+        self.pace_fps = pace_fps
+
+        self.frames = LatestValue()
+        self.results = LatestValue()
+        self.meters = {'capture': StageMeter(), 'inference': StageMeter(), 'render': StageMeter()}
+        self.latency = StageMeter()  # Capture to display, recorded per displayed frame
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._threads = []
+
+    def _capture(self):
+        interval = 1.0 / self.pace_fps if self.pace_fps else 0.0
+        next_read = time.perf_counter()
+        index = 0
+        try:
+            while not self._stop.is_set():
+                if interval:
+                    delay = next_read - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_read = max(next_read + interval, time.perf_counter())  # No catch-up burst after a stall
+                started = time.perf_counter()
+                success, frame = self.source.read()
+                if not success:
+                    break
+                if self.mirror:
+                    frame = cv2.flip(frame, 1)
+                finished = time.perf_counter()
+                self.meters['capture'].record(started, finished)
+                self.frames.put(FramePacket(index, finished, frame))
+                index += 1
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.frames.close()
+
+    def _inference(self):
+        try:
+            while not self._stop.is_set():
+                packet = self.frames.get()
+                if packet is None:
+                    break
+                started = time.perf_counter()
+                packet.result = self.infer(packet.image)
+                self.meters['inference'].record(started, time.perf_counter())
+                self.results.put(packet)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.results.close()
+
+    def run(self, max_frames: Optional[int] = None) -> Dict:
+        """Run until the source ends, 'q' is pressed or `on_key` returns False.
+
+        Args:
+            max_frames: Stop after rendering this many frames
+
+        Returns:
+            Per-stage statistics (see `stats`)
+        """
+        self._threads = [threading.Thread(target=self._capture, name="pipeline-capture", daemon=True),
+                         threading.Thread(target=self._inference, name="pipeline-inference", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+        rendered = 0
+        try:
+            while max_frames is None or rendered < max_frames:
+                # Windowed runs poll so the window keeps handling events while inference is slow
+                packet = self.results.get(timeout=0.01 if self.show else None)
+                if packet is None:
+                    if self.results.closed:
+                        break
+                    if self._poll_keys(None):
+                        continue
+                    break
+
+                started = time.perf_counter()
+                image = self.render(packet.image, packet.result)
+                if self.show is not None:
+                    self.show(image)
+                finished = time.perf_counter()
+                self.meters['render'].record(started, finished)
+                self.latency.record(packet.captured, finished)
+                rendered += 1
+                if not self._poll_keys(packet.result):
+                    break
+        finally:
+            self.stop()
+        if self._error is not None:
+            raise self._error
+        return self.stats()
+
+    def _poll_keys(self, result: Any) -> bool:
+        # Returns whether to keep running
+        if self.show is None:
+            return True
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
+            return False
+        if key != 0xFF and self.on_key is not None:
+            return self.on_key(key, result) is not False
+        return True
+
+    def stop(self):
+        """Stop the capture and inference threads and wait for them to finish."""
+        self._stop.set()
+        self.frames.close()
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> Dict:
+        """Return per-stage FPS, processed frames and busy time, dropped frames and latency."""
+        stats = {name: meter.snapshot() for name, meter in self.meters.items()}
+        stats['capture']['dropped'] = self.frames.dropped
+        stats['inference']['dropped'] = self.results.dropped
+        latency = self.latency.snapshot()
+        stats['latency_ms'] = latency['busy_ms']
+        return stats
+
+    def describe(self) -> str:
+        """One-line per-stage FPS summary for on-screen display."""
+        return "  ".join(f"{name.capitalize()}: {meter.fps:.0f}" for name, meter in self.meters.items())
@@ -0,0 +1,292 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Mapping, Optional, Tuple, Union
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from app.pose.landmark_buffer import NUM_LANDMARKS, VISIBILITY, Z, read_landmark_list
+
+# MoveNet's 17 COCO keypoints for each of the 33 BlazePose landmarks. Landmarks MoveNet
+# does not estimate (eye corners, mouth, hands, feet) take the nearest keypoint's
+# position with zero visibility.
+_COCO_SOURCE = np.array([0, 1, 1, 1, 2, 2, 2, 3, 4, 0, 0, 5, 6, 7, 8, 9, 10,
+                         9, 10, 9, 10, 9, 10, 11, 12, 13, 14, 15, 16, 15, 16, 15, 16])
+_COCO_ESTIMATED = np.zeros(NUM_LANDMARKS, dtype=bool)
+_COCO_ESTIMATED[[0, 2, 5, 7, 8, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]] = True
+_TORSO = [11, 12, 23, 24]
+
+# Per model format: default square input size and the factor applied to 0-255 pixels for float inputs
+ONNX_FORMATS: Dict[str, Tuple[int, float]] = {
+    'blazepose': (256, 1 / 255),  # BlazePose GHUM landmark model export (39 x 5 landmark output)
+    'movenet': (192, 1.0),        # MoveNet single-pose Lightning/Thunder export ((1, 1, 17, 3) output)
+}
+
+
+class PoseBackend(ABC):
+    """Pose inference engine behind PoseDetector.
+
+    Backends write 33 BlazePose-layout landmarks (x, y, visibility, z) into a
+    caller-provided array, so detector features (ROI tracking, smoothing,
+    buffer reuse) work the same on every engine. Model complexity 0/1/2 selects
+    the backend's lite/full/heavy variant where it has one.
+    """
+    name = 'base'
+
+    def __init__(self, model_complexity: int = 1):
+        self.model_complexity = model_complexity
+
+    def set_model_complexity(self, model_complexity: int):
+        """Switch to the model variant for a complexity level."""
+        self.model_complexity = model_complexity
+
+    def preload(self, model_complexities: Iterable[int]):
+        """Load the given model variants up front."""
+
+    @abstractmethod
+    def detect(self, image: np.ndarray, out: np.ndarray) -> bool:
+        """Detect one pose.
+
+        Args:
+            image: Input image in BGR format
+            out: Array of shape (33, 4) the landmarks are written into
+
+        Returns:
+            Whether a pose was found; `out` is only meaningful if True
+        """
+
+    def close(self):
+        """Release the models."""
+
+
+class MediaPipeBackend(PoseBackend):
+    name = 'mediapipe'
+
+    def __init__(self, model_complexity: int = 1, min_detection_confidence: float = 0.5,
+                 min_tracking_confidence: float = 0.5, static_image_mode: bool = False):
+        """MediaPipe Pose lite (0), full (1) and heavy (2) models.
+
+        Loaded models are kept, so switching back and forth only pays the
+        model load once per complexity.
+
+        Args:
+            model_complexity: MediaPipe Pose model (0 lite, 1 full, 2 heavy)
+            min_detection_confidence: Minimum confidence value for detection
+            min_tracking_confidence: Minimum confidence value for tracking
+            static_image_mode: Detect the pose in every frame instead of tracking it from the
+                previous one, for detectors that see unrelated images (e.g. crops of different people)
+        """
+        super().__init__(model_complexity)
+        self.static_image_mode = static_image_mode
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self._graphs: Dict[int, object] = {}
+        self.pose = self._graph(model_complexity)
+
+    def _graph(self, model_complexity: int):
+        if model_complexity not in self._graphs:
+            self._graphs[model_complexity] = mp.solutions.pose.Pose(
+                static_image_mode=self.static_image_mode,
+                model_complexity=model_complexity,
+                enable_segmentation=False,
+                min_detection_confidence=self.min_detection_confidence,
+                min_tracking_confidence=self.min_tracking_confidence
+            )
+        return self._graphs[model_complexity]
+
+    def set_model_complexity(self, model_complexity: int):
+        if model_complexity != self.model_complexity:
+            self.pose = self._graph(model_complexity)
+            self.model_complexity = model_complexity
+
+    def preload(self, model_complexities: Iterable[int]):
+        for model_complexity in model_complexities:
+            self._graph(model_complexity)
+
+    def detect(self, image: np.ndarray, out: np.ndarray) -> bool:
+        results = self.pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        if not results.pose_landmarks:
+            return False
+        read_landmark_list(results.pose_landmarks, out)
+        return True
+
+    def close(self):
+        for graph in self._graphs.values():
+            graph.close()
+        self._graphs.clear()
+
+
+class OnnxPoseBackend(PoseBackend):
+    name = 'onnx'
+
+    def __init__(self, models: Union[str, Mapping[int, str]], model_format: str = 'movenet',
+                 model_complexity: Optional[int] = None, intra_op_threads: int = 1,
+                 inter_op_threads: int = 1, min_score: float = 0.5):
+        """ONNX Runtime CPU backend for exported BlazePose or MoveNet models.
+
+        Frames are letterboxed to the model's square input. MoveNet finds the
+        person itself. The BlazePose landmark model has no detector stage and
+        expects the person to fill its input, so it only suits callers that
+        always pass person crops (e.g. PoseDetector.detect_in_box with boxes
+        from a person detector); create_backend, which builds full-frame
+        backends, rejects it. int8 variants (see `quantize_model`) load like
+        any other model file.
+
+        Args:
+            models: Model path, or model paths keyed by complexity (e.g. {0: int8 model, 1: fp32 model})
+            model_format: Output layout, a key of ONNX_FORMATS
+            model_complexity: Initial complexity (defaults to the highest available)
+            intra_op_threads: Threads ONNX Runtime uses within an operator
+            inter_op_threads: Threads ONNX Runtime uses across operators
+            min_score: Minimum pose score (BlazePose) or mean torso keypoint score (MoveNet)
+        """
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The ONNX pose backend requires onnxruntime (pip install onnxruntime)") from e
+        if model_format not in ONNX_FORMATS:
+            raise ValueError(f"Unknown ONNX model format '{model_format}', expected one of {list(ONNX_FORMATS)}")
+
+        self.models = {1: models} if isinstance(models, str) else dict(models)
+        if not self.models:
+            raise ValueError("At least one ONNX model is required")
+        super().__init__(max(self.models) if model_complexity is None else model_complexity)
+        self.model_format = model_format
+        self.min_score = min_score
+        self._ort = onnxruntime
+        self._options = onnxruntime.SessionOptions()
+        self._options.intra_op_num_threads = intra_op_threads
+        self._options.inter_op_num_threads = inter_op_threads
+        self._options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        self._options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._sessions: Dict[str, Tuple[object, str, np.ndarray, bool]] = {}
+        self._session = self._load(model_complexity=self.model_complexity)
+
+    def _model_path(self, model_complexity: int) -> str:
+        # Fall back to the closest available variant, preferring the cheaper one
+        closest = min(self.models, key=lambda level: (abs(level - model_complexity), level))
+        return self.models[closest]
+
+    def _load(self, model_complexity: int):
+        path = self._model_path(model_complexity)
+        if path not in self._sessions:
+            session = self._ort.InferenceSession(path, sess_options=self._options,
+                                                 providers=['CPUExecutionProvider'])
+            model_input = session.get_inputs()[0]
+            channels_first = len(model_input.shape) == 4 and model_input.shape[1] == 3
+            spatial = model_input.shape[2:] if channels_first else model_input.shape[1:3]
+            default_size, _ = ONNX_FORMATS[self.model_format]
+            size = spatial[0] if isinstance(spatial[0], int) else default_size
+            dtype = {'tensor(float)': np.float32, 'tensor(int32)': np.int32,
+                     'tensor(uint8)': np.uint8}.get(model_input.type, np.float32)
+            # Input tensor reused across frames, NHWC; channels-first models get a transposed view
+            tensor = np.zeros((1, size, size, 3), dtype=dtype)
+            self._sessions[path] = (session, model_input.name, tensor, channels_first)
+        return self._sessions[path]
+
+    def set_model_complexity(self, model_complexity: int):
+        if model_complexity != self.model_complexity:
+            self._session = self._load(model_complexity)
+            self.model_complexity = model_complexity
+
+    def preload(self, model_complexities: Iterable[int]):
+        for model_complexity in model_complexities:
+            self._load(model_complexity)
+
+    def _letterbox(self, image: np.ndarray, tensor: np.ndarray) -> Tuple[float, float, float, float]:
+        """Fit a BGR frame into the square RGB input tensor, keeping its aspect ratio.
+
+        Returns:
+            (left, top, width, height) of the frame within the input, in input pixels
+        """
+        size = tensor.shape[1]
+        height, width = image.shape[:2]
+        scale = size / max(height, width)
+        new_width, new_height = max(1, round(width * scale)), max(1, round(height * scale))
+        left, top = (size - new_width) // 2, (size - new_height) // 2
+        resized = cv2.cvtColor(cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA),
+                               cv2.COLOR_BGR2RGB)
+        tensor.fill(0)
+        if tensor.dtype == np.float32:
+            _, pixel_scale = ONNX_FORMATS[self.model_format]
+            np.multiply(resized, pixel_scale, out=tensor[0, top:top + new_height, left:left + new_width],
+                        casting='unsafe')
+        else:
+            tensor[0, top:top + new_height, left:left + new_width] = resized
+        return left, top, new_width, new_height
+
+    def detect(self, image: np.ndarray, out: np.ndarray) -> bool:
+        session, input_name, tensor, channels_first = self._session
+        left, top, width, height = self._letterbox(image, tensor)
+        feed = np.ascontiguousarray(tensor.transpose(0, 3, 1, 2)) if channels_first else tensor
+        outputs = session.run(None, {input_name: feed})
+        size = tensor.shape[1]
+
+        if self.model_format == 'movenet':
+            keypoints = next(output for output in outputs if output.shape[-2:] == (17, 3)).reshape(17, 3)
+            # (y, x, score) normalized to the input
+            out[:, 0] = (keypoints[_COCO_SOURCE, 1] * size - left) / width
+            out[:, 1] = (keypoints[_COCO_SOURCE, 0] * size - top) / height
+            out[:, VISIBILITY] = np.where(_COCO_ESTIMATED, keypoints[_COCO_SOURCE, 2], 0.0)
+            out[:, Z] = 0.0
+            return out[_TORSO, VISIBILITY].mean() >= self.min_score
+
+        landmarks = next(output for output in outputs if output.size == 195).reshape(39, 5)[:NUM_LANDMARKS]
+        flags = [output for output in outputs if output.size == 1]
+        if flags and float(flags[0].reshape(())) < self.min_score:
+            return False
+        # (x, y, z) in input pixels, visibility as a logit
+        out[:, 0] = (landmarks[:, 0] - left) / width
+        out[:, 1] = (landmarks[:, 1] - top) / height
+        out[:, VISIBILITY] = 1 / (1 + np.exp(-landmarks[:, 3]))
+        out[:, Z] = landmarks[:, 2] / width
+        return True
+
+    def close(self):
+        self._sessions.clear()
+        self._session = None
+
+
+def quantize_model(source: str, target: str, per_channel: bool = True):
+    """Write an int8 dynamically quantized copy of an fp32 ONNX pose model.
+
+    Weights are stored as int8 and activations are quantized at run time, so
+    no calibration data is needed. Check landmark agreement with
+    benchmarks/bench_pose_backends.py before using the result.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8, per_channel=per_channel)
+
+
+def parse_models(spec: str) -> Union[str, Dict[int, str]]:
+    """Parse a model setting: a single path, or comma-separated complexity=path pairs."""
+    if '=' not in spec:
+        return spec.strip()
+    models = {}
+    for item in spec.split(','):
+        level, path = item.split('=', 1)
+        models[int(level)] = path.strip()
+    return models
+
+
+def create_backend(name: str = 'mediapipe', model_complexity: int = 1, **options) -> PoseBackend:
+    """Create a pose backend by name.
+
+    Args:
+        name: 'mediapipe' or 'onnx'
+        model_complexity: Initial model complexity
+        **options: Backend-specific constructor arguments
+
+    Returns:
+        The backend instance
+    """
+    if name == MediaPipeBackend.name:
+        return MediaPipeBackend(model_complexity, **options)
+    if name == OnnxPoseBackend.name:
+        if options.get('model_format', 'movenet') == 'blazepose':
+            # Without a person detector, frames where the ROI is lost would run the
+            # landmark model on the whole image and return garbage
+            raise ValueError("The BlazePose ONNX landmark model needs person crops and has no "
+                             "detector stage; use a MoveNet model for full frames")
+        return OnnxPoseBackend(model_complexity=model_complexity, **options)
+    raise ValueError(f"Unknown pose backend '{name}'")
@@ -1,6 +1,93 @@
 import numpy as np
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Sequence
 import cv2
+from scipy.spatial import cKDTree
+from app.pose.joint_angles import AngleTable, joint_angles
+from app.pose.pose_normalization import normalize_landmarks, normalized_similarity
+from app.pose.rep_dtw import RepLibrary
+
+class ReferenceLibrary:
+    def __init__(self, angle_table: AngleTable, index_landmarks: Optional[Sequence[int]] = None):
+        """Library of reference poses searchable by nearest neighbour.
+
+        Poses are normalized and their joint angles computed once when added.
+        A KD-tree over the normalized (x, y) coordinates of `index_landmarks`
+        finds candidates, which are then re-scored with the same
+        visibility-weighted similarity as PoseComparator.calculate_pose_similarity.
+        The similarity scores every landmark, so by default the search vector
+        covers all of them; with a subset, the best matches can fall outside
+        the candidates.
+
+        Args:
+            angle_table: Joint angles to precompute for every reference
+            index_landmarks: Landmarks whose coordinates form the search vector (None uses all 33)
+        """
+        self.angle_table = angle_table
+        self.index_landmarks = list(range(33)) if index_landmarks is None else list(index_landmarks)
+        self.labels: List[Optional[str]] = []
+        self._normalized = np.empty((0, 33, 3))
+        self._angles = np.empty((0, len(angle_table)))
+        self._tree: Optional[cKDTree] = None
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def add(self, poses: np.ndarray, labels: Optional[Sequence[Optional[str]]] = None):
+        """Add one pose (33, C) or a batch (N, 33, C) of reference poses.
+
+        Args:
+            poses: Reference landmarks with visibility in the third column; further columns are ignored
+            labels: Optional label per pose, e.g. the exercise phase it shows
+        """
+        poses = np.asarray(poses)[..., :3].reshape(-1, 33, 3)
+        labels = list(labels) if labels is not None else [None] * len(poses)
+        if len(labels) != len(poses):
+            raise ValueError(f"Got {len(labels)} labels for {len(poses)} poses")
+        self._normalized = np.concatenate([self._normalized, normalize_landmarks(poses)])
+        self._angles = np.concatenate([self._angles, joint_angles(poses, self.angle_table)])
+        self.labels.extend(labels)
+        self._tree = None
+
+    def _vectors(self, normalized: np.ndarray) -> np.ndarray:
+        return normalized[..., self.index_landmarks, :2].reshape(*normalized.shape[:-2], -1)
+
+    def build(self):
+        """Build the search index; called on the first query after poses were added."""
+        self._tree = cKDTree(self._vectors(self._normalized), leafsize=32)
+
+    def query(self, pose: np.ndarray, k: int = 5, candidates: Optional[int] = None) -> List[Dict]:
+        """Find the reference poses most similar to a pose.
+
+        Args:
+            pose: Landmarks of shape (33, 3)
+            k: Number of matches to return
+            candidates: Nearest neighbours re-scored for the final ranking (default 8 * k, at least 32)
+
+        Returns:
+            Up to k matches ordered by similarity, each with index, label,
+            similarity (0-1) and angle_differences
+        """
+        if not self.labels:
+            return []
+        if self._tree is None:
+            self.build()
+
+        pose = np.asarray(pose)
+        normalized = normalize_landmarks(pose)
+        candidates = min(len(self.labels), candidates or max(8 * k, 32))
+        _, nearest = self._tree.query(self._vectors(normalized), k=candidates)
+        nearest = np.atleast_1d(nearest)
+
+        similarity = normalized_similarity(self._normalized[nearest], normalized)
+
+        order = np.argsort(-similarity)[:k]
+        angle_differences = np.abs(self._angles[nearest[order]] - joint_angles(pose, self.angle_table))
+        return [{
+            'index': int(nearest[i]),
+            'label': self.labels[nearest[i]],
+            'similarity': float(similarity[i]),
+            'angle_differences': self.angle_table.to_dict(differences),
+        } for i, differences in zip(order, angle_differences)]
 
 class PoseComparator:
     def __init__(self, reference_pose: np.ndarray = None):
@@ -10,6 +97,9 @@ class PoseComparator:
             reference_pose: Numpy array of shape (33, 3) containing the reference pose landmarks
         """
         self.reference_pose = reference_pose
+        # Normalized reference pose and its joint angles, computed once per reference
+        self._reference_features = None
+        self._reference_features_for = None
         
         # Define important joint connections for angle calculations
         self.joint_connections = {
@@ -19,6 +109,11 @@ class PoseComparator:
             'right_leg': [24, 26, 28],     # Hip, Knee, Ankle
             'torso': [11, 23, 24, 12]      # Shoulders and Hips
         }
+        # Three-point connections form the angles compared between poses
+        self.angle_table = AngleTable({name: indices for name, indices in self.joint_connections.items()
+                                       if len(indices) == 3})
+        self.reference_library = ReferenceLibrary(self.angle_table)
+        self.rep_library = RepLibrary()
     
     def set_reference_pose(self, reference_pose: np.ndarray):
         """Set the reference pose for comparison.
@@ -39,40 +134,7 @@ class PoseComparator:
         """
         if landmarks is None or len(landmarks) == 0:
             return None
-            
-        # Convert to numpy array if not already
-        landmarks = np.array(landmarks)
-        
-        # Get torso size as a scale factor
-        left_shoulder = landmarks[11, :2]  # Left shoulder
-        right_shoulder = landmarks[12, :2]  # Right shoulder
-        left_hip = landmarks[23, :2]  # Left hip
-        right_hip = landmarks[24, :2]  # Right hip
-        
-        # Calculate center of torso
-        center_x = (left_shoulder[0] + right_shoulder[0] + left_hip[0] + right_hip[0]) / 4
-        center_y = (left_shoulder[1] + right_shoulder[1] + left_hip[1] + right_hip[1]) / 4
-        center = np.array([center_x, center_y])
-        
-        # Calculate scale factor using distance between shoulders (or hips if shoulders not visible)
-        shoulder_dist = np.linalg.norm(left_shoulder - right_shoulder)
-        hip_dist = np.linalg.norm(left_hip - right_hip)
-        
-        # Use the average of shoulder and hip distances if both are valid
-        if shoulder_dist > 0 and hip_dist > 0:
-            scale = (shoulder_dist + hip_dist) / 2
-        else:
-            scale = max(shoulder_dist, hip_dist)
-        
-        # If scale is still 0 (unlikely), set a default small value to avoid division by zero
-        if scale == 0:
-            scale = 0.1
-        
-        # Normalize landmarks
-        normalized_landmarks = landmarks.copy()
-        normalized_landmarks[:, :2] = (landmarks[:, :2] - center) / scale
-        
-        return normalized_landmarks
+        return normalize_landmarks(landmarks)
     
     def calculate_pose_similarity(self, pose1: np.ndarray, pose2: np.ndarray) -> float:
         """Calculate similarity score between two poses.
@@ -87,25 +149,7 @@ class PoseComparator:
         if pose1 is None or pose2 is None:
             return 0.0
             
-        # Normalize both poses
-        norm_pose1 = self.normalize_pose(pose1)
-        norm_pose2 = self.normalize_pose(pose2)
-        
-        # Calculate Euclidean distances between corresponding landmarks
-        distances = np.linalg.norm(norm_pose1[:, :2] - norm_pose2[:, :2], axis=1)
-        
-        # Calculate weighted average distance (weight by landmark visibility if available)
-        if pose1.shape[1] > 2 and pose2.shape[1] > 2:  # Check if visibility is available
-            weights = (pose1[:, 2] + pose2[:, 2]) / 2  # Average visibility
-            avg_distance = np.average(distances, weights=weights)
-        else:
-            avg_distance = np.mean(distances)
-        
-        # Convert distance to similarity score (lower distance = higher similarity)
-        # Using exponential decay to map distance to [0, 1] range
-        similarity = np.exp(-5 * avg_distance)
-        
-        return float(similarity)
+        return float(normalized_similarity(self.normalize_pose(pose1), self.normalize_pose(pose2)))
     
     def calculate_joint_angles(self, landmarks: np.ndarray) -> Dict[str, float]:
         """Calculate joint angles for important body parts.
@@ -119,28 +163,35 @@ class PoseComparator:
         if landmarks is None:
             return {}
             
-        angles = {}
+        return self.angle_table.to_dict(joint_angles(landmarks, self.angle_table))
+    
+    def match_references(self, current_pose: np.ndarray, k: int = 5) -> List[Dict]:
+        """Find the closest poses in the reference library.
         
-        # Calculate angles for each joint connection
-        for joint_name, indices in self.joint_connections.items():
-            if len(indices) == 3:  # Three points form an angle
-                a, b, c = [landmarks[i, :2] for i in indices]  # Get (x,y) coordinates
-                
-                # Calculate vectors
-                ba = a - b
-                bc = c - b
-                
-                # Calculate angle in radians
-                cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
-                # Clamp to valid range to avoid numerical errors
-                cosine_angle = np.clip(cosine_angle, -1.0, 1.0)
-                angle_rad = np.arccos(cosine_angle)
-                
-                # Convert to degrees
-                angle_deg = np.degrees(angle_rad)
-                angles[joint_name] = angle_deg
+        Args:
+            current_pose: Numpy array of shape (33, 3) containing current pose landmarks
+            k: Number of matches to return
+            
+        Returns:
+            Matches ordered by similarity, see ReferenceLibrary.query
+        """
+        if current_pose is None:
+            return []
+        return self.reference_library.query(current_pose, k)
+    
+    def match_reps(self, rep: np.ndarray, k: int = 3) -> List[Dict]:
+        """Compare a whole rep with the reference reps, tolerating timing differences.
+        
+        Args:
+            rep: Numpy array of shape (T, 33, 3) with the rep's landmarks in time order
+            k: Number of matches to return
             
-        return angles
+        Returns:
+            Matches ordered by DTW distance, see RepLibrary.match
+        """
+        if rep is None or len(rep) == 0:
+            return []
+        return self.rep_library.match(rep, k)
     
     def compare_with_reference(self, current_pose: np.ndarray) -> Dict:
         """Compare current pose with the reference pose.
@@ -161,11 +212,16 @@ class PoseComparator:
                 'feedback': ['No reference pose available for comparison']
             }
         
+        if self._reference_features_for is not self.reference_pose:
+            self._reference_features = (self.normalize_pose(self.reference_pose),
+                                        self.calculate_joint_angles(self.reference_pose))
+            self._reference_features_for = self.reference_pose
+        ref_normalized, ref_angles = self._reference_features
+        
         # Calculate similarity score
-        similarity = self.calculate_pose_similarity(self.reference_pose, current_pose)
+        similarity = float(normalized_similarity(ref_normalized, self.normalize_pose(current_pose)))
         
-        # Calculate joint angles for both poses
-        ref_angles = self.calculate_joint_angles(self.reference_pose)
+        # Calculate joint angles for the current pose
         current_angles = self.calculate_joint_angles(current_pose)
         
         # Calculate angle differences
@@ -1,46 +1,179 @@
-import cv2
 import mediapipe as mp
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import Iterable, List, Tuple, Optional
+from app.pose.landmark_buffer import LandmarkBuffer
+from app.pose.landmark_filter import OneEuroFilter
+from app.pose.pose_backends import MediaPipeBackend, PoseBackend
+from app.pose.skeleton import SkeletonRasterizer
+
+# Torso landmarks (shoulders and hips) used to judge whether an ROI crop still holds the person
+TORSO_LANDMARKS = [11, 12, 23, 24]
+
+def landmark_box(landmarks: Optional[np.ndarray], padding: float = 0.25,
+                 min_visibility: float = 0.5) -> Optional[Tuple[float, float, float, float]]:
+    """Padded normalized bounding box (x0, y0, x1, y1) of the visible landmarks.
+
+    Returns:
+        The box clipped to the frame, or None if fewer than four landmarks are visible
+    """
+    if landmarks is None:
+        return None
+    visible = landmarks[landmarks[:, 2] >= min_visibility, :2]
+    if len(visible) < len(TORSO_LANDMARKS):
+        return None
+    (x0, y0), (x1, y1) = visible.min(axis=0), visible.max(axis=0)
+    pad_x = (x1 - x0) * padding
+    pad_y = (y1 - y0) * padding
+    return (max(float(x0 - pad_x), 0.0), max(float(y0 - pad_y), 0.0),
+            min(float(x1 + pad_x), 1.0), min(float(y1 + pad_y), 1.0))
+
+def _box_pixels(box: Tuple[float, float, float, float], width: int, height: int) -> Tuple[int, int, int, int]:
+    x0, y0, x1, y1 = box
+    return int(x0 * width), int(y0 * height), int(np.ceil(x1 * width)), int(np.ceil(y1 * height))
 
 class PoseDetector:
-    def __init__(self, min_detection_confidence: float = 0.5, min_tracking_confidence: float = 0.5):
-        """Initialize the MediaPipe Pose detector.
+    def __init__(self, min_detection_confidence: float = 0.5, min_tracking_confidence: float = 0.5,
+                 model_complexity: int = 1, roi_tracking: bool = False, roi_padding: float = 0.25,
+                 roi_min_visibility: float = 0.5, smoother: Optional[OneEuroFilter] = None,
+                 landmark_slots: int = 4, backend: Optional[PoseBackend] = None):
+        """Initialize the pose detector.
         
         Args:
             min_detection_confidence: Minimum confidence value for detection
             min_tracking_confidence: Minimum confidence value for tracking
+            model_complexity: MediaPipe Pose model (0 lite, 1 full, 2 heavy)
+            roi_tracking: Only process a crop around the previous frame's landmarks. The default
+                MediaPipe backend then runs in static image mode: crops and full frames have
+                different coordinate frames, so MediaPipe's own tracking ROI must not carry over
+            roi_padding: Padding added around the landmark bounding box, as a fraction of its size
+            roi_min_visibility: Minimum mean torso visibility for a crop result to be trusted
+            smoother: Optional temporal filter applied to every frame's landmarks
+            landmark_slots: Landmark arrays reused in rotation; a returned array is overwritten
+                this many detections later
+            backend: Inference engine (defaults to MediaPipe Pose with the settings above)
         """
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,  # Balance between speed and accuracy
-            enable_segmentation=False,
-            min_detection_confidence=min_detection_confidence,
-            min_tracking_confidence=min_tracking_confidence
-        )
+        self.backend = backend or MediaPipeBackend(model_complexity, min_detection_confidence,
+                                                   min_tracking_confidence, static_image_mode=roi_tracking)
         self.mp_draw = mp.solutions.drawing_utils
+        # Full MediaPipe Pose skeleton for draw_landmarks
+        self.skeleton = SkeletonRasterizer(line_thickness=2, point_radius=5)
+
+        self.roi_tracking = roi_tracking
+        self.roi_padding = roi_padding
+        self.roi_min_visibility = roi_min_visibility
+        self._roi: Optional[Tuple[float, float, float, float]] = None  # Normalized (x0, y0, x1, y1)
+        self.roi_hits = 0
+        self.roi_fallbacks = 0
+        self.smoother = smoother
+        self._landmark_buffer = LandmarkBuffer(slots=landmark_slots)
+
+    @property
+    def model_complexity(self) -> int:
+        return self.backend.model_complexity
+
+    def set_model_complexity(self, model_complexity: int):
+        """Switch to another model variant (0 lite, 1 full, 2 heavy) of the backend.
+        
+        Args:
+            model_complexity: Model complexity to switch to
+        """
+        self.backend.set_model_complexity(model_complexity)
+
+    def preload(self, model_complexities: Iterable[int]):
+        """Load the given models up front so later switches don't stall a frame."""
+        self.backend.preload(model_complexities)
     
-    def detect_landmarks(self, image: np.ndarray) -> Optional[np.ndarray]:
+    def detect_landmarks(self, image: np.ndarray, timestamp: Optional[float] = None) -> Optional[np.ndarray]:
         """Detect pose landmarks in the given image.
         
         Args:
             image: Input image in BGR format
+            timestamp: Frame time in seconds for the smoother (defaults to now)
             
         Returns:
-            Numpy array of shape (33, 3) containing landmark coordinates (x, y, visibility) or None if no pose is detected
+            Float32 array of shape (33, 4) with (x, y, visibility, z) per landmark, or None if no pose
+            is detected. The array is a reused buffer slot; copy it to keep it beyond the next few frames.
         """
-        # Convert BGR to RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(image_rgb)
+        landmarks = self._detect_raw(image)
+        if self.smoother is not None:
+            landmarks = self.smoother(landmarks, timestamp)
+        return landmarks
+
+    def _detect_raw(self, image: np.ndarray) -> Optional[np.ndarray]:
+        # The ROI follows raw landmarks; smoothing lag would crop behind fast movement
+        if self.roi_tracking and self._roi is not None:
+            landmarks = self._detect_in_roi(image)
+            if landmarks is not None:
+                self.roi_hits += 1
+                self._update_roi(landmarks)
+                return landmarks
+            self.roi_fallbacks += 1
+
+        landmarks = self._process(image)
+        if self.roi_tracking:
+            # Only crop around a pose the crop check would trust; otherwise the next frame
+            # would pay for a crop attempt that fails and a second, full-frame inference
+            trusted = landmarks is not None and landmarks[TORSO_LANDMARKS, 2].mean() >= self.roi_min_visibility
+            self._update_roi(landmarks if trusted else None)
+        return landmarks
+
+    def _process(self, image: np.ndarray) -> Optional[np.ndarray]:
+        # The backend writes landmarks in place into the next buffer slot
+        landmarks = self._landmark_buffer.next_slot()
+        return landmarks if self.backend.detect(image, landmarks) else None
+
+    def _detect_in_roi(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """Run inference on the tracked crop and map landmarks back to full-frame coordinates.
         
-        if not results.pose_landmarks:
+        Returns:
+            Landmarks in full-frame normalized coordinates, or None if the crop result is not trusted
+        """
+        landmarks = self.detect_in_box(image, self._roi)
+        if landmarks is None or landmarks[TORSO_LANDMARKS, 2].mean() < self.roi_min_visibility:
             return None
+        # A visible landmark at the crop border means the person is leaving the box
+        height, width = image.shape[:2]
+        left, top, right, bottom = _box_pixels(self._roi, width, height)
+        visible = landmarks[:, 2] >= self.roi_min_visibility
+        crop_x = (landmarks[visible, 0] * width - left) / (right - left)
+        crop_y = (landmarks[visible, 1] * height - top) / (bottom - top)
+        if (np.any(crop_x < 0.01) or np.any(crop_x > 0.99) or
+                np.any(crop_y < 0.01) or np.any(crop_y > 0.99)):
+            return None
+        return landmarks
+
+    def detect_in_box(self, image: np.ndarray, box: Tuple[float, float, float, float]) -> Optional[np.ndarray]:
+        """Detect landmarks in a crop of the image.
+        
+        Args:
+            image: Input image in BGR format
+            box: Normalized (x0, y0, x1, y1) crop
             
-        # Extract landmarks to numpy array (33 landmarks with x, y, visibility)
-        landmarks = np.array([[lm.x, lm.y, lm.visibility] 
-                            for lm in results.pose_landmarks.landmark])
+        Returns:
+            Landmarks in full-frame normalized coordinates, or None if the crop is
+            too small or holds no pose
+        """
+        height, width = image.shape[:2]
+        left, top, right, bottom = _box_pixels(box, width, height)
+        if right - left < 16 or bottom - top < 16:
+            return None
+
+        landmarks = self._process(image[top:bottom, left:right])
+        if landmarks is None:
+            return None
+        landmarks[:, 0] = (landmarks[:, 0] * (right - left) + left) / width
+        landmarks[:, 1] = (landmarks[:, 1] * (bottom - top) + top) / height
         return landmarks
+
+    def _update_roi(self, landmarks: Optional[np.ndarray]):
+        self._roi = landmark_box(landmarks, self.roi_padding, self.roi_min_visibility)
+
+    def reset_tracking(self):
+        """Forget the tracked ROI and smoothed pose so the next frame is processed in full."""
+        self._roi = None
+        if self.smoother is not None:
+            self.smoother.reset()
     
     def draw_landmarks(self, image: np.ndarray, landmarks: np.ndarray) -> np.ndarray:
         """Draw pose landmarks on the image.
@@ -52,38 +185,7 @@ class PoseDetector:
         Returns:
             Image with landmarks drawn
         """
-        # Create a copy of the image to draw on
-        img_copy = image.copy()
-        
-        # Convert landmarks to MediaPipe format
-        pose_landmarks = self.mp_pose.PoseLandmark
-        landmark_list = []
-        
-        for idx in range(landmarks.shape[0]):
-            landmark = self.mp_pose.PoseLandmark(idx)
-            landmark_list.append(landmark)
-            
-            # Draw circles for each landmark
-            x = int(landmarks[idx, 0] * img_copy.shape[1])
-            y = int(landmarks[idx, 1] * img_copy.shape[0])
-            cv2.circle(img_copy, (x, y), 5, (0, 255, 0), -1)
-        
-        # Draw connections between landmarks
-        connections = self.mp_pose.POSE_CONNECTIONS
-        for connection in connections:
-            start_idx, end_idx = connection
-            if (0 <= start_idx < len(landmark_list)) and (0 <= end_idx < len(landmark_list)):
-                start_point = (
-                    int(landmarks[start_idx, 0] * img_copy.shape[1]),
-                    int(landmarks[start_idx, 1] * img_copy.shape[0])
-                )
-                end_point = (
-                    int(landmarks[end_idx, 0] * img_copy.shape[1]),
-                    int(landmarks[end_idx, 1] * img_copy.shape[0])
-                )
-                cv2.line(img_copy, start_point, end_point, (0, 255, 0), 2)
-        
-        return img_copy
+        return self.skeleton.draw(image.copy(), landmarks, (0, 255, 0))
     
     def get_landmark_coordinates(self, landmarks: np.ndarray, landmark_indices: List[int]) -> List[Tuple[float, float]]:
         """Get the (x, y) coordinates of specified landmarks.
@@ -98,10 +200,10 @@ class PoseDetector:
         coordinates = []
         for idx in landmark_indices:
             if 0 <= idx < landmarks.shape[0]:
-                x, y, _ = landmarks[idx]
+                x, y = landmarks[idx, :2]
                 coordinates.append((x, y))
         return coordinates
     
     def release(self):
         """Release resources."""
-        self.pose.close()
+        self.backend.close()
@@ -0,0 +1,56 @@
+import numpy as np
+
+# Body landmarks (shoulders, elbows, wrists, hips, knees, ankles) used for pose search and rep
+# alignment; face and hand points add dimensions without telling exercise poses apart
+INDEX_LANDMARKS = [11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
+INDEX_LANDMARK_NAMES = ['left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow', 'left_wrist', 'right_wrist',
+                        'left_hip', 'right_hip', 'left_knee', 'right_knee', 'left_ankle', 'right_ankle']
+
+
+def normalize_landmarks(landmarks: np.ndarray) -> np.ndarray:
+    """Center poses on the torso and scale them by shoulder and hip width.
+
+    Args:
+        landmarks: Landmarks of shape (33, C) or (N, 33, C)
+
+    Returns:
+        Normalized copy with the same shape
+    """
+    landmarks = np.asarray(landmarks)
+    torso = landmarks[..., [11, 12, 23, 24], :2].astype(np.float64, copy=False)
+    center = torso.mean(axis=-2, keepdims=True)
+
+    # Average of shoulder and hip width, or whichever is non-zero
+    shoulder_dist = np.linalg.norm(torso[..., 0, :] - torso[..., 1, :], axis=-1)
+    hip_dist = np.linalg.norm(torso[..., 2, :] - torso[..., 3, :], axis=-1)
+    scale = np.where((shoulder_dist > 0) & (hip_dist > 0),
+                     (shoulder_dist + hip_dist) / 2, np.maximum(shoulder_dist, hip_dist))
+    scale = np.where(scale == 0, 0.1, scale)[..., None, None]
+
+    # The only copy; float32 detector buffers are widened here
+    normalized = landmarks.astype(np.float64)
+    normalized[..., :2] -= center
+    normalized[..., :2] /= scale
+    return normalized
+
+
+def normalized_similarity(references: np.ndarray, pose: np.ndarray) -> np.ndarray:
+    """Similarity of normalized poses, weighting landmarks by their average visibility.
+
+    Args:
+        references: Normalized landmarks of shape (33, C) or (N, 33, C)
+        pose: Normalized landmarks of shape (33, C)
+
+    Returns:
+        Similarity (0-1, where 1 is identical) per reference
+    """
+    distances = np.linalg.norm(references[..., :2] - pose[:, :2], axis=-1)
+    if references.shape[-1] > 2 and pose.shape[-1] > 2:
+        weights = (references[..., 2] + pose[:, 2]) / 2
+        weight_sums = weights.sum(axis=-1)
+        weighted = (distances * weights).sum(axis=-1) / np.where(weight_sums > 0, weight_sums, 1)
+        avg_distance = np.where(weight_sums > 0, weighted, distances.mean(axis=-1))
+    else:
+        avg_distance = distances.mean(axis=-1)
+    # Exponential decay maps distance to [0, 1]
+    return np.exp(-5 * avg_distance)
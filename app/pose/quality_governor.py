@@ -0,0 +1,113 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    name: str
+    model_complexity: int  # MediaPipe Pose model: 0 lite, 1 full, 2 heavy
+    max_height: Optional[int]  # Frames taller than this are downscaled; None keeps the input size
+
+# Ordered from most accurate to cheapest
+QUALITY_TIERS = [
+    QualityTier('heavy', 2, None),
+    QualityTier('full', 1, None),
+    QualityTier('full_480p', 1, 480),
+    QualityTier('lite_480p', 0, 480),
+    QualityTier('lite_360p', 0, 360),
+]
+
+DEFAULT_TIER = QUALITY_TIERS[1]
+
+
+def downscale(image: np.ndarray, tier: QualityTier) -> np.ndarray:
+    """Resize a frame to the tier's maximum height, keeping the aspect ratio.
+
+    Landmarks are normalized to the frame size, so results need no rescaling.
+    """
+    height, width = image.shape[:2]
+    if tier.max_height is None or height <= tier.max_height:
+        return image
+    new_width = round(width * tier.max_height / height)
+    return cv2.resize(image, (new_width, tier.max_height), interpolation=cv2.INTER_AREA)
+
+
+class QualityGovernor:
+    def __init__(self, target_latency_ms: float = 80.0, tiers: Sequence[QualityTier] = QUALITY_TIERS,
+                 start_tier: str = DEFAULT_TIER.name, max_queue_depth: int = 4,
+                 step_up_ratio: float = 0.5, cooldown: int = 30, smoothing: float = 0.2):
+        """Pick the quality tier that holds inference within a latency budget.
+
+        Per-frame latency is tracked as an exponential moving average. When it
+        exceeds the target, or the queue grows past `max_queue_depth`, the
+        governor steps down to a cheaper tier; when latency falls below
+        `step_up_ratio * target` with an empty queue it steps back up.
+        After a change it waits `cooldown` frames before deciding again, so
+        the average reflects the new tier.
+
+        Args:
+            target_latency_ms: Per-frame latency budget
+            tiers: Quality tiers ordered from most accurate to cheapest
+            start_tier: Name of the initial tier
+            max_queue_depth: Pending requests above which the governor steps down
+            step_up_ratio: Fraction of the budget latency must fall below to step up
+            cooldown: Frames observed between tier changes
+            smoothing: Weight of the newest sample in the moving average
+        """
+        self.target_latency_ms = target_latency_ms
+        self.tiers: List[QualityTier] = list(tiers)
+        self.max_queue_depth = max_queue_depth
+        self.step_up_ratio = step_up_ratio
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+
+        self._index = [tier.name for tier in self.tiers].index(start_tier)
+        self._lock = threading.Lock()
+        self._latency_ms: Optional[float] = None
+        self._since_change = 0
+        self._step_downs = 0
+        self._step_ups = 0
+
+    @property
+    def tier(self) -> QualityTier:
+        """Tier to use for the next frame."""
+        return self.tiers[self._index]
+
+    def observe(self, latency_ms: float, queue_depth: int = 0):
+        """Record the latency of one frame and the current queue depth."""
+        with self._lock:
+            if self._latency_ms is None:
+                self._latency_ms = latency_ms
+            else:
+                self._latency_ms += self.smoothing * (latency_ms - self._latency_ms)
+            self._since_change += 1
+            if self._since_change < self.cooldown:
+                return
+
+            overloaded = self._latency_ms > self.target_latency_ms or queue_depth > self.max_queue_depth
+            idle = self._latency_ms < self.target_latency_ms * self.step_up_ratio and queue_depth == 0
+            if overloaded and self._index < len(self.tiers) - 1:
+                self._index += 1
+                self._step_downs += 1
+            elif idle and self._index > 0:
+                self._index -= 1
+                self._step_ups += 1
+            else:
+                return
+            self._latency_ms = None
+            self._since_change = 0
+
+    def stats(self) -> Dict:
+        """Return the active tier, smoothed latency and tier change counts."""
+        with self._lock:
+            return {
+                'tier': self.tier.name,
+                'target_latency_ms': self.target_latency_ms,
+                'latency_ms_avg': self._latency_ms,
+                'step_downs': self._step_downs,
+                'step_ups': self._step_ups,
+            }
@@ -0,0 +1,211 @@
+import heapq
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.pose.pose_normalization import INDEX_LANDMARK_NAMES, INDEX_LANDMARKS, normalize_landmarks
+
+
+def rep_features(rep: np.ndarray, length: int, landmarks: Sequence[int] = INDEX_LANDMARKS) -> np.ndarray:
+    """Normalize a rep's landmarks and resample it to a fixed number of frames.
+
+    Args:
+        rep: Landmarks of shape (T, 33, C) in time order
+        length: Number of frames to resample to
+        landmarks: Landmarks kept as features
+
+    Returns:
+        Array of shape (length, len(landmarks), 2) with normalized (x, y)
+    """
+    points = normalize_landmarks(np.asarray(rep).reshape(-1, 33, np.shape(rep)[-1]))[:, landmarks, :2]
+    frames = len(points)
+    if frames == 0:
+        raise ValueError("A rep needs at least one frame")
+    source = np.linspace(0, frames - 1, length)
+    lower = np.floor(source).astype(np.intp)
+    upper = np.minimum(lower + 1, frames - 1)
+    fraction = (source - lower)[:, None, None]
+    return points[lower] * (1 - fraction) + points[upper] * fraction
+
+
+def _joint_distance(difference: np.ndarray) -> np.ndarray:
+    # Euclidean norm over a trailing (x, y) axis; faster than reducing an axis of length 2
+    return np.sqrt(difference[..., 0] ** 2 + difference[..., 1] ** 2)
+
+
+class RepLibrary:
+    def __init__(self, length: int = 32, window: float = 0.1, landmarks: Sequence[int] = INDEX_LANDMARKS,
+                 landmark_names: Sequence[str] = INDEX_LANDMARK_NAMES):
+        """Library of reference reps compared by dynamic time warping.
+
+        Reps are resampled to `length` frames. The frame cost is the sum of
+        per-joint distances between normalized landmarks, and warping is limited
+        to a Sakoe-Chiba band of `window * length` frames. Matching ranks
+        references by their LB_Keogh lower bound, stops once the bound exceeds
+        the k-th best distance, and abandons a DTW as soon as its partial cost
+        plus the bound of the remaining frames does.
+
+        Args:
+            length: Frames every rep is resampled to
+            window: Sakoe-Chiba band half-width as a fraction of length
+            landmarks: Landmarks compared
+            landmark_names: Name of each compared landmark, used for per-joint costs
+        """
+        self.length = length
+        self.band = max(1, math.ceil(window * length))
+        self.landmarks = list(landmarks)
+        self.landmark_names = list(landmark_names)
+        self.labels: List[Optional[str]] = []
+        # float32 halves the memory the per-query lower bounds stream through
+        self._features = np.empty((0, length, len(self.landmarks), 2), dtype=np.float32)
+        self._upper = np.empty_like(self._features)
+        self._lower = np.empty_like(self._features)
+        self._pending: List[np.ndarray] = []  # Features of added reps not yet stacked into the arrays
+        self.last_stats: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def _envelope(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Running min/max over the band around every frame
+        padded = np.pad(features, ((0, 0), (self.band, self.band), (0, 0), (0, 0)), mode='edge')
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * self.band + 1, axis=1)
+        return windows.max(axis=-1), windows.min(axis=-1)
+
+    def add(self, rep: np.ndarray, label: Optional[str] = None):
+        """Add a reference rep of shape (T, 33, C)."""
+        self._pending.append(rep_features(rep, self.length, self.landmarks).astype(np.float32))
+        self.labels.append(label)
+
+    def _stack_pending(self):
+        features = np.stack(self._pending)
+        upper, lower = self._envelope(features)
+        self._features = np.concatenate([self._features, features])
+        self._upper = np.concatenate([self._upper, upper])
+        self._lower = np.concatenate([self._lower, lower])
+        self._pending = []
+
+    def _band_costs(self, query: np.ndarray, references: np.ndarray) -> np.ndarray:
+        """Per-joint distances between query frame i and reference frame i + d for every band offset d.
+
+        Args:
+            query: Query features of shape (length, joints, 2)
+            references: Reference features of shape (M, length, joints, 2)
+
+        Returns:
+            Array of shape (M, length, 2 * band + 1, joints); offsets outside the rep repeat its edge frame
+        """
+        offsets = np.clip(np.arange(self.length)[:, None] + np.arange(-self.band, self.band + 1), 0, self.length - 1)
+        difference = query[:, None] - references[:, offsets]
+        return _joint_distance(difference)
+
+    def _dtw(self, cost: np.ndarray, best: float, remaining: np.ndarray) -> Optional[Tuple[float, List[List[float]]]]:
+        """Banded DTW over the (length, 2 * band + 1) frame costs, abandoned once it cannot beat `best`.
+
+        Returns:
+            Tuple of (distance, accumulated cost rows) or None if abandoned
+        """
+        length, band, inf = self.length, self.band, math.inf
+        costs = cost.tolist()
+        previous = [0.0] + [inf] * length
+        rows = [previous]
+        for i in range(1, length + 1):
+            current = [inf] * (length + 1)
+            row_cost = costs[i - 1]
+            row_min = inf
+            for j in range(max(1, i - band), min(length, i + band) + 1):
+                value = row_cost[j - i + band] + min(previous[j - 1], previous[j], current[j - 1])
+                current[j] = value
+                if value < row_min:
+                    row_min = value
+            # Every later frame still adds at least its lower-bound cost
+            if row_min + remaining[i] >= best:
+                return None
+            rows.append(current)
+            previous = current
+        # The path must end in the last cell, which can cost more than the row minimum checked above
+        if previous[length] >= best:
+            return None
+        return previous[length], rows
+
+    def _path(self, rows: List[List[float]]) -> List[Tuple[int, int]]:
+        i = j = self.length
+        path = []
+        while i > 0 and j > 0:
+            path.append((i - 1, j - 1))
+            steps = [(rows[i - 1][j - 1], i - 1, j - 1), (rows[i - 1][j], i - 1, j), (rows[i][j - 1], i, j - 1)]
+            _, i, j = min(steps)
+        return path[::-1]
+
+    def match(self, rep: np.ndarray, k: int = 3, chunk: int = 32) -> List[Dict]:
+        """Find the reference reps closest to a rep under banded DTW.
+
+        Args:
+            rep: Landmarks of shape (T, 33, C) in time order
+            k: Number of matches to return
+            chunk: References whose frame costs are computed together, in lower-bound order
+
+        Returns:
+            Up to k matches ordered by distance, each with index, label,
+            distance (the DTW cost they are ranked by, divided by frames times
+            joints), similarity (0-1, from distance), aligned_distance (mean
+            per-joint distance over the steps of the warping path) and
+            joint_costs (aligned distance per joint)
+        """
+        if not self.labels:
+            return []
+        if self._pending:
+            self._stack_pending()
+        query = rep_features(rep, self.length, self.landmarks).astype(np.float32)
+
+        # LB_Keogh: per frame, each joint's distance to the band envelope of the reference,
+        # and the reverse bound of each reference against the query's envelope
+        frame_bounds = _joint_distance(query - np.minimum(np.maximum(query, self._lower), self._upper)).sum(axis=-1)
+        query_upper, query_lower = self._envelope(query[None])
+        reverse = self._features - np.minimum(np.maximum(self._features, query_lower), query_upper)
+        bounds = np.maximum(frame_bounds.sum(axis=-1), _joint_distance(reverse).sum(axis=(1, 2)))
+        # remaining[m, i]: bound on the cost of frames after the first i
+        remaining = np.zeros((len(self.labels), self.length + 1))
+        remaining[:, :-1] = np.cumsum(frame_bounds[:, ::-1], axis=1)[:, ::-1]
+
+        best: List[Tuple[float, int, List[List[float]]]] = []  # Max-heap of the k best as (-DTW cost, index, rows)
+        stats = {'candidates': len(self.labels), 'lb_pruned': 0, 'abandoned': 0, 'computed': 0}
+        order = np.argsort(bounds)
+        frame_costs = None
+        for rank, index in enumerate(order):
+            threshold = -best[0][0] if len(best) == k else math.inf
+            if bounds[index] >= threshold:
+                stats['lb_pruned'] = len(order) - rank
+                break
+            if rank % chunk == 0:
+                frame_costs = self._band_costs(query, self._features[order[rank:rank + chunk]]).sum(axis=-1)
+            result = self._dtw(frame_costs[rank % chunk], threshold, remaining[index])
+            if result is None:
+                stats['abandoned'] += 1
+                continue
+            stats['computed'] += 1
+            distance, rows = result
+            entry = (-distance, int(index), rows)
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            else:
+                heapq.heapreplace(best, entry)
+        self.last_stats = stats
+
+        matches = []
+        for negative_cost, index, rows in sorted(best, reverse=True):
+            # A constant scale keeps the reported distance in ranking order; paths differ in length
+            distance = -negative_cost / (self.length * len(self.landmarks))
+            path = self._path(rows)
+            rows_index, columns_index = np.array(path).T
+            aligned = np.linalg.norm(query[rows_index] - self._features[index][columns_index], axis=-1).mean(axis=0)
+            matches.append({
+                'index': index,
+                'label': self.labels[index],
+                'distance': distance,
+                'similarity': float(np.exp(-5 * distance)),
+                'aligned_distance': float(aligned.mean()),
+                'joint_costs': dict(zip(self.landmark_names, aligned.tolist())),
+            })
+        return matches
@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.pose.exercise_detector import DetectorState, ExerciseDetector, analyze_sessions
+from app.pose.session_store import InProcessStore, SessionStore, SessionStoreBusy, decode_session, encode_session
+
+
+class SessionExpired(LookupError):
+    """Raised when a session's state is gone (ended or expired) and no exercise was given to start it anew."""
+
+
+class _LiveSession:
+    __slots__ = ('detector', 'owner', 'last_used', 'lock', 'evicted')
+
+    def __init__(self, detector: ExerciseDetector, owner: Optional[int], now: float):
+        self.detector = detector
+        self.owner = owner
+        self.last_used = now
+        self.lock = threading.Lock()
+        self.evicted = False
+
+
+class ExerciseSessionCache:
+    def __init__(self, max_sessions: int = 4096, idle_timeout: float = 120.0, snapshot_ttl: float = 86400.0,
+                 clock: Callable[[], float] = time.monotonic, store: Optional[SessionStore] = None,
+                 max_attempts: int = 100):
+        """Server-held ExerciseDetector state for live exercise sessions.
+
+        With a store of this process only (the default), detectors live in an
+        LRU bounded by `max_sessions`. A detector that falls out of it, or
+        sees no frames for `idle_timeout` seconds, is reduced to its
+        serialized snapshot in the store and rebuilt from it on the session's
+        next frames, so memory per session stays flat however long it runs.
+        Idle detectors are snapshotted as other sessions check out theirs.
+
+        With a shared store (`store.shared`), no detector is kept between
+        requests: each batch restores the detector from the store, analyzes
+        the frames and writes the new state back if its version is unchanged,
+        retrying on a conflicting write, so any API worker can continue any
+        session. Frames are analyzed as they arrive and never kept.
+
+        Args:
+            max_sessions: Live detectors kept before the least recently used is snapshotted
+            idle_timeout: Seconds without frames before a live detector is snapshotted
+            snapshot_ttl: Seconds an abandoned session's snapshot is kept (default store only)
+            clock: Monotonic time source in seconds
+            store: Session state store (defaults to an InProcessStore)
+            max_attempts: Compare-and-set attempts per write before SessionStoreBusy is raised
+        """
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.store = store if store is not None else InProcessStore(ttl=snapshot_ttl, clock=clock)
+        self.max_attempts = max_attempts
+
+        self._live: "OrderedDict[str, _LiveSession]" = OrderedDict()  # Least recently used first
+        self._lock = threading.Lock()
+        self.created = 0
+        self.restored = 0
+        self.evicted = 0
+        self.conflicts = 0
+
+    def _save(self, session_id: str, state: DetectorState, owner: Optional[int]):
+        # Only this process writes a non-shared store, so a conflict just means re-reading the version
+        record = encode_session(state, owner)
+        for _ in range(self.max_attempts):
+            current = self.store.get(session_id)
+            if self.store.compare_and_set(session_id, record, current[1] if current else 0) is not None:
+                return
+        raise SessionStoreBusy(f"Could not save session {session_id!r} after {self.max_attempts} attempts")
+
+    def _evict(self, session_id: str, entry: _LiveSession):
+        # Called with the cache lock held; waits for in-flight analysis so its update is in the snapshot
+        with entry.lock:
+            entry.evicted = True
+            self._save(session_id, entry.detector.snapshot(), entry.owner)
+        self.evicted += 1
+
+    def _expire(self, now: float):
+        # Called with the cache lock held
+        while self._live:
+            session_id, entry = next(iter(self._live.items()))
+            if len(self._live) <= self.max_sessions and entry.last_used > now - self.idle_timeout:
+                break
+            del self._live[session_id]
+            self._evict(session_id, entry)
+
+    def _checkout(self, session_id: str, exercise_name: Optional[str], owner: Optional[int]) -> _LiveSession:
+        now = self.clock()
+        with self._lock:
+            entry = self._live.get(session_id)
+            if entry is not None:
+                self._live.move_to_end(session_id)
+            else:
+                stored = self.store.get(session_id)
+                if stored is not None:
+                    state, owner = decode_session(stored[0])
+                    self.store.delete(session_id)
+                    entry = _LiveSession(ExerciseDetector.restore(state), owner, now)
+                    self.restored += 1
+                elif exercise_name is None:
+                    raise SessionExpired(session_id)
+                else:
+                    entry = _LiveSession(ExerciseDetector(exercise_name), owner, now)
+                    self.created += 1
+                self._live[session_id] = entry
+            entry.last_used = now
+            self._expire(now)
+            return entry
+
+    def _analyze_shared(self, session_id: str, exercise_name: Optional[str], frames: np.ndarray,
+                        owner: Optional[int]) -> Dict:
+        for _ in range(self.max_attempts):
+            stored = self.store.get(session_id)
+            if stored is not None:
+                state, session_owner = decode_session(stored[0])
+                detector, version = ExerciseDetector.restore(state), stored[1]
+            elif exercise_name is None:
+                raise SessionExpired(session_id)
+            else:
+                detector, session_owner, version = ExerciseDetector(exercise_name), owner, 0
+            counted = detector.rep_count
+            result = analyze_sessions([detector], [frames])[0]
+            if self.store.compare_and_set(session_id, encode_session(detector.snapshot(), session_owner),
+                                          version) is not None:
+                if version:
+                    self.restored += 1
+                else:
+                    self.created += 1
+                result['phase'] = detector.current_phase
+                result['new_reps'] = detector.rep_count - counted
+                return result
+            # Another worker updated the session meanwhile; replay these frames on its state
+            self.conflicts += 1
+        raise SessionStoreBusy(f"Session {session_id!r} kept conflicting after {self.max_attempts} attempts")
+
+    def analyze(self, session_id: str, exercise_name: Optional[str], frames: np.ndarray,
+                owner: Optional[int] = None) -> Dict:
+        """Feed frames of one session to its detector.
+
+        Args:
+            session_id: Session key
+            exercise_name: Exercise of a session seen for the first time; None for a session
+                `owner` reported as known, which must not be started anew
+            frames: Landmarks of shape (T, 33, C) in time order
+            owner: Owner recorded with a new session (see `owner`)
+
+        Returns:
+            Analysis of the last frame ({'feedback', 'rep_count'}) plus the current 'phase'
+            and the reps these frames completed ('new_reps')
+
+        Raises:
+            SessionExpired: If exercise_name is None and the session has no state anymore
+            SessionStoreBusy: If the store kept conflicting or could not be read
+        """
+        if self.store.shared:
+            return self._analyze_shared(session_id, exercise_name, frames, owner)
+        while True:
+            entry = self._checkout(session_id, exercise_name, owner)
+            with entry.lock:
+                # Evicted between checkout and lock: its snapshot already holds every earlier update
+                if entry.evicted:
+                    continue
+                counted = entry.detector.rep_count
+                result = analyze_sessions([entry.detector], [frames])[0]
+                result['phase'] = entry.detector.current_phase
+                result['new_reps'] = entry.detector.rep_count - counted
+                return result
+
+    def owner(self, session_id: str) -> Tuple[bool, Optional[int]]:
+        """Return whether a session has state here and the owner recorded when it was created."""
+        with self._lock:
+            entry = self._live.get(session_id)
+            if entry is not None:
+                return True, entry.owner
+        stored = self.store.get(session_id)
+        return (True, decode_session(stored[0])[1]) if stored is not None else (False, None)
+
+    def end(self, session_id: str) -> Optional[DetectorState]:
+        """Drop a session's state and return its final snapshot (None if it never received frames)."""
+        with self._lock:
+            entry = self._live.pop(session_id, None)
+            if entry is not None:
+                with entry.lock:
+                    entry.evicted = True
+                    return entry.detector.snapshot()
+            stored = self.store.get(session_id)
+            if stored is None:
+                return None
+            self.store.delete(session_id)
+            return decode_session(stored[0])[0]
+
+    def evict_idle(self):
+        """Snapshot live detectors idle for longer than `idle_timeout` into the store."""
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+
+    def stats(self) -> Dict:
+        """Return the live session count, lifecycle counters and store counters."""
+        with self._lock:
+            return {'live': len(self._live), 'max_sessions': self.max_sessions, 'created': self.created,
+                    'restored': self.restored, 'evicted': self.evicted, 'conflicts': self.conflicts,
+                    'store': self.store.stats()}
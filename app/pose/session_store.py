@@ -0,0 +1,562 @@
+import hashlib
+import itertools
+import os
+import secrets
+import socket
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from app.pose.exercise_detector import DetectorState
+from app.pose.exercise_rules import EXERCISE_RULES
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Format version, exercise index, phase, rep count, owner (-1 for none), feedback message count
+_RECORD = struct.Struct('<BBBIqB')
+_RECORD_FORMAT = 1
+_PHASES = ('up', 'down')
+_LITERAL = 0xFF  # Feedback code of a message outside the compiled table, followed by '<H' length and UTF-8
+_MESSAGE_INDEX = {message: index for index, message in enumerate(EXERCISE_RULES.messages) if index < _LITERAL}
+
+
+class SessionStoreFull(RuntimeError):
+    """Raised when a fixed-capacity store has no free slot for a new session."""
+
+
+class SessionStoreBusy(RuntimeError):
+    """Raised when a value can't be read or written within the retry budget (e.g. constant conflicts)."""
+
+
+def encode_session(state: DetectorState, owner: Optional[int] = None) -> bytes:
+    """Serialize detector state and session owner into a compact binary record.
+
+    Exercises and feedback messages are stored as indices into the compiled
+    exercise rules, so a typical record is 16-20 bytes.
+    """
+    exercise_name, rep_count, phase, feedback = state
+    parts = [_RECORD.pack(_RECORD_FORMAT, EXERCISE_RULES.index(exercise_name), _PHASES.index(phase),
+                          rep_count, -1 if owner is None else owner, len(feedback))]
+    for message in feedback:
+        code = _MESSAGE_INDEX.get(message)
+        if code is not None:
+            parts.append(bytes((code,)))
+        else:
+            text = message.encode()
+            parts.append(struct.pack('<BH', _LITERAL, len(text)) + text)
+    return b''.join(parts)
+
+
+def decode_session(record: bytes) -> Tuple[DetectorState, Optional[int]]:
+    """Inverse of `encode_session`: return ((exercise, reps, phase, feedback), owner)."""
+    record_format, exercise, phase, rep_count, owner, count = _RECORD.unpack_from(record)
+    if record_format != _RECORD_FORMAT:
+        raise ValueError(f"Unknown session record format {record_format}")
+    feedback, offset = [], _RECORD.size
+    for _ in range(count):
+        code = record[offset]
+        offset += 1
+        if code == _LITERAL:
+            (length,) = struct.unpack_from('<H', record, offset)
+            feedback.append(record[offset + 2:offset + 2 + length].decode())
+            offset += 2 + length
+        else:
+            feedback.append(EXERCISE_RULES.messages[code])
+    state = (EXERCISE_RULES.names[exercise], rep_count, _PHASES[phase], tuple(feedback))
+    return state, None if owner < 0 else owner
+
+
+class SessionStore:
+    """Versioned key-value store for serialized session state.
+
+    Every stored value carries a version that changes on each write. Writers
+    read a value and its version, and `compare_and_set` only succeeds if the
+    version is still current, so concurrent writers never overwrite each
+    other's updates unnoticed (optimistic concurrency).
+    """
+    # Whether other processes see writes; shared stores are read and written on every request
+    shared = False
+
+    def get(self, key: str) -> Optional[Tuple[bytes, int]]:
+        """Return (value, version), or None if the key is absent or expired."""
+        raise NotImplementedError
+
+    def compare_and_set(self, key: str, value: bytes, version: int) -> Optional[int]:
+        """Write a value if the key's version is still `version` (0 if absent).
+
+        Returns:
+            The new version, or None if another writer got there first
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Remove a key."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """Return backend counters."""
+        return {'backend': type(self).__name__}
+
+    def close(self):
+        """Release connections or shared memory."""
+
+
+class InProcessStore(SessionStore):
+    def __init__(self, ttl: float = 86400.0, clock=time.monotonic):
+        """Session store in a dict of this process.
+
+        Args:
+            ttl: Seconds after its last write a value expires
+            clock: Monotonic time source in seconds
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self._values: Dict[str, Tuple[bytes, int, float]] = {}  # (value, version, expires at)
+        self._versions = itertools.count(1)  # Shared by all keys, so a version is never reused
+        self._lock = threading.Lock()
+        self._next_sweep = clock() + min(ttl, 60.0)
+        self.expired = 0
+
+    def _sweep(self, now: float):
+        # Called with the lock held
+        stale = [key for key, (_, _, expires) in self._values.items() if expires <= now]
+        for key in stale:
+            del self._values[key]
+        self.expired += len(stale)
+        self._next_sweep = now + min(self.ttl, 60.0)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, int]]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry[2] <= self.clock():
+                return None
+            return entry[0], entry[1]
+
+    def compare_and_set(self, key: str, value: bytes, version: int) -> Optional[int]:
+        now = self.clock()
+        with self._lock:
+            entry = self._values.get(key)
+            current = entry[1] if entry is not None and entry[2] > now else 0
+            if current != version:
+                return None
+            # Versions are never reused, even after expiry or deletion, so a stale reader never matches
+            new_version = next(self._versions)
+            self._values[key] = (value, new_version, now + self.ttl)
+            if now >= self._next_sweep:
+                self._sweep(now)
+            return new_version
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'backend': 'memory', 'keys': len(self._values), 'expired': self.expired}
+
+
+class _FileLock:
+    def __init__(self, path: str):
+        # Exclusive lock across processes (file lock) and across threads of this process
+        self._file = open(path, 'a+b')
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._thread_lock.release()
+
+    def close(self):
+        self._file.close()
+
+
+_MAGIC = 0x46545353  # Marks an initialized shared-memory table
+_HEADER = np.dtype([('magic', '<u8'), ('slots', '<u8'), ('value_size', '<u8'), ('reserved', '<u8')])
+
+
+def _slot_dtype(value_size: int) -> np.dtype:
+    return np.dtype([('hash', '<u8'), ('version', '<u8'), ('expires', '<f8'), ('length', '<u4'),
+                     ('pad', '<u4'), ('value', 'u1', (value_size,))])
+
+
+class SharedMemoryStore(SessionStore):
+    shared = True
+
+    def __init__(self, name: str = "fittrack-sessions", slots: int = 65536, value_size: int = 128,
+                 ttl: float = 86400.0, max_probes: int = 64, lock_path: Optional[str] = None,
+                 read_retries: int = 1000):
+        """Session store in a shared-memory hash table for API workers on one host.
+
+        The first worker creates the named block and the others attach to
+        it. Slots are found by open addressing on a 64-bit key hash. Reads
+        take no lock: each slot's version works as a seqlock (odd while a
+        write is in progress) and a read is retried if the version changed
+        while the value was copied. Writes are serialized by a file lock.
+        A slot still odd under that lock was left by a writer that died
+        mid-write; its torn value is dropped. Readers that keep failing take
+        the lock to wait for the writer or repair the slot.
+
+        Args:
+            name: Shared memory block name, the same in every worker
+            slots: Table capacity (sessions)
+            value_size: Largest serialized record in bytes
+            ttl: Seconds after its last write a value expires; expired slots are reused
+            max_probes: Slots searched per key before the table counts as full
+            lock_path: Lock file serializing writers (defaults to one named after the block in the temp dir)
+            read_retries: Lock-free read attempts before a reader takes the writer lock
+        """
+        self.ttl = ttl
+        self.max_probes = max_probes
+        self.max_read_retries = read_retries
+        slot_dtype = _slot_dtype(value_size)
+        size = _HEADER.itemsize + slots * slot_dtype.itemsize
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            created = True
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+            created = False
+        # The block outlives the worker that created it; other workers keep using it
+        resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self.name = name
+
+        header = np.ndarray((), dtype=_HEADER, buffer=self._shm.buf)
+        if created:
+            header['slots'], header['value_size'] = slots, value_size
+            header['magic'] = _MAGIC
+        else:
+            deadline = time.monotonic() + 5.0
+            while int(header['magic']) != _MAGIC:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Shared session store {name!r} was never initialized")
+                time.sleep(0.01)
+            slots, value_size = int(header['slots']), int(header['value_size'])
+            slot_dtype = _slot_dtype(value_size)
+        self.slots = slots
+        self.value_size = value_size
+        self._table = np.ndarray((slots,), dtype=slot_dtype, buffer=self._shm.buf, offset=_HEADER.itemsize)
+        self._hashes = self._table['hash']
+        self._versions = self._table['version']
+        self._expires = self._table['expires']
+        self._lengths = self._table['length']
+        self._values = self._table['value']
+        self._lock = _FileLock(lock_path or os.path.join(tempfile.gettempdir(), f"{name}.lock"))
+        self.read_retries = 0
+        self.repairs = 0
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Never 0, which marks a slot that was never used
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def _probe(self, key_hash: int):
+        start = key_hash % self.slots
+        for step in range(min(self.max_probes, self.slots)):
+            yield (start + step) % self.slots
+
+    def _find(self, key_hash: int) -> Optional[int]:
+        for slot in self._probe(key_hash):
+            slot_hash = int(self._hashes[slot])
+            if slot_hash == key_hash:
+                return slot
+            if slot_hash == 0:
+                return None
+        return None
+
+    def _read(self, slot: int) -> Optional[Tuple[bytes, int, float, int]]:
+        for _ in range(self.max_read_retries):
+            version = int(self._versions[slot])
+            if not version & 1:
+                length = int(self._lengths[slot])
+                value = self._values[slot, :length].tobytes()
+                expires = float(self._expires[slot])
+                slot_hash = int(self._hashes[slot])
+                if int(self._versions[slot]) == version:
+                    return value, version, expires, slot_hash
+            self.read_retries += 1
+        return None
+
+    def _repair(self, slot: int):
+        # Called with the writer lock held, so no write is in progress: an odd version
+        # was left by a writer that died mid-write, and the value may be torn
+        if int(self._versions[slot]) & 1:
+            self._lengths[slot] = 0
+            self._versions[slot] += 1
+            self.repairs += 1
+
+    def get(self, key: str) -> Optional[Tuple[bytes, int]]:
+        key_hash = self._hash(key)
+        slot = self._find(key_hash)
+        if slot is None:
+            return None
+        read = self._read(slot)
+        if read is None:
+            # Wait out the writer, or repair the slot of one that died
+            with self._lock:
+                self._repair(slot)
+            read = self._read(slot)
+            if read is None:
+                raise SessionStoreBusy(f"Session {key!r} kept changing while being read")
+        value, version, expires, slot_hash = read
+        if slot_hash != key_hash or not value or expires <= time.time():
+            return None
+        return value, version
+
+    def compare_and_set(self, key: str, value: bytes, version: int) -> Optional[int]:
+        if len(value) > self.value_size:
+            raise ValueError(f"Session record of {len(value)} bytes exceeds the slot size {self.value_size}")
+        key_hash = self._hash(key)
+        now = time.time()
+        with self._lock:
+            slot = self._find(key_hash)
+            if slot is not None:
+                self._repair(slot)
+                live = self._lengths[slot] > 0 and self._expires[slot] > now
+                current = int(self._versions[slot]) if live else 0
+                if current != version:
+                    return None
+            else:
+                if version != 0:
+                    return None
+                # Claim a never-used slot, or one whose value was deleted or expired
+                slot = next((candidate for candidate in self._probe(key_hash)
+                             if self._hashes[candidate] == 0 or self._lengths[candidate] == 0
+                             or self._expires[candidate] <= now), None)
+                if slot is None:
+                    raise SessionStoreFull(f"No free slot for session {key!r} within {self.max_probes} probes")
+                self._repair(slot)
+            # Versions only grow per slot, so a claimed slot never repeats a version a reader saw
+            new_version = int(self._versions[slot]) + 2
+            self._versions[slot] = new_version - 1  # Odd: readers retry until the write is complete
+            self._hashes[slot] = key_hash
+            self._values[slot, :len(value)] = np.frombuffer(value, dtype=np.uint8)
+            self._lengths[slot] = len(value)
+            self._expires[slot] = now + self.ttl
+            self._versions[slot] = new_version
+            return new_version
+
+    def delete(self, key: str):
+        key_hash = self._hash(key)
+        with self._lock:
+            slot = self._find(key_hash)
+            if slot is not None:
+                self._repair(slot)
+                # The hash stays as a tombstone so probing continues past the slot
+                self._versions[slot] += 1
+                self._lengths[slot] = 0
+                self._versions[slot] += 1
+
+    def stats(self) -> Dict:
+        now = time.time()
+        live = int(np.count_nonzero((self._lengths > 0) & (self._expires > now)))
+        return {'backend': 'shared_memory', 'keys': live, 'slots': self.slots, 'read_retries': self.read_retries,
+                'repairs': self.repairs}
+
+    def close(self):
+        self._hashes = self._versions = self._expires = self._lengths = self._values = self._table = None
+        self._shm.close()
+        self._lock.close()
+
+    def unlink(self):
+        """Remove the shared memory block once no worker uses it anymore."""
+        shared_memory.SharedMemory(name=self.name).unlink()
+
+
+class RespError(RuntimeError):
+    """Error reply from a Redis-protocol server."""
+
+
+class _RespConnection:
+    def __init__(self, host: str, port: int, timeout: float):
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.socket.makefile('rb')
+
+    def execute(self, *commands: Tuple) -> List:
+        """Send pipelined commands and return their replies in order."""
+        payload = []
+        for command in commands:
+            payload.append(b'*%d\r\n' % len(command))
+            for argument in command:
+                if not isinstance(argument, bytes):
+                    argument = str(argument).encode()
+                payload.append(b'$%d\r\n%s\r\n' % (len(argument), argument))
+        self.socket.sendall(b''.join(payload))
+        return [self._reply() for _ in commands]
+
+    def _reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Session store connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode()
+        if kind == b'-':
+            return RespError(body.decode())
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(body)
+            return None if count < 0 else [self._reply() for _ in range(count)]
+        raise RespError(f"Unexpected reply {line!r}")
+
+    def close(self):
+        self.reader.close()
+        self.socket.close()
+
+
+_VERSION = struct.Struct('>Q')  # Version prefix of stored values
+
+
+class RespStore(SessionStore):
+    shared = True
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", prefix: str = "fittrack:session:",
+                 ttl: float = 86400.0, timeout: float = 1.0):
+        """Session store on a Redis-protocol server, shared by API workers on any host.
+
+        Values are stored with an 8-byte version prefix. `compare_and_set`
+        uses Redis' optimistic transactions: WATCH the key and read it in
+        one pipelined round trip, then MULTI/SET/EXEC in a second; EXEC
+        fails if another client wrote the key in between. Only GET, SET,
+        DEL, WATCH, UNWATCH, MULTI, EXEC, AUTH and SELECT are used, so any
+        Redis-compatible server or a small local stand-in works.
+
+        Args:
+            url: redis://[:password@]host[:port][/db]
+            prefix: Key prefix for session records
+            ttl: Seconds after its last write a value expires
+            timeout: Socket timeout in seconds
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.prefix = prefix.encode()
+        self.ttl_ms = int(ttl * 1000)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[_RespConnection] = []
+        self._connections_lock = threading.Lock()
+        self.conflicts = 0
+
+    def _connection(self) -> _RespConnection:
+        # One connection per thread: requests run on a thread pool and replies must not interleave
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = _RespConnection(self.host, self.port, self.timeout)
+            setup = ([('AUTH', self.password)] if self.password else []) + ([('SELECT', self.db)] if self.db else [])
+            if setup:
+                self._check(connection.execute(*setup))
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _execute(self, *commands: Tuple) -> List:
+        try:
+            return self._connection().execute(*commands)
+        except (OSError, ConnectionError):
+            # Drop a broken connection so the next call reconnects
+            connection = self._local.__dict__.pop('connection', None)
+            if connection is not None:
+                connection.close()
+            raise
+
+    @staticmethod
+    def _check(replies: List) -> List:
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    @staticmethod
+    def _unpack(stored: Optional[bytes]) -> Optional[Tuple[bytes, int]]:
+        if stored is None:
+            return None
+        return stored[_VERSION.size:], _VERSION.unpack_from(stored)[0]
+
+    def get(self, key: str) -> Optional[Tuple[bytes, int]]:
+        (stored,) = self._check(self._execute(('GET', self.prefix + key.encode())))
+        return self._unpack(stored)
+
+    def compare_and_set(self, key: str, value: bytes, version: int) -> Optional[int]:
+        name = self.prefix + key.encode()
+        _, stored = self._check(self._execute(('WATCH', name), ('GET', name)))
+        current = self._unpack(stored)
+        if (current[1] if current is not None else 0) != version:
+            self._execute(('UNWATCH',))
+            self.conflicts += 1
+            return None
+        # A recreated key starts at a random version, so a reader that saw the deleted one can't match it
+        new_version = version + 1 if version else secrets.randbits(62) + 1
+        replies = self._check(self._execute(('MULTI',), ('SET', name, _VERSION.pack(new_version) + value,
+                                                          'PX', self.ttl_ms), ('EXEC',)))
+        if replies[-1] is None:  # Key changed after WATCH
+            self.conflicts += 1
+            return None
+        return new_version
+
+    def delete(self, key: str):
+        self._check(self._execute(('DEL', self.prefix + key.encode())))
+
+    def stats(self) -> Dict:
+        return {'backend': 'redis', 'host': self.host, 'port': self.port, 'conflicts': self.conflicts}
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+SESSION_STORES = ('memory', 'shared_memory', 'redis')
+
+
+def create_store(backend: str = 'memory', ttl: float = 86400.0, **options) -> SessionStore:
+    """Create a session store by backend name.
+
+    Args:
+        backend: 'memory' (this process only), 'shared_memory' (workers on one host) or 'redis'
+        ttl: Seconds after its last write a session record expires
+        **options: Backend-specific keyword arguments
+
+    Returns:
+        SessionStore instance
+    """
+    if backend == 'memory':
+        return InProcessStore(ttl=ttl, **options)
+    if backend == 'shared_memory':
+        return SharedMemoryStore(ttl=ttl, **options)
+    if backend == 'redis':
+        return RespStore(ttl=ttl, **options)
+    raise ValueError(f"Unknown session store '{backend}', expected one of {', '.join(SESSION_STORES)}")
@@ -0,0 +1,111 @@
+from typing import Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.pose.landmark_buffer import NUM_LANDMARKS, coordinates
+
+Color = Tuple[int, int, int]
+
+# MediaPipe Pose topology (mp.solutions.pose.POSE_CONNECTIONS), in a fixed order
+POSE_CONNECTIONS = (
+    # Face
+    (0, 1), (1, 2), (2, 3), (3, 7), (0, 4), (4, 5), (5, 6), (6, 8), (9, 10),
+    # Torso
+    (11, 12), (11, 23), (12, 24), (23, 24),
+    # Left arm and hand
+    (11, 13), (13, 15), (15, 17), (15, 19), (15, 21), (17, 19),
+    # Right arm and hand
+    (12, 14), (14, 16), (16, 18), (16, 20), (16, 22), (18, 20),
+    # Left leg and foot
+    (23, 25), (25, 27), (27, 29), (27, 31), (29, 31),
+    # Right leg and foot
+    (24, 26), (26, 28), (28, 30), (28, 32), (30, 32),
+)
+
+
+def connection_array(connections: Iterable[Tuple[int, int]], num_landmarks: int = NUM_LANDMARKS) -> np.ndarray:
+    """Validate a connection table into an (N, 2) index array.
+
+    Args:
+        connections: (start, end) landmark index pairs
+        num_landmarks: Number of landmarks the indices must address
+
+    Returns:
+        Array of the pairs with both indices in range, in input order
+    """
+    pairs = np.asarray(list(connections), dtype=np.intp).reshape(-1, 2)
+    valid = ((pairs >= 0) & (pairs < num_landmarks)).all(axis=1)
+    return pairs[valid]
+
+
+class SkeletonRasterizer:
+    def __init__(self, connections: Iterable[Tuple[int, int]] = POSE_CONNECTIONS, line_thickness: int = 2,
+                 point_radius: int = 4, num_landmarks: int = NUM_LANDMARKS):
+        """Draw pose skeletons with a few OpenCV calls per frame.
+
+        Landmarks are converted to pixels in one NumPy operation, all bones
+        of one colour are drawn with a single `cv2.polylines` call, and all
+        joints with another (a zero-length segment as thick as the joint
+        diameter rasterizes as a filled dot).
+
+        Args:
+            connections: (start, end) landmark index pairs; out-of-range pairs are dropped once here
+            line_thickness: Bone thickness in pixels
+            point_radius: Joint radius in pixels (0 draws no joints)
+            num_landmarks: Number of landmarks per pose
+        """
+        self.connections = connection_array(connections, num_landmarks)
+        self.line_thickness = line_thickness
+        self.point_radius = point_radius
+        self.num_landmarks = num_landmarks
+
+    def to_pixels(self, landmarks: np.ndarray, width: int, height: int) -> np.ndarray:
+        """Convert normalized (x, y) landmark columns to an (N, 2) int32 array of pixel positions."""
+        return (coordinates(landmarks) * (width, height)).astype(np.int32)
+
+    def bone_colors(self, color: Color, highlight_joints: Optional[Iterable[int]] = None,
+                    highlight_color: Color = (0, 0, 255)) -> np.ndarray:
+        """Per-bone colours that mark every bone touching one of `highlight_joints`.
+
+        Returns:
+            uint8 array of shape (len(connections), 3), aligned with `connections`
+        """
+        colors = np.empty((len(self.connections), 3), dtype=np.uint8)
+        colors[:] = color
+        if highlight_joints is not None:
+            joints = np.fromiter(highlight_joints, dtype=np.intp)
+            colors[np.isin(self.connections, joints).any(axis=1)] = highlight_color
+        return colors
+
+    def draw(self, image: np.ndarray, landmarks: np.ndarray, color: Color,
+             bone_colors: Optional[np.ndarray] = None, joint_color: Optional[Color] = None) -> np.ndarray:
+        """Draw a skeleton in place.
+
+        Args:
+            image: BGR image drawn on in place
+            landmarks: Array of shape (33, C) with normalized (x, y) in the first two columns
+            color: Colour of bones without a per-bone colour, and of joints by default
+            bone_colors: Optional (len(connections), 3) per-bone colours, e.g. from `bone_colors`
+            joint_color: Joint colour (defaults to `color`)
+
+        Returns:
+            The same image
+        """
+        height, width = image.shape[:2]
+        points = self.to_pixels(landmarks, width, height)
+        bones = points[self.connections]  # (B, 2, 2) segment endpoints
+
+        if bone_colors is None:
+            cv2.polylines(image, bones, False, color, self.line_thickness)
+        else:
+            # One call per distinct colour; error highlighting only adds a few
+            packed = bone_colors.astype(np.int32) @ np.array([1 << 16, 1 << 8, 1], dtype=np.int32)
+            for key in np.unique(packed).tolist():
+                bone_color = ((key >> 16) & 255, (key >> 8) & 255, key & 255)
+                cv2.polylines(image, bones[packed == key], False, bone_color, self.line_thickness)
+
+        if self.point_radius > 0:
+            joints = np.repeat(points[:, None], 2, axis=1)
+            cv2.polylines(image, joints, False, joint_color or color, 2 * self.point_radius)
+        return image
@@ -1,120 +1,127 @@
+import argparse
 import cv2
-import numpy as np
-import time
-from pose_detector import PoseDetector
-from pose_comparator import PoseComparator
-from feedback_renderer import FeedbackRenderer
+from typing import Dict, Optional, Union
+from app.pose.pose_detector import PoseDetector
+from app.pose.pose_comparator import PoseComparator
+from app.pose.feedback_renderer import FeedbackRenderer
+from app.pose.motion_gate import MotionGate
+from app.pose.landmark_filter import OneEuroFilter
+from app.pose.pipeline import FramePipeline, format_stats, open_capture, source_fps
 
-def main():
+def main(source: Union[int, str] = 0, headless: bool = False, pace: bool = True,
+         max_frames: Optional[int] = None) -> Optional[Dict]:
+    """Run the smart mirror on a camera or a video file.
+
+    Args:
+        source: Camera index or video file path
+        headless: Run without a window, e.g. to benchmark the pipeline on a recorded clip
+        pace: Read video files at their recorded frame rate, like a camera
+        max_frames: Stop after rendering this many frames
+
+    Returns:
+        Per-stage pipeline statistics
+    """
     # Initialize components
-    detector = PoseDetector(min_detection_confidence=0.7, min_tracking_confidence=0.7)
+    # Smoothing removes skeleton jitter and bridges frames where detection drops out
+    detector = PoseDetector(min_detection_confidence=0.7, min_tracking_confidence=0.7, roi_tracking=True,
+                            smoother=OneEuroFilter())
     comparator = PoseComparator()
     renderer = FeedbackRenderer("Smart Mirror Mode")
+    # Reuse the last landmarks while the user holds still (holds, rest between sets)
+    motion_gate = MotionGate(threshold=2.0, max_skip=5)
+    
+    # Camera, or a video file for headless runs
+    cap = open_capture(source, 1280, 720)
+    pace_fps = source_fps(cap) if pace and isinstance(source, str) else None
     
-    # Initialize video capture
-    cap = cv2.VideoCapture(0)  # 0 for default camera
+    # Main loop state, only touched on the render (main) thread
+    state = {'reference_pose': None, 'show_reference': False}
     
-    # Set camera resolution (adjust based on your camera's capabilities)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    def infer(frame):
+        # Detect pose (inference thread)
+        landmarks, _ = motion_gate.process(frame, detector.detect_landmarks)
+        # The render stage keeps this result while the next frame is inferred; copy the buffer slot
+        return None if landmarks is None else landmarks.copy()
+    
+    def render(frame, landmarks):
+        # Process frame based on current state
+        display_frame = frame
+        
+        # Draw per-stage FPS
+        cv2.putText(display_frame, f"{pipeline.describe()}  Skipped: {motion_gate.skip_rate:.0%}", (10, 30), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        
+        # If we have a reference pose and landmarks are detected, compare them
+        feedback = {}
+        if state['reference_pose'] is not None and landmarks is not None:
+            # Compare current pose with reference
+            comparison = comparator.compare_with_reference(landmarks)
+            
+            # Draw pose with color coding based on similarity
+            display_frame = renderer.draw_pose(
+                display_frame, landmarks, comparison['similarity']
+            )
+            
+            # Add feedback to display
+            feedback = {
+                'similarity': comparison['similarity'],
+                'feedback': comparison['feedback']
+            }
+            
+            # Toggle reference overlay if enabled
+            if state['show_reference']:
+                display_frame = renderer.draw_reference_overlay(display_frame, state['reference_pose'])
+        elif landmarks is not None:
+            # Just draw the detected pose in neutral color if no reference
+            display_frame = renderer.draw_pose(display_frame, landmarks, 1.0)
+        
+        # Draw feedback panel
+        return renderer.draw_feedback_panel(display_frame, feedback)
     
-    # Variables for FPS calculation
-    prev_time = 0
-    fps = 0
+    def on_key(key, landmarks):
+        # Set reference pose with 'r' key
+        if key == ord('r') and landmarks is not None:
+            state['reference_pose'] = landmarks
+            comparator.set_reference_pose(landmarks)
+            print("Reference pose set!")
+        
+        # Toggle reference overlay with 't' key
+        elif key == ord('t'):
+            state['show_reference'] = not state['show_reference']
+            print(f"Reference overlay: {'ON' if state['show_reference'] else 'OFF'}")
+        return True
     
-    # Main loop
-    reference_pose = None
-    show_reference = False
+    # Capture, inference and rendering run concurrently and drop stale frames
+    pipeline = FramePipeline(cap, infer, render, show=None if headless else renderer.show_image,
+                             on_key=on_key, pace_fps=pace_fps)
     
     print("Smart Mirror Mode started!")
-    print("Press 'r' to set reference pose")
-    print("Press 't' to toggle reference overlay")
-    print("Press 'q' to quit")
+    if not headless:
+        print("Press 'r' to set reference pose")
+        print("Press 't' to toggle reference overlay")
+        print("Press 'q' to quit")
     
     try:
-        while True:
-            # Read frame from camera
-            success, frame = cap.read()
-            if not success:
-                print("Failed to capture frame")
-                break
-            
-            # Mirror the frame for more natural interaction
-            frame = cv2.flip(frame, 1)
-            
-            # Detect pose
-            landmarks = detector.detect_landmarks(frame)
-            
-            # Process frame based on current state
-            display_frame = frame.copy()
-            
-            # Calculate FPS
-            current_time = time.time()
-            fps = 1 / (current_time - prev_time) if prev_time > 0 else 0
-            prev_time = current_time
-            
-            # Draw FPS
-            cv2.putText(display_frame, f"FPS: {int(fps)}", (10, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            # If we have a reference pose and landmarks are detected, compare them
-            feedback = {}
-            if reference_pose is not None and landmarks is not None:
-                # Compare current pose with reference
-                comparison = comparator.compare_with_reference(landmarks)
-                
-                # Draw pose with color coding based on similarity
-                display_frame = renderer.draw_pose(
-                    display_frame, landmarks, comparison['similarity']
-                )
-                
-                # Add feedback to display
-                feedback = {
-                    'similarity': comparison['similarity'],
-                    'feedback': comparison['feedback']
-                }
-                
-                # Toggle reference overlay if enabled
-                if show_reference:
-                    display_frame = renderer.draw_reference_overlay(display_frame, reference_pose)
-            elif landmarks is not None:
-                # Just draw the detected pose in neutral color if no reference
-                display_frame = renderer.draw_pose(display_frame, landmarks, 1.0)
-            
-            # Draw feedback panel
-            display_frame = renderer.draw_feedback_panel(display_frame, feedback)
-            
-            # Show the frame
-            renderer.show_image(display_frame)
-            
-            # Check for key presses
-            key = cv2.waitKey(1) & 0xFF
-            
-            # Set reference pose with 'r' key
-            if key == ord('r') and landmarks is not None:
-                reference_pose = landmarks
-                comparator.set_reference_pose(reference_pose)
-                print("Reference pose set!")
-            
-            # Toggle reference overlay with 't' key
-            elif key == ord('t'):
-                show_reference = not show_reference
-                print(f"Reference overlay: {'ON' if show_reference else 'OFF'}")
-            
-            # Quit on 'q' key
-            elif key == ord('q'):
-                print("Exiting...")
-                break
+        stats = pipeline.run(max_frames)
+        print(format_stats(stats))
+        return stats
     
     except KeyboardInterrupt:
         print("\nExiting...")
     
     finally:
         # Release resources
+        pipeline.stop()
         cap.release()
         detector.release()
         renderer.destroy_windows()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Smart mirror pose feedback")
+    parser.add_argument('--video', help="Read this video file instead of the camera")
+    parser.add_argument('--headless', action='store_true', help="Run without a window and print stage FPS")
+    parser.add_argument('--no-pace', action='store_true', help="Read video files as fast as possible")
+    parser.add_argument('--max-frames', type=int)
+    args = parser.parse_args()
+    main(args.video if args.video else 0, args.headless, not args.no_pace, args.max_frames)
@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from typing import Dict, List
+
+from sqlalchemy import insert, inspect, select
+from sqlalchemy.orm import Session
+from app.models.exercise import ExerciseSession, RepRecord
+
+# Columns written by bulk rep inserts, in COPY order
+REP_COLUMNS = ("session_id", "rep_number", "timestamp", "correctness", "feedback", "landmarks")
+_LOOKUP_CHUNK = 500  # Record ids per existence query, below SQLite's bound parameter limit
+
+
+class ExerciseRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_session(self, session_id: int, user_id: int):
+        return self.db.query(ExerciseSession).filter_by(id=session_id, user_id=user_id).first()
+
+    def has_record_ids(self) -> bool:
+        """Return whether rep_records has the record_id column the write-behind log dedupes replays by."""
+        columns = inspect(self.db.connection()).get_columns(RepRecord.__tablename__)
+        return any(column["name"] == "record_id" for column in columns)
+
+    def add_reps(self, session_id: int, reps: List[Dict]) -> int:
+        """Insert rep records of one session in a single transaction.
+
+        Args:
+            session_id: Session the reps belong to
+            reps: Rep fields as produced by RepRecordSchema.dict()
+
+        Returns:
+            Number of rows inserted
+        """
+        return self.insert_reps([dict(rep, session_id=session_id) for rep in reps])
+
+    def insert_reps(self, rows: List[Dict], skip_existing: bool = False) -> int:
+        """Insert rep rows of any sessions in a single transaction.
+
+        PostgreSQL rows are streamed with COPY; other databases get one
+        executemany INSERT.
+
+        Args:
+            rows: RepRecord column values including 'session_id', plus 'record_id' for rows
+                from the write-behind log (see `has_record_ids`)
+            skip_existing: Leave out rows whose record_id is already stored, e.g. when replaying
+                a log that may have been partly committed; rows without one are inserted
+
+        Returns:
+            Number of rows inserted
+        """
+        with_ids = any("record_id" in row for row in rows)
+        if with_ids:
+            # Rows logged before record ids existed have none; executemany needs the same keys in every row
+            rows = [row if "record_id" in row else dict(row, record_id=None) for row in rows]
+        if skip_existing and with_ids:
+            ids = [row["record_id"] for row in rows if row["record_id"] is not None]
+            record_ids = RepRecord.__table__.c.record_id  # Not mapped on RepRecord
+            stored = set()
+            for start in range(0, len(ids), _LOOKUP_CHUNK):
+                chunk = ids[start:start + _LOOKUP_CHUNK]
+                stored.update(self.db.scalars(select(record_ids).where(record_ids.in_(chunk))))
+            rows = [row for row in rows if row["record_id"] not in stored]
+        if not rows:
+            return 0
+        connection = self.db.connection()
+        if connection.dialect.name == "postgresql" and connection.dialect.driver in ("psycopg2", "psycopg"):
+            self._copy_reps(connection, rows, with_ids)
+        else:
+            self.db.execute(insert(RepRecord.__table__), rows)
+        self.db.commit()
+        return len(rows)
+
+    @staticmethod
+    def _copy_reps(connection, rows: List[Dict], with_ids: bool):
+        # CSV keeps JSON landmarks and free-text feedback intact. COPY reads an unquoted empty field as NULL,
+        # so FORCE_NOT_NULL keeps empty feedback '' as the executemany INSERT stores it
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            values = (row["session_id"], row["rep_number"], row["timestamp"].isoformat(),
+                      repr(row["correctness"]), row["feedback"], json.dumps(row["landmarks"]))
+            writer.writerow(values + (row["record_id"],) if with_ids else values)  # A None id is written as NULL
+        columns = REP_COLUMNS + ("record_id",) if with_ids else REP_COLUMNS
+        statement = (f"COPY {RepRecord.__tablename__} ({', '.join(columns)}) FROM STDIN "
+                     "WITH (FORMAT csv, FORCE_NOT_NULL (feedback))")
+        cursor = connection.connection.cursor()
+        try:
+            if connection.dialect.driver == "psycopg2":
+                buffer.seek(0)
+                cursor.copy_expert(statement, buffer)
+            else:
+                with cursor.copy(statement) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
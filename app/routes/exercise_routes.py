@@ -1,15 +1,100 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+import math
+import numpy as np
+from fastapi import APIRouter, Body, Depends, HTTPException
+from pydantic import ValidationError
 from realtime import List
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from app.core.config import settings
+from app.database.database import SessionLocal, get_db
 from app.models.exercise import ExerciseSession, RepRecord
-from app.schemas.exercise_schema import ExerciseSessionCreate, ExerciseSessionEnd, RepRecordSchema, ExerciseSessionSummary
+from app.pose.session_cache import ExerciseSessionCache, SessionExpired
+from app.repositories.exercise_repo import ExerciseRepository
+from app.services.rep_writer import RepWriteBehind, RepWriterOverloaded
+from app.pose.session_store import RespError, SessionStoreBusy, SessionStoreFull, create_store
+from app.schemas.exercise_schema import ExerciseSessionCreate, ExerciseSessionEnd, RepRecordSchema, ExerciseSessionSummary, LandmarkFramesSchema
 from app.models.user import User
 from app.core.dependencies import get_current_user  # Your JWT user dependency
 
 router = APIRouter(prefix="/exercise/session", tags=["Exercise Sessions"])
 
+def _create_session_store():
+    if settings.POSE_SESSION_STORE == "shared_memory":
+        return create_store("shared_memory", ttl=settings.POSE_ANALYZER_SNAPSHOT_TTL,
+                            name=settings.POSE_SESSION_STORE_NAME, slots=settings.POSE_SESSION_STORE_SLOTS)
+    if settings.POSE_SESSION_STORE == "redis":
+        return create_store("redis", ttl=settings.POSE_ANALYZER_SNAPSHOT_TTL, url=settings.POSE_SESSION_STORE_URL)
+    return create_store(settings.POSE_SESSION_STORE, ttl=settings.POSE_ANALYZER_SNAPSHOT_TTL)
+
+# Rep detectors of sessions streaming landmarks; shared stores let any worker continue a session
+session_cache = ExerciseSessionCache(
+    max_sessions=settings.POSE_ANALYZER_MAX_SESSIONS,
+    idle_timeout=settings.POSE_ANALYZER_IDLE_TIMEOUT,
+    store=_create_session_store(),
+)
+
+def _write_reps(rows, replay):
+    db = SessionLocal()
+    try:
+        ExerciseRepository(db).insert_reps(rows, skip_existing=replay)
+    finally:
+        db.close()
+
+# Optional write-behind of rep records: acknowledged after a local log append, inserted in bulk
+rep_writer = RepWriteBehind(
+    _write_reps,
+    log_dir=settings.EXERCISE_REP_LOG_DIR,
+    max_lag=settings.EXERCISE_REP_MAX_LAG,
+    flush_rows=settings.EXERCISE_REP_FLUSH_ROWS,
+    max_pending=settings.EXERCISE_REP_MAX_PENDING,
+) if settings.EXERCISE_REP_WRITE_BEHIND else None
+
+def startup():
+    # Replays reps a crashed run acknowledged but never inserted
+    if rep_writer is not None:
+        db = SessionLocal()
+        try:
+            if not ExerciseRepository(db).has_record_ids():
+                raise RuntimeError("EXERCISE_REP_WRITE_BEHIND needs the rep_records.record_id column: "
+                                   "ALTER TABLE rep_records ADD COLUMN record_id VARCHAR(32) UNIQUE")
+        finally:
+            db.close()
+        rep_writer.start()
+
+def shutdown():
+    if rep_writer is not None:
+        rep_writer.stop()
+
+def _all_finite(value) -> bool:
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, list):
+        return all(_all_finite(item) for item in value)
+    if isinstance(value, dict):
+        return all(_all_finite(item) for item in value.values())
+    return True
+
+def _rep_error(rep: RepRecordSchema):
+    # Rows the database would reject must not reach the write-behind log, where they would be dead-lettered
+    if len(rep.feedback) > RepRecord.feedback.type.length:
+        return f"feedback is longer than {RepRecord.feedback.type.length} characters"
+    if not -2**31 <= rep.rep_number < 2**31:
+        return "rep_number is out of range"  # INTEGER column
+    if not math.isfinite(rep.correctness):
+        return "correctness must be a finite number"
+    if not _all_finite(rep.landmarks):
+        return "landmarks must contain only finite numbers"  # JSON has no NaN or Infinity
+    return None
+
+def _store_reps(db: Session, session_id: int, reps: List[dict]) -> int:
+    if rep_writer is None:
+        return ExerciseRepository(db).add_reps(session_id, reps)
+    try:
+        rep_writer.append([dict(rep, session_id=session_id) for rep in reps])
+    except RepWriterOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return len(reps)
+
 @router.post("/start")
 def start_session(payload: ExerciseSessionCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     session = ExerciseSession(
@@ -26,25 +111,146 @@ def add_rep_data(session_id: int, rep_record: RepRecordSchema, db: Session = Dep
     session = db.query(ExerciseSession).filter_by(id=session_id, user_id=user.id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    rep = RepRecord(session_id=session_id, **rep_record.dict())
-    db.add(rep)
-    db.commit()
+    error = _rep_error(rep_record)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    if rep_writer is not None:
+        _store_reps(db, session_id, [rep_record.dict()])
+    else:
+        rep = RepRecord(session_id=session_id, **rep_record.dict())
+        db.add(rep)
+        db.commit()
     return {"message": "Recorded successfully"}
 
+@router.post("/{session_id}/data/batch")
+def add_rep_data_batch(session_id: int, reps: List[dict] = Body(...), db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """Record many reps in one transaction; invalid items are reported and the rest are stored."""
+    if len(reps) > settings.EXERCISE_REP_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.EXERCISE_REP_BATCH_MAX_ITEMS} reps per batch")
+    repo = ExerciseRepository(db)
+    if not repo.get_session(session_id, user.id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    rows, errors, rep_numbers = [], [], set()
+    for index, item in enumerate(reps):
+        try:
+            rep = RepRecordSchema(**item)
+        except ValidationError as e:
+            errors.append({"index": index, "error": "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())})
+            continue
+        error = _rep_error(rep)
+        if error:
+            errors.append({"index": index, "error": error})
+        elif rep.rep_number in rep_numbers:
+            errors.append({"index": index, "error": f"rep_number {rep.rep_number} repeats an earlier item"})
+        else:
+            rep_numbers.add(rep.rep_number)
+            rows.append(rep.dict())
+    inserted = _store_reps(db, session_id, rows)
+    return {"message": "Recorded successfully" if not errors else "Recorded with errors", "inserted": inserted, "errors": errors}
+
+# Session store failures a retry can get past: conflicts, a full shared-memory store, an unreachable Redis
+_SESSION_STORE_ERRORS = (SessionStoreBusy, SessionStoreFull, RespError, OSError)
+
+def _session_store_error(error: Exception) -> HTTPException:
+    if isinstance(error, SessionStoreBusy):
+        detail = "Session state busy, retry later"
+    elif isinstance(error, SessionStoreFull):
+        detail = "Session store full, retry later"
+    else:
+        detail = "Session store unavailable, retry later"
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+
+def _open_session_exercise(db: Session, session_id: int, user_id: int) -> str:
+    session = db.query(ExerciseSession).filter_by(id=session_id, user_id=user_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.end_time is not None:
+        raise HTTPException(status_code=409, detail="Session already ended")
+    return session.exercise_name
+
+@router.post("/{session_id}/landmarks")
+def ingest_landmarks(session_id: int, payload: LandmarkFramesSchema, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """Count reps and check form server-side from time-ordered landmark frames."""
+    key = str(session_id)
+    exercise_name = None
+    try:
+        known, owner = session_cache.owner(key)
+    except _SESSION_STORE_ERRORS as e:
+        raise _session_store_error(e)
+    if known:
+        # Ownership was checked when the session's detector was created; skip the query per frame batch
+        if owner != user.id:
+            raise HTTPException(status_code=404, detail="Session not found")
+    else:
+        exercise_name = _open_session_exercise(db, session_id, user.id)
+
+    if len(payload.frames) > settings.POSE_ANALYZER_MAX_FRAMES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.POSE_ANALYZER_MAX_FRAMES} frames per request")
+    shape_error = "frames must be a non-empty list of 33 landmarks with at least (x, y, visibility)"
+    try:
+        # Ragged frames or landmarks can't form an array
+        frames = np.asarray(payload.frames, dtype=np.float32)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=shape_error)
+    if frames.ndim != 3 or frames.shape[0] == 0 or frames.shape[1] != 33 or frames.shape[2] < 3:
+        raise HTTPException(status_code=400, detail=shape_error)
+    try:
+        try:
+            analysis = session_cache.analyze(key, exercise_name, frames, owner=user.id)
+        except SessionExpired:
+            # The state vanished after owner(), e.g. the session just ended; the database decides
+            analysis = session_cache.analyze(key, _open_session_exercise(db, session_id, user.id), frames,
+                                             owner=user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except _SESSION_STORE_ERRORS as e:
+        raise _session_store_error(e)
+    if exercise_name is not None or analysis["new_reps"]:
+        # Persist the server count when the session starts streaming and as reps complete, so /end never
+        # falls back to the client's total once landmarks were ingested
+        db.query(ExerciseSession).filter_by(id=session_id).update({"total_reps": analysis["rep_count"]})
+        db.commit()
+    return {
+        "rep_count": analysis["rep_count"],
+        "phase": analysis["phase"],
+        "feedback": analysis["feedback"],
+        "frames": len(frames),
+    }
+
 @router.post("/{session_id}/end")
 def end_session(session_id: int, end_payload: ExerciseSessionEnd, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     session = db.query(ExerciseSession).filter_by(id=session_id, user_id=user.id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    session.end_time = datetime.now(datetime.timezone.utc)
-    session.total_reps = end_payload.total_reps
-    session.avg_score = end_payload.avg_score
+    if session.end_time is not None:
+        raise HTTPException(status_code=409, detail="Session already ended")
+    session.end_time = datetime.now(timezone.utc)
+    # Reps counted from streamed landmarks take precedence over the client's total
+    try:
+        state = session_cache.end(str(session_id))
+    except _SESSION_STORE_ERRORS as e:
+        raise _session_store_error(e)
+    if state is not None:
+        session.total_reps = state[1]
+    elif session.total_reps is None:
+        # No landmarks were ever ingested; otherwise keep the count persisted while they streamed
+        session.total_reps = end_payload.total_reps or 0
+    if end_payload.avg_score is not None:
+        session.avg_score = end_payload.avg_score
     db.commit()
     return {
         "message": "Session ended",
         "session_summary": ExerciseSessionSummary.from_orm(session)
     }
 
+@router.get("/stats")
+def ingest_stats():
+    stats = {"session_cache": session_cache.stats()}
+    if rep_writer is not None:
+        stats["rep_writer"] = rep_writer.stats()
+    return stats
+
 @router.get("/history", response_model=List[ExerciseSessionSummary])
 def get_history(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     sessions = db.query(ExerciseSession).filter_by(user_id=user.id).all()
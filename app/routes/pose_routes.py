@@ -1,17 +1,374 @@
-from fastapi import APIRouter, Request
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.dependencies import get_token_user_id
+from app.pose.inference_executor import InferenceExecutor, InferenceOverloadedError, InferenceTimeoutError
+from app.pose.inference_scheduler import MicroBatchScheduler
+from app.pose.motion_gate import FrameDedupCache, MotionGate
+from app.pose.quality_governor import DEFAULT_TIER, QualityGovernor, downscale
+from app.pose.exercise_detector import ExerciseDetector
+from app.pose.pose_backends import create_backend, parse_models
 from app.pose.pose_detector import PoseDetector
+from app.pose.landmark_filter import OneEuroFilter
+from app.pose.frame_codec import decode_base64_image, decode_base64_images, decode_image_bytes
+from app.schemas.pose_schema import PoseBatchRequest
 
 
 router = APIRouter(prefix="/pose")
 
+def _backend_options() -> dict:
+    if settings.POSE_BACKEND == "onnx":
+        return {"models": parse_models(settings.POSE_ONNX_MODELS), "model_format": settings.POSE_ONNX_FORMAT,
+                "intra_op_threads": settings.POSE_ONNX_THREADS}
+    return {}
+
+governor = QualityGovernor(target_latency_ms=settings.POSE_TARGET_LATENCY_MS) if settings.POSE_ADAPTIVE_QUALITY else None
+inference = InferenceExecutor(
+    workers=settings.POSE_INFERENCE_WORKERS,
+    threads=settings.POSE_POOL_SIZE,
+    max_pending=settings.POSE_INFERENCE_MAX_PENDING,
+    deadline=settings.POSE_INFERENCE_DEADLINE,
+    max_uses=settings.POSE_POOL_MAX_USES,
+    ring_slots=settings.POSE_FRAME_RING_SLOTS,
+    ring_max_size=(settings.POSE_FRAME_RING_MAX_HEIGHT, settings.POSE_FRAME_RING_MAX_WIDTH),
+    governor=governor,
+    backend=settings.POSE_BACKEND,
+    backend_options=_backend_options(),
+    checkout_timeout=settings.POSE_POOL_CHECKOUT_TIMEOUT,
+)
+scheduler = MicroBatchScheduler(
+    inference.detect_many,
+    window_ms=settings.POSE_MICROBATCH_WINDOW_MS,
+    max_batch=settings.POSE_MICROBATCH_MAX_SIZE,
+    max_queue=settings.POSE_INFERENCE_MAX_PENDING * settings.POSE_MICROBATCH_MAX_SIZE,
+)
+decode_executor = ThreadPoolExecutor(max_workers=settings.POSE_DECODE_THREADS, thread_name_prefix="pose-decode")
+stream_stats = {"active": 0, "frames_processed": 0, "frames_dropped": 0, "frames_skipped": 0,
+                "roi_hits": 0, "roi_fallbacks": 0}
+dedup_cache = FrameDedupCache(settings.POSE_DEDUP_CACHE_SIZE) if settings.POSE_DEDUP_CACHE_SIZE > 0 else None
+# Motion gates of process_frame clients that send a session_id, keyed by (user id, session_id) and
+# least recently used first; the lock serializes a session's frames from check to record
+session_gates: "OrderedDict[Tuple[int, str], Tuple[MotionGate, asyncio.Lock]]" = OrderedDict()
+
+def startup():
+    # Load pose models before serving so the first frames don't pay for it
+    inference.start()
+
+def shutdown():
+    scheduler.stop()
+    decode_executor.shutdown(wait=False)
+    inference.shutdown()
+
+def _inference_error(error: Exception) -> JSONResponse:
+    if isinstance(error, InferenceTimeoutError):
+        return JSONResponse(status_code=504, content={"error": "Pose inference deadline exceeded"})
+    return JSONResponse(status_code=503, content={"error": "Pose inference overloaded, retry later"},
+                        headers={"Retry-After": "1"})
+
+def _motion_gate() -> MotionGate:
+    return MotionGate(threshold=settings.POSE_MOTION_THRESHOLD, max_skip=settings.POSE_MOTION_MAX_SKIP)
+
+def _session_gate(user_id: int, session_id: str) -> Tuple[MotionGate, asyncio.Lock]:
+    key = (user_id, session_id)
+    entry = session_gates.get(key)
+    if entry is None:
+        entry = session_gates[key] = (_motion_gate(), asyncio.Lock())
+        if len(session_gates) > settings.POSE_MOTION_MAX_SESSIONS:
+            session_gates.popitem(last=False)
+    session_gates.move_to_end(key)
+    return entry
+
+async def _read_payload(request: Request):
+    """Read the encoded frame from a JSON (base64), raw binary or multipart request body.
+
+    Returns:
+        Tuple of (encoded bytes or base64 string, None) or (None, error message)
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("image")
+        if upload is None or isinstance(upload, str):
+            return None, "Image file is required"
+        encoded = await upload.read()
+    elif content_type.startswith(("application/octet-stream", "image/")):
+        # Decode straight from the request buffer, skipping JSON and base64
+        encoded = await request.body()
+    else:
+        try:
+            data = await request.json()
+        except ValueError:
+            return None, "Invalid JSON body"
+        if not isinstance(data, dict):
+            return None, "JSON body must be an object"
+        encoded = data.get("image_base64")
+        if encoded is not None and not isinstance(encoded, str):
+            return None, "image_base64 must be a string"
+
+    if not encoded:
+        return None, "Image data is required"
+    return encoded, None
+
+def _landmarks_json(landmarks):
+    # Responses keep the (x, y, visibility) layout; detectors also return z in a fourth column
+    return landmarks[:, :3].tolist() if landmarks is not None else None
+
 @router.post("/process_frame")
-async def process_frame(request: Request):
-    data = await request.json()
-    image_base64 = data.get("image_base64")
-    if not image_base64:
-        return JSONResponse(status_code=400, content={"error": "Image data is required"})
-
-    detector = PoseDetector()
-    landmarks = detector.detect(image_base64)
-    return {"landmarks": landmarks}
+async def process_frame(request: Request, session_id: Optional[str] = None,
+                        user_id: Optional[int] = Depends(get_token_user_id)):
+    """Detect landmarks in one frame.
+
+    Authenticated clients sending a continuous feed can pass a `session_id`;
+    frames that barely differ from the session's last inferred frame then
+    reuse its landmarks instead of running inference. Byte-identical retries
+    are answered from a cache without decoding.
+    """
+    gate_enabled = session_id and settings.POSE_MOTION_THRESHOLD > 0
+    if gate_enabled and user_id is None:
+        return JSONResponse(status_code=401, content={"error": "Authentication is required to use a session_id"},
+                            headers={"WWW-Authenticate": "Bearer"})
+    encoded, error = await _read_payload(request)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+
+    gate, gate_lock = _session_gate(user_id, session_id) if gate_enabled else (None, None)
+    key = None
+    if dedup_cache is not None:
+        key = dedup_cache.key(encoded)
+        cached = dedup_cache.get(key)
+        if cached is not None:
+            if gate is not None:
+                return {**cached, "cache_hit": True, "inferred": False, "skip_rate": gate.skip_rate}
+            return {**cached, "cache_hit": True}
+
+    image = decode_base64_image(encoded) if isinstance(encoded, str) else decode_image_bytes(encoded)
+    if image is None:
+        return JSONResponse(status_code=400, content={"error": "Invalid image data"})
+
+    async with gate_lock or nullcontext():
+        if gate is not None:
+            infer, landmarks = gate.check(image)
+            if not infer:
+                return {"landmarks": _landmarks_json(landmarks), "quality_tier": None,
+                        "inferred": False, "skip_rate": gate.skip_rate}
+
+        try:
+            if settings.POSE_MICROBATCH_WINDOW_MS > 0:
+                landmarks, _, quality_tier = await scheduler.submit(image)
+            else:
+                landmarks, quality_tier = await inference.detect(image)
+        except (InferenceOverloadedError, InferenceTimeoutError) as e:
+            return _inference_error(e)
+
+        result = {"landmarks": _landmarks_json(landmarks), "quality_tier": quality_tier}
+        if key is not None:
+            dedup_cache.put(key, result)
+        if gate is not None:
+            gate.record(landmarks)
+            return {**result, "inferred": True, "skip_rate": gate.skip_rate}
+    return result
+
+@router.post("/process_batch")
+async def process_batch(payload: PoseBatchRequest):
+    if not payload.frames:
+        return JSONResponse(status_code=400, content={"error": "At least one frame is required"})
+    if len(payload.frames) > settings.POSE_BATCH_MAX_FRAMES:
+        return JSONResponse(status_code=413,
+                            content={"error": f"At most {settings.POSE_BATCH_MAX_FRAMES} frames per batch"})
+
+    start = time.perf_counter()
+    decoded = await run_in_threadpool(decode_base64_images, payload.frames, decode_executor)
+    images = [image for image, _ in decoded if image is not None]
+    try:
+        # One client's frames in time order: one detector tracks the pose across them
+        detections = iter(await inference.detect_batch(images, track=True)) if images else iter(())
+    except (InferenceOverloadedError, InferenceTimeoutError) as e:
+        return _inference_error(e)
+
+    results = []
+    for image, decode_ms in decoded:
+        if image is None:
+            results.append({"landmarks": None, "error": "Invalid image data", "decode_ms": decode_ms})
+            continue
+        landmarks, inference_ms, quality_tier = next(detections)
+        results.append({
+            "landmarks": _landmarks_json(landmarks),
+            "quality_tier": quality_tier,
+            "decode_ms": decode_ms,
+            "inference_ms": inference_ms,
+        })
+    return {"results": results, "total_ms": (time.perf_counter() - start) * 1000}
+
+class _LatestFrame:
+    """Single-slot mailbox that only keeps the newest unprocessed frame."""
+
+    def __init__(self):
+        self._message = None
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, message):
+        if self._message is not None:
+            self.dropped += 1
+            stream_stats["frames_dropped"] += 1
+        self._message = message
+        self._ready.set()
+
+    async def get(self):
+        await self._ready.wait()
+        self._ready.clear()
+        message, self._message = self._message, None
+        return message
+
+def _release_stream_detector(detector, detector_lock):
+    # Cancelling _process_frames doesn't stop a frame already running in the threadpool;
+    # closing the graph under it would crash, so wait for that frame first
+    with detector_lock:
+        detector.release()
+
+class _BinaryFrame:
+    """An encoded image received as a binary message; JSON from clients can never produce one."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+def _analyze_stream_frame(detector, detector_lock, exercise_detector, gate, message):
+    if isinstance(message, _BinaryFrame):
+        image = decode_image_bytes(message.data)
+    elif not isinstance(message, dict):
+        return {"error": "Frame messages must be JSON objects"}
+    else:
+        encoded = message.get("image_base64") or ""
+        image = decode_base64_image(encoded) if isinstance(encoded, str) else None
+    if image is None:
+        return {"error": "Invalid image data"}
+    tier = governor.tier if governor is not None else DEFAULT_TIER
+    # Timed like pooled inference (downscale and detection) so the governor sees one metric
+    start = time.perf_counter()
+    with detector_lock:
+        detector.set_model_complexity(tier.model_complexity)
+        image = downscale(image, tier)
+        if gate is not None:
+            landmarks, inferred = gate.process(image, detector.detect_landmarks)
+        else:
+            landmarks, inferred = detector.detect_landmarks(image), True
+    inference_ms = (time.perf_counter() - start) * 1000
+    if governor is not None and inferred:
+        governor.observe(inference_ms, inference.pending)
+    analysis = exercise_detector.analyze_pose(landmarks)
+    return {
+        "landmarks": _landmarks_json(landmarks),
+        "quality_tier": tier.name,
+        "rep_count": analysis["rep_count"],
+        "feedback": analysis["feedback"],
+        "inference_ms": inference_ms,
+        "inferred": inferred,
+        "skip_rate": gate.skip_rate if gate is not None else 0.0,
+    }
+
+async def _receive_frames(websocket: WebSocket, mailbox: _LatestFrame):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            mailbox.put(_BinaryFrame(message["bytes"]))
+            continue
+        try:
+            mailbox.put(json.loads(message["text"]))
+        except ValueError:
+            await websocket.send_json({"error": "Invalid JSON message", "frame_id": None})
+
+async def _process_frames(websocket: WebSocket, mailbox: _LatestFrame, detector, detector_lock,
+                          exercise_detector, gate):
+    while True:
+        message = await mailbox.get()
+        result = await run_in_threadpool(_analyze_stream_frame, detector, detector_lock, exercise_detector,
+                                         gate, message)
+        stream_stats["frames_processed"] += 1
+        if result.get("inferred") is False:
+            stream_stats["frames_skipped"] += 1
+        result["frame_id"] = message.get("frame_id") if isinstance(message, dict) else None
+        result["dropped"] = mailbox.dropped
+        await websocket.send_json(result)
+
+@router.websocket("/stream")
+async def pose_stream(websocket: WebSocket, exercise: str = "squat"):
+    """Stream frames as {"image_base64", "frame_id"} text messages or raw JPEG/PNG
+    binary messages and receive landmarks, rep count and feedback back. Frames
+    arriving faster than inference are dropped, so results always describe the
+    newest frame."""
+    try:
+        exercise_detector = ExerciseDetector(exercise)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    if stream_stats["active"] >= settings.POSE_STREAM_MAX_SESSIONS:
+        await websocket.close(code=1013, reason="Too many active pose streams")
+        return
+
+    stream_stats["active"] += 1
+    detector = None
+    detector_lock = threading.Lock()  # Held while a frame uses the detector
+    try:
+        await websocket.accept()
+        # A dedicated detector keeps cross-frame tracking (ROI or MediaPipe's own) for this client
+        smoother = None
+        if settings.POSE_STREAM_SMOOTHING:
+            smoother = OneEuroFilter(min_cutoff=settings.POSE_SMOOTHING_MIN_CUTOFF, beta=settings.POSE_SMOOTHING_BETA)
+        options = _backend_options()
+        if settings.POSE_BACKEND == "mediapipe" and settings.POSE_STREAM_ROI_TRACKING:
+            # Crops and full frames differ in coordinates; the ROI tracker replaces MediaPipe's tracking
+            options["static_image_mode"] = True
+        detector = await run_in_threadpool(
+            lambda: PoseDetector(roi_tracking=settings.POSE_STREAM_ROI_TRACKING, smoother=smoother,
+                                 backend=create_backend(settings.POSE_BACKEND, **options)))
+        mailbox = _LatestFrame()
+        # Near-static frames (holds, rest between sets) reuse the last landmarks
+        gate = _motion_gate() if settings.POSE_MOTION_THRESHOLD > 0 else None
+        tasks = [
+            asyncio.create_task(_receive_frames(websocket, mailbox)),
+            asyncio.create_task(_process_frames(websocket, mailbox, detector, detector_lock, exercise_detector, gate)),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, Exception) and not isinstance(outcome, WebSocketDisconnect):
+                raise outcome
+    finally:
+        stream_stats["active"] -= 1
+        if detector is not None:
+            stream_stats["roi_hits"] += detector.roi_hits
+            stream_stats["roi_fallbacks"] += detector.roi_fallbacks
+            await run_in_threadpool(_release_stream_detector, detector, detector_lock)
+
+@router.get("/stats")
+def pose_stats():
+    streams = dict(stream_stats)
+    streams["skip_rate"] = streams["frames_skipped"] / streams["frames_processed"] if streams["frames_processed"] else 0.0
+    stats = {"inference": inference.stats(), "streams": streams}
+    if dedup_cache is not None:
+        stats["dedup_cache"] = dedup_cache.stats()
+    if session_gates:
+        seen = sum(gate.frames_seen for gate, _ in session_gates.values())
+        skipped = sum(gate.frames_skipped for gate, _ in session_gates.values())
+        stats["motion_gate"] = {"sessions": len(session_gates), "frames_seen": seen, "frames_skipped": skipped,
+                                "skip_rate": skipped / seen if seen else 0.0}
+    if settings.POSE_MICROBATCH_WINDOW_MS > 0:
+        stats["microbatch"] = scheduler.stats()
+    return stats
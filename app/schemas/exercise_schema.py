@@ -13,8 +13,11 @@ class ExerciseSessionCreate(BaseModel):
     exercise_name: str
 
 class ExerciseSessionEnd(BaseModel):
-    total_reps: int
-    avg_score: float
+    total_reps: Optional[int] = None  # Ignored when the server counted reps from streamed landmarks
+    avg_score: Optional[float] = None
+
+class LandmarkFramesSchema(BaseModel):
+    frames: List[List[List[float]]]  # Time-ordered frames of 33 landmarks (x, y, visibility[, z])
 
 class ExerciseSessionSummary(BaseModel):
     id: int
@@ -25,4 +28,4 @@ class ExerciseSessionSummary(BaseModel):
     avg_score: float
 
     class Config:
-        orm_mode = True
+        from_attributes = True  # Needed by from_orm
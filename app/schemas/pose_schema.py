@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+from typing import List
+
+class PoseBatchRequest(BaseModel):
+    frames: List[str]  # Base64 encoded images, oldest first
@@ -0,0 +1,420 @@
+import itertools
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from app.pose.metrics import Histogram
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_FRAME = struct.Struct('<II')  # Payload length and CRC-32 of each log record
+_SEGMENT_PREFIX = "segment-"
+_DEAD_LETTER_PREFIX = "dead-letter-"  # Rows the database rejected on their own; kept for inspection, never replayed
+
+
+class RepWriterOverloaded(RuntimeError):
+    """Raised when too many acknowledged reps are still waiting for the database."""
+
+
+def _encode_rows(rows: List[Dict]) -> bytes:
+    payload = json.dumps([dict(row, timestamp=row['timestamp'].isoformat()) for row in rows],
+                         separators=(',', ':')).encode()
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _read_segment(path: str) -> List[Dict]:
+    with open(path, 'rb') as file:
+        data = file.read()
+    rows, offset = [], 0
+    while offset + _FRAME.size <= len(data):
+        length, checksum = _FRAME.unpack_from(data, offset)
+        payload = data[offset + _FRAME.size:offset + _FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            break  # Torn tail of a crashed worker's log, never acknowledged
+        rows.extend(dict(row, timestamp=datetime.fromisoformat(row['timestamp'])) for row in json.loads(payload))
+        offset += _FRAME.size + length
+    return rows
+
+
+def _try_lock(file) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _sync_directory(path: str):
+    # Make segment creation and removal durable; directories can't be opened for fsync on Windows
+    if fcntl is not None:
+        descriptor = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+
+class RepWriteBehind:
+    def __init__(self, write_rows: Callable[[List[Dict], bool], None], log_dir: str, max_lag: float = 1.0,
+                 flush_rows: int = 500, max_pending: int = 100000):
+        """Acknowledge rep records once they are in a local write-ahead log and insert them in bulk later.
+
+        `append` writes rows to the current log segment and fsyncs it;
+        appends that arrive during an fsync share the next one. A flusher
+        thread inserts all pending rows with one `write_rows` call when
+        `flush_rows` are pending or the oldest is half of `max_lag` old,
+        which leaves the other half for the insert. Each flush starts a new
+        segment, and segments are deleted once their rows are committed. On
+        `start`, rows left in the log by a crash are loaded and flushed
+        first. Every worker process claims its own log directory under
+        `log_dir`, and a restarted worker claims the one it left behind.
+        Segments in directories no running worker holds, e.g. after a
+        restart with fewer workers, are adopted and replayed as well.
+
+        A failed flush is retried whole after a back-off. If the retry fails
+        too, the batch is bisected: the parts the database accepts are
+        committed and rows it rejects on their own are moved to a
+        dead-letter file, so one bad row cannot block every later flush.
+        Bisection stops when writes keep failing regardless of the rows, as
+        while the database is down, and the rest is retried later.
+
+        Args:
+            write_rows: Inserts rows in one transaction; the flag is True when rows replayed from the
+                log or retried after a failed commit may already be in the database and must be
+                skipped by 'record_id'
+            log_dir: Directory of the write-ahead logs
+            max_lag: Target upper bound in seconds between acknowledgement and database commit
+            flush_rows: Pending rows that trigger a flush before `max_lag`
+            max_pending: Pending rows before appends are refused (e.g. while the database is down)
+        """
+        self.write_rows = write_rows
+        self.log_dir = log_dir
+        self.max_lag = max_lag
+        self.flush_rows = flush_rows
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()  # Buffer, current segment and segment list
+        self._wakeup = threading.Condition(self._lock)
+        self._sync_lock = threading.Lock()  # Held while fsyncing or rotating; taken before _lock
+        self._pending: List[Dict] = []
+        self._pending_since: List[float] = []  # Acknowledgement time of each pending append, oldest first
+        self._unflushed: List[str] = []  # Closed segments whose rows are not committed yet
+        self._directory: Optional[str] = None
+        self._slot_lock = None
+        self._adopted_locks = []  # Locks of other workers' directories whose segments this one replays
+        self._file = None
+        self._segment = 0
+        self._written = 0
+        self._synced: Tuple[int, int] = (0, 0)  # (segment, bytes) known to be on disk
+        self._replaying = False
+        self._retrying = False  # The pending rows include a batch whose flush failed
+        self._retry_at = 0.0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._flusher_exited = False
+        self._close_on_exit = False  # stop() timed out; the flusher closes the log when it exits
+
+        # Metrics
+        self.flush_sizes = Histogram([1, 10, 50, 100, 500, 1000, 5000])
+        self.flush_latency_ms = Histogram([1, 2, 5, 10, 20, 50, 100, 200, 500, 1000])
+        self.lag_ms = Histogram([10, 50, 100, 250, 500, 1000, 2000, 5000])
+        self.appended = 0
+        self.flushed = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.fsyncs = 0
+        self.flush_failures = 0
+        self.dead_lettered = 0
+        self.last_error: Optional[str] = None
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self._directory, f"{_SEGMENT_PREFIX}{segment:012d}.log")
+
+    def _claim_directory(self):
+        for slot in itertools.count():
+            directory = os.path.join(self.log_dir, f"worker-{slot}")
+            os.makedirs(directory, exist_ok=True)
+            lock = open(os.path.join(directory, "lock"), 'a+b')
+            if _try_lock(lock):
+                self._directory, self._slot_lock = directory, lock
+                return
+            lock.close()
+
+    def _open_segment(self):
+        self._file = open(self._segment_path(self._segment), 'ab', buffering=0)
+        self._written = 0
+        _sync_directory(self._directory)
+
+    def _adopt_orphans(self) -> List[str]:
+        # Segments of directories no running worker holds; their locks are kept until the rows are committed
+        paths = []
+        for name in sorted(os.listdir(self.log_dir)):
+            directory = os.path.join(self.log_dir, name)
+            if directory == self._directory or not name.startswith("worker-") or not os.path.isdir(directory):
+                continue
+            if not any(entry.startswith(_SEGMENT_PREFIX) for entry in os.listdir(directory)):
+                continue
+            lock = open(os.path.join(directory, "lock"), 'a+b')
+            if not _try_lock(lock):
+                lock.close()
+                continue
+            # Listed again under the lock: the owner may have flushed them before releasing it
+            segments = sorted(entry for entry in os.listdir(directory) if entry.startswith(_SEGMENT_PREFIX))
+            if segments:
+                self._adopted_locks.append(lock)
+                paths.extend(os.path.join(directory, segment) for segment in segments)
+            else:
+                lock.close()
+        return paths
+
+    def _release_adopted(self):
+        for lock in self._adopted_locks:
+            lock.close()
+        self._adopted_locks = []
+
+    def start(self):
+        """Claim a log directory, replay rows previous runs left in the logs and start the flusher."""
+        self._claim_directory()
+        segments = sorted(name for name in os.listdir(self._directory) if name.startswith(_SEGMENT_PREFIX))
+        self._unflushed = [os.path.join(self._directory, name) for name in segments] + self._adopt_orphans()
+        for path in self._unflushed:
+            rows = _read_segment(path)
+            self._pending.extend(rows)
+            self.replayed += len(rows)
+        if self._pending:
+            # Flush replayed rows right away
+            self._pending_since.append(time.monotonic() - self.max_lag)
+            self._replaying = True
+        self._segment = int(segments[-1][len(_SEGMENT_PREFIX):-4]) + 1 if segments else 0
+        self._synced = (self._segment, 0)
+        self._open_segment()
+        self._stopping = self._flusher_exited = self._close_on_exit = False
+        self._thread = threading.Thread(target=self._flusher, name="rep-write-behind", daemon=True)
+        self._thread.start()
+
+    def append(self, rows: List[Dict]):
+        """Durably log rows for insertion; returns once they survive a crash.
+
+        Each row is logged with a new 'record_id', by which a replay skips
+        rows that were committed before a crash.
+
+        Args:
+            rows: RepRecord column values including 'session_id'
+
+        Raises:
+            RepWriterOverloaded: If `max_pending` rows are already waiting for the database
+        """
+        if not rows:
+            return
+        rows = [dict(row, record_id=uuid4().hex) for row in rows]
+        record = _encode_rows(rows)
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("Rep write-behind log is not started")
+            if len(self._pending) + len(rows) > self.max_pending:
+                self.rejected += len(rows)
+                raise RepWriterOverloaded(f"{len(self._pending)} reps already waiting for the database")
+            try:
+                self._file.write(record)
+            except OSError:
+                self._file.truncate(self._written)  # Drop a partial record so later ones stay readable
+                raise
+            self._written += len(record)
+            position = (self._segment, self._written)
+            self._pending.extend(rows)
+            self._pending_since.append(time.monotonic())
+            self.appended += len(rows)
+            # The flusher sleeps without a deadline while the buffer is empty
+            if len(self._pending_since) == 1 or len(self._pending) >= self.flush_rows:
+                self._wakeup.notify()
+        self._sync(position)
+
+    def _sync(self, position: Tuple[int, int]):
+        with self._sync_lock:
+            # A concurrent append's fsync, or a rotation, may already cover this record
+            if self._synced >= position:
+                return
+            with self._lock:
+                target = (self._segment, self._written)
+            os.fsync(self._file.fileno())
+            self.fsyncs += 1
+            self._synced = max(self._synced, target)
+
+    def _wait_due(self) -> bool:
+        # Returns False once stopped with nothing left to flush
+        with self._wakeup:
+            while True:
+                now = time.monotonic()
+                if not self._pending:
+                    if self._stopping:
+                        return False
+                    wait = None
+                elif self._stopping:
+                    return True
+                else:
+                    due = self._pending_since[0] + self.max_lag / 2
+                    if len(self._pending) >= self.flush_rows:
+                        due = now
+                    wait = max(due, self._retry_at) - now
+                    if wait <= 0:
+                        return True
+                self._wakeup.wait(wait)
+
+    def _take_batch(self) -> Tuple[List[Dict], List[float], List[str]]:
+        with self._sync_lock, self._lock:
+            rows, since = self._pending, self._pending_since
+            self._pending, self._pending_since = [], []
+            # Close the current segment; new appends go to a fresh one
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._synced = max(self._synced, (self._segment, self._written))
+            closed = self._unflushed + [self._segment_path(self._segment)]
+            self._unflushed = []
+            self._segment += 1
+            self._open_segment()
+            return rows, since, closed
+
+    def _dead_letter(self, rows: List[Dict]):
+        path = os.path.join(self._directory, f"{_DEAD_LETTER_PREFIX}{self._segment:012d}.log")
+        with open(path, 'ab') as file:
+            file.write(_encode_rows(rows))
+            file.flush()
+            os.fsync(file.fileno())
+        _sync_directory(self._directory)
+        self.dead_lettered += len(rows)
+
+    def _isolate(self, rows: List[Dict]) -> List[Dict]:
+        # Bisect a batch that failed twice: commit what the database accepts, dead-letter rows that fail
+        # alone. Returns the rows left to retry, all of them once failures no longer depend on the rows
+        give_up = len(rows).bit_length() + 1  # Failures in a row: one path down to a single row and its sibling
+        rejected, parts, streak = [], [rows], 0
+        while parts:
+            part = parts.pop()
+            try:
+                self.write_rows(part, True)  # Parts of a batch whose commit may have gone through
+                streak = 0
+                continue
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                streak += 1
+            if streak > give_up:
+                return rejected + part + [row for rest in reversed(parts) for row in rest]
+            if len(part) == 1:
+                rejected.append(part[0])
+            else:
+                middle = len(part) // 2
+                parts += [part[middle:], part[:middle]]  # First half first
+        if rejected:
+            self._dead_letter(rejected)
+        return []
+
+    def _run(self):
+        while self._wait_due():
+            rows, since, closed = self._take_batch()
+            started, dead_lettered = time.monotonic(), self.dead_lettered
+            try:
+                # A failed flush may have committed before the error (e.g. the connection dropped after COMMIT)
+                self.write_rows(rows, self._replaying or self._retrying)
+                failed = []
+            except Exception as e:
+                self.flush_failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                failed = self._isolate(rows) if self._retrying else rows
+            if failed:
+                with self._lock:
+                    # Keep the rows and their segments; retry after backing off
+                    self._pending = failed + self._pending
+                    self._pending_since = since + self._pending_since
+                    self._unflushed = closed + self._unflushed
+                    self._retry_at = time.monotonic() + max(self.max_lag / 2, 0.1)
+                self._retrying = True
+                if self._stopping:
+                    return  # Rows stay in the log and are replayed on the next start
+                continue
+            finished = time.monotonic()
+            self._replaying = self._retrying = False
+            self.flushed += len(rows) - (self.dead_lettered - dead_lettered)
+            self.flush_sizes.observe(len(rows))
+            self.flush_latency_ms.observe((finished - started) * 1000)
+            self.lag_ms.observe((finished - since[0]) * 1000)
+            for path in closed:
+                os.remove(path)
+            for directory in {os.path.dirname(path) for path in closed} | {self._directory}:
+                _sync_directory(directory)
+            self._release_adopted()  # Their segments were all in this batch
+
+    def _flusher(self):
+        try:
+            self._run()
+        finally:
+            with self._lock:
+                self._flusher_exited = True
+                close = self._close_on_exit
+            if close:
+                self._close()
+
+    def _close(self):
+        with self._sync_lock, self._lock:
+            self._file.close()
+            self._file = None
+            if self._written == 0 and not self._pending:
+                os.remove(self._segment_path(self._segment))
+        self._release_adopted()
+        self._slot_lock.close()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush pending rows, stop the flusher and release the log directory.
+
+        If the flusher is still inside a write after `timeout` seconds, it
+        closes the log and releases the directory itself once it returns.
+        """
+        if self._thread is None:
+            return
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        self._thread = None
+        with self._lock:
+            if not self._flusher_exited:
+                self._close_on_exit = True
+                return
+        self._close()
+
+    def stats(self) -> Dict:
+        """Return buffer depth, flush counters and flush size, latency and lag histograms."""
+        with self._lock:
+            depth = len(self._pending)
+            oldest = time.monotonic() - self._pending_since[0] if self._pending_since else 0.0
+            segments = len(self._unflushed) + (self._file is not None)
+        return {
+            'buffer_depth': depth,
+            'max_pending': self.max_pending,
+            'oldest_pending_ms': oldest * 1000,
+            'max_lag_ms': self.max_lag * 1000,
+            'log_segments': segments,
+            'appended': self.appended,
+            'flushed': self.flushed,
+            'replayed': self.replayed,
+            'rejected': self.rejected,
+            'fsyncs': self.fsyncs,
+            'flush_failures': self.flush_failures,
+            'dead_lettered': self.dead_lettered,
+            'last_error': self.last_error,
+            'flush_size': self.flush_sizes.snapshot(),
+            'flush_latency_ms': self.flush_latency_ms.snapshot(),
+            'lag_ms': self.lag_ms.snapshot(),
+        }
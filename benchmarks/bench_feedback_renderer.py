@@ -0,0 +1,92 @@
+"""Render time per frame of the smart mirror overlay (skeleton, reference
+overlay and feedback panel) at 720p and 1080p: the previous renderer, which
+copied the frame per draw call and blended full-frame overlays, against the
+layer-cached renderer that blends only the panel and skeleton regions into
+a reused output buffer.
+
+Run from the repository root:
+    python -m benchmarks.bench_feedback_renderer
+"""
+from typing import Dict
+
+import cv2
+import numpy as np
+
+from app.pose.feedback_renderer import FeedbackRenderer
+from benchmarks.common import measure, report, synthetic_frame
+
+
+class PreviousRenderer(FeedbackRenderer):
+    """Previous draw path: a frame copy per call and full-frame overlays."""
+
+    def _canvas(self, image: np.ndarray) -> np.ndarray:
+        return image.copy()
+
+    def draw_reference_overlay(self, image: np.ndarray, reference_pose: np.ndarray) -> np.ndarray:
+        overlay = self.draw_pose(image.copy(), reference_pose, 1.0)
+        return cv2.addWeighted(overlay, 0.3, image, 0.7, 0)
+
+    def draw_feedback_panel(self, image: np.ndarray, feedback: Dict) -> np.ndarray:
+        img_copy = image.copy()
+        height, width = img_copy.shape[:2]
+        overlay = np.zeros_like(img_copy, dtype=np.uint8)
+        panel_x, panel_y, panel_width, panel_height = width - 320, 20, 300, height - 40
+        cv2.rectangle(overlay, (panel_x, panel_y), (panel_x + panel_width, panel_y + panel_height),
+                      self.background_color, -1)
+        title = "Smart Mirror Feedback"
+        (text_width, _), _ = cv2.getTextSize(title, self.font, self.font_scale + 0.3, self.text_thickness + 1)
+        cv2.putText(overlay, title, (panel_x + (panel_width - text_width) // 2, panel_y + 40),
+                    self.font, self.font_scale + 0.3, self.text_color, self.text_thickness + 1, cv2.LINE_AA)
+        similarity = feedback.get('similarity', 0)
+        color, status = self._similarity_status(similarity)
+        bar_x, bar_y = panel_x + 50, panel_y + 80
+        cv2.rectangle(overlay, (bar_x, bar_y), (bar_x + 200, bar_y + 20), (100, 100, 100), -1)
+        cv2.rectangle(overlay, (bar_x, bar_y), (bar_x + int(200 * min(max(similarity, 0), 1)), bar_y + 20), color, -1)
+        cv2.rectangle(overlay, (bar_x, bar_y), (bar_x + 200, bar_y + 20), (200, 200, 200), 1)
+        status_width = cv2.getTextSize(status, self.font, self.font_scale, self.text_thickness)[0][0]
+        cv2.putText(overlay, status, (bar_x + (200 - status_width) // 2, bar_y - 10),
+                    self.font, self.font_scale, self.text_color, self.text_thickness, cv2.LINE_AA)
+        y_offset = bar_y + 60
+        cv2.putText(overlay, "Feedback:", (panel_x + 10, y_offset),
+                    self.font, self.font_scale, self.text_color, self.text_thickness, cv2.LINE_AA)
+        for i, message in enumerate(feedback.get('feedback', [])[:4]):
+            cv2.putText(overlay, f"• {message}", (panel_x + 20, y_offset + 30 + i * 30),
+                        self.font, self.font_scale * 0.8, self.text_color, self.text_thickness, cv2.LINE_AA)
+        for i, text in enumerate(["Press 'r' to set reference pose", "Press 'q' to quit"]):
+            cv2.putText(overlay, text, (panel_x + 10, height - 60 + i * 25),
+                        self.font, self.font_scale * 0.7, (180, 180, 180), 1, cv2.LINE_AA)
+        return cv2.addWeighted(overlay, 0.7, img_copy, 0.3, 0)
+
+
+def standing_pose(offset: float = 0.0) -> np.ndarray:
+    """A (33, 4) landmark array of a person standing in the left half of the frame."""
+    rng = np.random.default_rng(0)
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    landmarks[:, 0] = 0.3 + rng.uniform(-0.1, 0.1, 33) + offset
+    landmarks[:, 1] = np.linspace(0.1, 0.9, 33)
+    landmarks[:, 2] = 1.0
+    return landmarks
+
+
+def main(frames: int = 300):
+    pose, reference = standing_pose(), standing_pose(0.02)
+    feedback = {'feedback': ["Adjust your left arm position", "Adjust your right leg position"]}
+    for width, height in [(1280, 720), (1920, 1080)]:
+        frame = synthetic_frame(width, height)
+        for label, renderer in [("previous", PreviousRenderer()), ("layer-cached", FeedbackRenderer())]:
+            step = iter(range(10 ** 9))
+
+            def render():
+                # Similarity changes every frame, feedback text every 30 frames like a live session
+                index = next(step)
+                similarity = 0.55 + 0.4 * np.sin(index / 10)
+                messages = feedback if (index // 30) % 2 else {'feedback': []}
+                output = renderer.draw_pose(frame, pose, similarity)
+                output = renderer.draw_reference_overlay(output, reference)
+                return renderer.draw_feedback_panel(output, dict(messages, similarity=similarity))
+
+            report(f"{height}p {label}", measure(render, repeats=frames, warmup=10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Compare per-frame decode cost of the base64/JSON and binary ingest paths.
+
+Run from the repository root:
+    python -m benchmarks.bench_frame_ingest
+"""
+import base64
+import json
+
+import cv2
+
+from app.pose.frame_codec import decode_base64_image, decode_image_bytes
+from benchmarks.common import measure, report, synthetic_frame
+
+
+def main():
+    for width, height in [(640, 480), (1280, 720)]:
+        frame = synthetic_frame(width, height)
+        _, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        body = jpeg.tobytes()
+        json_body = json.dumps({"image_base64": base64.b64encode(body).decode()}).encode()
+
+        print(f"\n{width}x{height}: binary {len(body)} bytes, json+base64 {len(json_body)} bytes "
+              f"(+{(len(json_body) / len(body) - 1) * 100:.0f}%)")
+        report("json+base64", measure(lambda: decode_base64_image(json.loads(json_body)["image_base64"])))
+        report("binary (memoryview)", measure(lambda: decode_image_bytes(body)))
+
+
+if __name__ == "__main__":
+    main()
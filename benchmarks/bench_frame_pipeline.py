@@ -0,0 +1,122 @@
+"""Compare the serial smart mirror loop (read, infer, render, repeat) with the
+staged FramePipeline on the same video clip, paced like a 30 fps camera.
+
+Reports displayed frames per second and capture-to-display latency for
+both, and the per-stage numbers of the pipeline. Without --clip a synthetic
+clip is written to a temporary file; it holds no person, so inference only
+runs MediaPipe's person detection stage and is cheaper than on real footage.
+--extra-inference-ms adds a wait to every inference that releases the GIL,
+standing in for a heavier model running on another core or an accelerator.
+
+Run from the repository root:
+    python -m benchmarks.bench_frame_pipeline [--clip squats.mp4]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from app.pose.feedback_renderer import FeedbackRenderer
+from app.pose.pipeline import FramePipeline, format_stats, open_capture, source_fps
+from app.pose.pose_detector import PoseDetector
+from benchmarks.common import report, synthetic_frame
+
+
+def write_clip(path: str, frames: int = 150, fps: float = 30.0):
+    """Write a synthetic clip with a shape moving across it."""
+    base = synthetic_frame()
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (base.shape[1], base.shape[0]))
+    for index in range(frames):
+        frame = base.copy()
+        cv2.circle(frame, (100 + index * 6, 360), 60, (30, 200, 90), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def stages(detector: PoseDetector, renderer: FeedbackRenderer, extra_inference_ms: float = 0.0):
+    def infer(frame):
+        landmarks = detector.detect_landmarks(frame)
+        if extra_inference_ms:
+            time.sleep(extra_inference_ms / 1000)
+        return None if landmarks is None else landmarks.copy()
+
+    def render(frame, landmarks):
+        if landmarks is not None:
+            frame = renderer.draw_pose(frame, landmarks)
+        return renderer.draw_feedback_panel(frame, {})
+
+    return infer, render
+
+
+def run_serial(path: str, infer, render, pace_fps: float):
+    """The previous single-loop structure, reading the clip like a camera that keeps only its newest frame.
+
+    Frames that became due while the loop was busy are skipped, and latency
+    is measured from the moment a frame became due.
+    """
+    capture = open_capture(path)
+    start = time.perf_counter()
+    position = -1
+    latencies = []
+    while True:
+        due = int((time.perf_counter() - start) * pace_fps)
+        if due <= position:
+            time.sleep((position + 1) / pace_fps - (time.perf_counter() - start))
+            due = position + 1
+        success = all(capture.grab() for _ in range(due - position))
+        if not success:
+            break
+        position = due
+        _, frame = capture.retrieve()
+        render(cv2.flip(frame, 1), infer(frame))
+        latencies.append((time.perf_counter() - start - due / pace_fps) * 1000)
+    elapsed = time.perf_counter() - start
+    capture.release()
+    return {'display_fps': len(latencies) / elapsed, 'latency_ms': float(np.mean(latencies)),
+            'frames': len(latencies)}
+
+
+def run_pipelined(path: str, infer, render, pace_fps: float):
+    capture = open_capture(path)
+    pipeline = FramePipeline(capture, infer, render, pace_fps=pace_fps)
+    start = time.perf_counter()
+    stats = pipeline.run()
+    elapsed = time.perf_counter() - start
+    capture.release()
+    return {'display_fps': stats['render']['frames'] / elapsed, 'latency_ms': stats['latency_ms'],
+            'frames': stats['render']['frames']}, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clip', help="Recorded video; a synthetic clip without it")
+    parser.add_argument('--extra-inference-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.clip
+        if path is None:
+            path = os.path.join(directory, "synthetic.avi")
+            write_clip(path)
+        capture = open_capture(path)
+        pace_fps = source_fps(capture) or 30.0
+        capture.release()
+        print(f"{os.cpu_count()} CPUs, clip paced at {pace_fps:.0f} fps")
+
+        detector, renderer = PoseDetector(), FeedbackRenderer()
+        infer, render = stages(detector, renderer, args.extra_inference_ms)
+        infer(synthetic_frame())  # Model load
+
+        report("serial loop", run_serial(path, infer, render, pace_fps))
+        detector.reset_tracking()
+        result, stats = run_pipelined(path, infer, render, pace_fps)
+        report("pipelined", result)
+        print(format_stats(stats))
+        detector.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare bytes copied across the process boundary per frame with and without
+the shared-memory frame ring.
+
+Run from the repository root:
+    python -m benchmarks.bench_frame_ring
+"""
+import multiprocessing
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.pose.frame_ring import SharedFrameRing
+from benchmarks.common import report, synthetic_frame
+
+_ring = None
+
+
+def _attach(spec):
+    global _ring
+    _ring = SharedFrameRing.attach(spec)
+
+
+def _frame_mean(frame):
+    # Stand-in for inference: touch every pixel, return a landmark-sized result
+    return np.full((33, 3), frame.mean(), dtype=np.float64)
+
+
+def _slot_mean(slot):
+    return _frame_mean(_ring.view(slot))
+
+
+def _round_trips(executor, submit, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        submit(executor)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies = np.array(latencies)
+    return {'mean_ms': float(latencies.mean()), 'p99_ms': float(np.percentile(latencies, 99))}
+
+
+def main(repeats: int = 200):
+    frame = synthetic_frame(1280, 720)
+    ring = SharedFrameRing(4, 720, 1280)
+    result = _frame_mean(frame)
+    try:
+        print(f"1280x720 frame: {frame.nbytes} bytes")
+        print(f"pickled frame: {len(pickle.dumps((_frame_mean, (frame,))))} bytes to worker, "
+              f"{len(pickle.dumps(result))} bytes back")
+        print(f"ring slot:     {len(pickle.dumps((_slot_mean, (0,))))} bytes to worker, "
+              f"{len(pickle.dumps(result))} bytes back (+1 in-process memcpy of {frame.nbytes} bytes)")
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(1, mp_context=context, initializer=_attach, initargs=(ring.spec(),)) as executor:
+            executor.submit(_frame_mean, frame).result()
+
+            def pickled(ex):
+                ex.submit(_frame_mean, frame).result()
+
+            def shared(ex):
+                slot = ring.write(frame)
+                try:
+                    ex.submit(_slot_mean, slot).result()
+                finally:
+                    ring.release(slot)
+
+            report("pickled frame round trip", _round_trips(executor, pickled, repeats))
+            report("ring slot round trip", _round_trips(executor, shared, repeats))
+    finally:
+        ring.close()
+
+
+if __name__ == "__main__":
+    main()
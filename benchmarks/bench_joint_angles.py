@@ -0,0 +1,47 @@
+"""Compare per-frame joint-angle loops with one batched pass over a whole
+recorded session, as used when reanalysing sessions offline.
+
+Run from the repository root:
+    python -m benchmarks.bench_joint_angles
+"""
+import numpy as np
+
+from app.pose.joint_angles import BODY_JOINTS, AngleTable, joint_angles
+from benchmarks.common import measure, report
+
+
+def _loop_angles(session: np.ndarray) -> list:
+    # Previous approach: one np.dot/np.linalg.norm per joint triple per frame
+    results = []
+    for landmarks in session:
+        angles = {}
+        for name, (a, b, c) in BODY_JOINTS.items():
+            ba = landmarks[a, :2] - landmarks[b, :2]
+            bc = landmarks[c, :2] - landmarks[b, :2]
+            cosine = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
+            angles[name] = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+        results.append(angles)
+    return results
+
+
+def main(frames: int = 20000):
+    session = np.random.default_rng(0).random((frames, 33, 3))
+    table = AngleTable(BODY_JOINTS)
+    print(f"{frames} frames x {len(table)} angles")
+
+    batched = joint_angles(session, table)
+    looped = np.array([list(angles.values()) for angles in _loop_angles(session[:100])])
+    assert np.allclose(batched[:100], looped)
+
+    for label, fn, repeats in [
+        ("per-triple loop", lambda: _loop_angles(session), 2),
+        ("per-frame kernel", lambda: [joint_angles(landmarks, table) for landmarks in session], 3),
+        ("batched kernel", lambda: joint_angles(session, table), 20),
+    ]:
+        result = measure(fn, repeats=repeats, warmup=1)
+        result['frames_per_s'] = frames / result['mean_ms'] * 1000
+        report(label, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare per-frame landmark extraction from MediaPipe results: a fresh
+float64 array from a list comprehension against filling a reused float32
+buffer slot, with tracemalloc allocation counts per frame.
+
+Run from the repository root:
+    python -m benchmarks.bench_landmark_extraction
+"""
+import tracemalloc
+
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+from app.pose.landmark_buffer import LandmarkBuffer
+from benchmarks.common import measure, report
+
+
+def pose_result(seed: int = 0) -> landmark_pb2.NormalizedLandmarkList:
+    """A landmark list shaped like MediaPipe Pose output (all five fields set)."""
+    rng = np.random.default_rng(seed)
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility, presence in rng.random((33, 5)):
+        landmarks.landmark.add(x=x, y=y, z=z - 0.5, visibility=visibility, presence=presence)
+    return landmarks
+
+
+def _list_extraction(result: landmark_pb2.NormalizedLandmarkList) -> np.ndarray:
+    # Previous approach in PoseDetector and ExerciseApp
+    return np.array([[lm.x, lm.y, lm.visibility] for lm in result.landmark])
+
+
+def allocations(fn, frames: int = 1000):
+    """Return (blocks, bytes) per frame left allocated while outputs are held, and the peak bytes of one call."""
+    fn()
+    outputs = [None] * frames  # Preallocated so holding outputs adds no list growth
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for index in range(frames):
+        outputs[index] = fn()
+    after = tracemalloc.take_snapshot()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).compare_to(
+        before.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]), 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    return blocks / frames, size / frames, peak - current
+
+
+def main(frames: int = 1000):
+    result = pose_result()
+    buffer = LandmarkBuffer()
+    assert np.allclose(buffer.fill(result)[:, :3], _list_extraction(result))
+
+    for label, fn in [
+        ("list comprehension (float64)", lambda: _list_extraction(result)),
+        ("buffer slot (float32)", lambda: buffer.fill(result)),
+    ]:
+        timing = measure(fn, repeats=5000, warmup=100)
+        blocks, size, peak = allocations(fn, frames)
+        timing.update(held_blocks=blocks, held_bytes=size, peak_bytes=peak)
+        report(label, timing)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Check whether One Euro smoothing lets a noisier, cheaper pose model count
+reps as well as the default one.
+
+Real lite/full model output is not used: a synthetic squat session is given
+landmark noise and dropped detections at levels typical of each model, and
+reps are counted with the squat rules on raw and smoothed landmarks.
+
+Run from the repository root:
+    python -m benchmarks.bench_landmark_smoothing
+"""
+from typing import List, Optional
+
+import numpy as np
+
+from app.pose.exercise_rules import EXERCISE_RULES
+from app.pose.landmark_filter import OneEuroFilter
+from benchmarks.common import measure, report
+
+FPS = 30.0
+SEGMENT = 0.2  # Thigh and shin length in normalized image units
+
+
+def squat_session(reps: int, seed: int) -> np.ndarray:
+    """Ground-truth landmarks of a squat set with slightly varying depth and tempo."""
+    rng = np.random.default_rng(seed)
+    angles = []
+    for _ in range(reps):
+        top, bottom = rng.uniform(163, 170), rng.uniform(80, 87)
+        frames = int(rng.uniform(1.6, 2.4) * FPS)
+        phase = np.linspace(0, 2 * np.pi, frames, endpoint=False)
+        angles.append(bottom + (top - bottom) * (1 + np.cos(phase)) / 2)
+    knee_angle = np.radians(np.concatenate(angles + [np.full(int(FPS), 168.0)]))
+
+    tilt = (np.pi - knee_angle)[:, None] / 2
+    session = np.zeros((len(knee_angle), 33, 3))
+    for offset, (hip, knee, ankle, shoulder) in [(-0.05, (23, 25, 27, 11)), (0.05, (24, 26, 28, 12))]:
+        session[:, ankle, :2] = [0.5 + offset, 0.9]
+        session[:, knee, :2] = session[:, ankle, :2] + SEGMENT * np.hstack([np.sin(tilt), -np.cos(tilt)])
+        session[:, hip, :2] = session[:, knee, :2] + SEGMENT * np.hstack([-np.sin(tilt), -np.cos(tilt)])
+        session[:, shoulder, :2] = session[:, hip, :2] + [0.05, -0.3]
+    unused = [i for i in range(33) if i not in (11, 12, 23, 24, 25, 26, 27, 28)]
+    session[:, unused, :2] = session[:, [11], :2]
+    session[..., 2] = 0.9
+    return session
+
+
+def observe(session: np.ndarray, noise: float, dropout: float, seed: int) -> List[Optional[np.ndarray]]:
+    """Per-frame detector output: noisy landmarks, or None for a dropped detection."""
+    rng = np.random.default_rng(seed)
+    noisy = session.copy()
+    noisy[..., :2] += rng.normal(0, noise, noisy[..., :2].shape)
+    return [None if rng.random() < dropout else frame for frame in noisy]
+
+
+def smooth(frames: List[Optional[np.ndarray]]) -> List[Optional[np.ndarray]]:
+    smoother = OneEuroFilter()
+    return [smoother(frame, index / FPS) for index, frame in enumerate(frames)]
+
+
+def evaluate(session: np.ndarray, frames: List[Optional[np.ndarray]]):
+    """Return (reps counted, knee angle RMSE in degrees over detected frames)."""
+    detected = [index for index, frame in enumerate(frames) if frame is not None]
+    landmarks = np.stack([frames[index] for index in detected])
+    exercise = np.full(len(detected), EXERCISE_RULES.index('squat'))
+    result = EXERCISE_RULES.evaluate(landmarks, exercise)
+    truth = EXERCISE_RULES.evaluate(session[detected], exercise)
+    rmse = np.sqrt(np.mean((result.rep_angle - truth.rep_angle) ** 2))
+    return int(result.reps[0]), float(rmse)
+
+
+def main(reps: int = 20, trials: int = 10):
+    # Landmark noise and dropout for the lite and full models (typical of their published error gap)
+    configs = [
+        ("complexity 1, raw", 0.008, 0.01, False),
+        ("complexity 0, raw", 0.02, 0.05, False),
+        ("complexity 0, One Euro", 0.02, 0.05, True),
+    ]
+    print(f"{trials} sessions x {reps} squats at {FPS:.0f} fps")
+    for label, noise, dropout, smoothed in configs:
+        errors, rmses = [], []
+        for trial in range(trials):
+            session = squat_session(reps, trial)
+            frames = observe(session, noise, dropout, 1000 + trial)
+            if smoothed:
+                frames = smooth(frames)
+            counted, rmse = evaluate(session, frames)
+            errors.append(abs(counted - reps))
+            rmses.append(rmse)
+        print(f"{label:<32} rep_error={np.mean(errors):.2f}  exact={np.mean(np.equal(errors, 0)):.0%}  "
+              f"angle_rmse={np.mean(rmses):.2f}deg")
+
+    frame = squat_session(1, 0)[0]
+    smoother = OneEuroFilter()
+    clock = iter(np.arange(10 ** 6) / FPS)
+    report("filter per frame", measure(lambda: smoother(frame, next(clock)), repeats=5000, warmup=100))
+
+
+if __name__ == "__main__":
+    main()
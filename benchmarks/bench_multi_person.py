@@ -0,0 +1,44 @@
+"""Per-frame cost of the multi-person pipeline for 5-15 people and several
+inference worker counts, plus the HOG person detector it runs every few frames.
+
+Synthetic frames hold no real people, so MediaPipe only runs its person
+detection stage on each crop; the numbers show how crop inference scales
+with workers rather than absolute full-pose latency.
+
+Run from the repository root:
+    python -m benchmarks.bench_multi_person
+"""
+import os
+
+import numpy as np
+
+from app.pose.multi_person import HogPersonDetector, MultiPersonPipeline
+from benchmarks.common import measure, report, synthetic_frame
+
+
+def person_boxes(people: int) -> np.ndarray:
+    """Side-by-side standing-person boxes across the frame."""
+    edges = np.linspace(0, 1, people + 1)
+    return np.stack([edges[:-1], np.full(people, 0.1), edges[1:], np.full(people, 0.95)], axis=1)
+
+
+def main(frames: int = 10):
+    frame = synthetic_frame()
+    print(f"{os.cpu_count()} CPUs, {frame.shape[1]}x{frame.shape[0]} frames")
+    hog = HogPersonDetector()
+    report("HOG person detector", measure(lambda: hog.detect(frame), repeats=5, warmup=1))
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        for people in (5, 10, 15):
+            boxes = person_boxes(people)
+            pipeline = MultiPersonPipeline(workers=workers, detect_every=1, person_detector=lambda image: boxes,
+                                           max_missed=10 ** 6)
+            pipeline.pool.warm()
+            result = measure(lambda: pipeline.process(frame), repeats=frames, warmup=1)
+            result['crops_per_s'] = people / result['mean_ms'] * 1000
+            report(f"{workers} workers, {people} people", result)
+            pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare pose backends on a recorded clip: frames per second, p99 latency
+and landmark agreement with MediaPipe full (model complexity 1).
+
+Run from the repository root:
+    python -m benchmarks.bench_pose_backends --clip squats.mp4 \
+        --backend mediapipe:0 --backend mediapipe:2 \
+        --backend onnx:movenet_lightning.onnx --backend onnx:movenet_lightning_int8.onnx \
+        --backend onnx:movenet_thunder.onnx --threads 2
+
+Without --clip a synthetic frame sequence is used, which only measures speed.
+Agreement is reported over landmarks visible (>= 0.5) in both results as
+the mean distance in torso widths and the share within 0.1 torso widths.
+"""
+import argparse
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from app.pose.pose_backends import create_backend
+from app.pose.pose_detector import PoseDetector
+from benchmarks.common import report, synthetic_frame
+
+
+def load_clip(path: Optional[str], max_frames: int) -> List[np.ndarray]:
+    if path is None:
+        return [synthetic_frame(seed=i) for i in range(min(max_frames, 60))]
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        success, frame = capture.read()
+        if not success:
+            break
+        frames.append(frame)
+    capture.release()
+    if not frames:
+        raise SystemExit(f"No frames read from {path}")
+    return frames
+
+
+def make_detector(spec: str, threads: int) -> PoseDetector:
+    """Build a detector from 'mediapipe:<complexity>' or 'onnx:<path>[:<format>]'."""
+    name, _, rest = spec.partition(':')
+    if name == 'mediapipe':
+        return PoseDetector(backend=create_backend('mediapipe', int(rest or 1)))
+    path, _, model_format = rest.partition(':')
+    return PoseDetector(backend=create_backend('onnx', models=path, model_format=model_format or 'movenet',
+                                               intra_op_threads=threads), roi_tracking=True)
+
+
+def run(detector: PoseDetector, frames: List[np.ndarray]):
+    """Return per-frame landmarks (copied out of the detector buffer) and latencies in ms."""
+    detector.detect_landmarks(frames[0])  # Model load and first-frame setup
+    detector.reset_tracking()
+    results, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        landmarks = detector.detect_landmarks(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(None if landmarks is None else landmarks.copy())
+    return results, np.array(latencies)
+
+
+def agreement(results, references):
+    """Mean landmark distance in torso widths and share of landmarks within 0.1 torso widths."""
+    distances = []
+    for landmarks, reference in zip(results, references):
+        if landmarks is None or reference is None:
+            continue
+        torso = np.linalg.norm(reference[11, :2] - reference[12, :2]) + np.linalg.norm(reference[23, :2] - reference[24, :2])
+        visible = (landmarks[:, 2] >= 0.5) & (reference[:, 2] >= 0.5)
+        if torso <= 0 or not visible.any():
+            continue
+        distances.append(np.linalg.norm(landmarks[visible, :2] - reference[visible, :2], axis=1) / (torso / 2))
+    if not distances:
+        return float('nan'), float('nan')
+    distances = np.concatenate(distances)
+    return float(distances.mean()), float((distances < 0.1).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clip', help="Recorded video; synthetic frames without it")
+    parser.add_argument('--backend', action='append', default=[],
+                        help="mediapipe:<complexity> or onnx:<path>[:movenet]; repeatable")
+    parser.add_argument('--threads', type=int, default=1, help="ONNX Runtime intra-op threads")
+    parser.add_argument('--max-frames', type=int, default=300)
+    args = parser.parse_args()
+
+    frames = load_clip(args.clip, args.max_frames)
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    references = None
+    for spec in ['mediapipe:1'] + [spec for spec in args.backend if spec != 'mediapipe:1']:
+        try:
+            detector = make_detector(spec, args.threads)
+            results, latencies = run(detector, frames)
+        except Exception as e:  # A missing model or runtime only skips that backend
+            print(f"{spec:<32} skipped: {e}")
+            continue
+        detector.release()
+        if references is None:
+            references = results
+        error, pck = agreement(results, references)
+        report(spec, {
+            'fps': 1000 / latencies.mean(),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'detected': float(np.mean([landmarks is not None for landmarks in results])),
+            'error_torso': error,
+            'within_0.1': pck,
+        })
+
+
+if __name__ == "__main__":
+    main()
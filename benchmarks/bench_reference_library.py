@@ -0,0 +1,55 @@
+"""Query latency of the reference pose library against a brute-force scan of
+every reference, at 10, 1k and 100k references.
+
+Run from the repository root:
+    python -m benchmarks.bench_reference_library
+"""
+import time
+
+import numpy as np
+
+from app.pose.pose_comparator import PoseComparator, normalize_landmarks, normalized_similarity
+from benchmarks.common import measure, report
+
+
+def _references(count: int, rng: np.random.Generator) -> np.ndarray:
+    # Canonical poses: a few base poses with per-reference joint jitter
+    bases = rng.random((8, 33, 3))
+    poses = bases[rng.integers(0, len(bases), count)] + rng.normal(0, 0.03, (count, 33, 3))
+    poses[..., 2] = rng.uniform(0.5, 1.0, (count, 33))
+    return poses
+
+
+def main(sizes=(10, 1000, 100000), k: int = 5, queries: int = 200):
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        references = _references(size, rng)
+        comparator = PoseComparator()
+        start = time.perf_counter()
+        comparator.reference_library.add(references)
+        comparator.reference_library.build()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        sources = rng.integers(0, size, queries)
+        probes = references[sources] + rng.normal(0, 0.01, (queries, 33, 3))
+        normalized = normalize_landmarks(references)
+        probe = iter(np.tile(probes, (20, 1, 1)))
+
+        def brute():
+            pose = next(probe)
+            np.argsort(-normalized_similarity(normalized, normalize_landmarks(pose)))[:k]
+
+        def indexed():
+            comparator.match_references(next(probe), k)
+
+        # How often the reference a probe was jittered from comes back as the best match
+        found = np.mean([comparator.match_references(pose, 1)[0]['index'] == source
+                         for pose, source in zip(probes, sources)])
+
+        print(f"{size} references (build {build_ms:.1f} ms, source pose ranked first {found:.0%})")
+        report("  brute-force scan", measure(brute, repeats=queries, warmup=5))
+        report("  KD-tree + re-rank", measure(indexed, repeats=queries, warmup=5))
+
+
+if __name__ == "__main__":
+    main()
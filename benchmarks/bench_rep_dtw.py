@@ -0,0 +1,59 @@
+"""Scoring one rep against reference reps with banded DTW: exhaustive DTW
+against LB_Keogh pruning plus early abandoning.
+
+Run from the repository root:
+    python -m benchmarks.bench_rep_dtw
+"""
+import math
+
+import numpy as np
+
+from app.pose.rep_dtw import RepLibrary, rep_features
+from benchmarks.common import measure, report
+
+
+def _rep(rng: np.random.Generator, base: np.ndarray) -> np.ndarray:
+    # Squat-like rep: knees and ankles dip and rise at a random depth, tempo and length
+    frames = int(rng.integers(20, 60))
+    t = np.linspace(0, 1, frames) ** rng.uniform(0.6, 1.6)
+    rep = np.repeat(base[None], frames, axis=0)
+    rep[:, 25:29, 1] += rng.uniform(0.05, 0.3) * np.sin(np.pi * t + rng.uniform(0, 0.5))[:, None]
+    rep[:, 13:17, 0] += rng.uniform(0.0, 0.1) * np.sin(2 * np.pi * t)[:, None]
+    return rep
+
+
+def main(sizes=(100, 1000, 10000), k: int = 3):
+    rng = np.random.default_rng(0)
+    base = rng.random((33, 3))
+    queries = [_rep(rng, base) for _ in range(20)]
+    for size in sizes:
+        library = RepLibrary()
+        for _ in range(size):
+            library.add(_rep(rng, base))
+        library.match(queries[0], k)
+        print(f"{size} reference reps (length {library.length}, band {library.band})")
+
+        query = iter(queries * 100)
+        pruned = []
+
+        def indexed():
+            library.match(next(query), k)
+            pruned.append(library.last_stats)
+
+        if size <= 1000:
+            def exhaustive():
+                features = rep_features(next(query), library.length)
+                costs = library._band_costs(features, library._features).sum(axis=-1)
+                no_bound = np.zeros(library.length + 1)
+                sorted(library._dtw(cost, math.inf, no_bound)[0] for cost in costs)[:k]
+            report("  exhaustive DTW", measure(exhaustive, repeats=5, warmup=1))
+
+        report("  LB_Keogh + early abandon", measure(indexed, repeats=20, warmup=2))
+        computed = np.mean([stats['computed'] for stats in pruned])
+        abandoned = np.mean([stats['abandoned'] for stats in pruned])
+        print(f"  per query: {computed:.1f} full DTW, {abandoned:.1f} abandoned, "
+              f"{size - computed - abandoned:.1f} pruned by lower bound")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Rep records stored per second through the exercise session API: one
+POST /data request per rep against POST /data/batch with a whole workout
+per request (executemany, or COPY on PostgreSQL), and per-rep requests
+acknowledged from the write-behind log (timed until the last rep is
+committed), with its acknowledgement latency and flush metrics.
+
+Uses a file-backed SQLite database by default so commits pay for their
+disk syncs; pass --database-url to run against PostgreSQL.
+
+Run from the repository root:
+    python -m benchmarks.bench_rep_ingest
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.dependencies import get_current_user
+from app.database.database import Base, get_db
+from app.models.exercise import ExerciseSession, RepRecord
+from app.models.user import User
+from app.repositories.exercise_repo import ExerciseRepository
+from app.routes import exercise_routes
+from app.services.rep_writer import RepWriteBehind
+from benchmarks.bench_feedback_renderer import standing_pose
+from benchmarks.common import report
+
+
+def workout(reps: int) -> List[Dict]:
+    """Rep records as a client would send them, with a full landmark set per rep."""
+    landmarks = standing_pose()[:, :3].round(4).tolist()
+    now = datetime.now(timezone.utc).isoformat()
+    return [{"rep_number": number, "timestamp": now, "correctness": 0.9, "feedback": "Good form",
+             "landmarks": landmarks} for number in range(1, reps + 1)]
+
+
+def client_for(database_url: str) -> Tuple[TestClient, sessionmaker]:
+    """Exercise routes on their own database, authenticated as a fresh user; returns the client and session factory."""
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine, tables=[User.__table__, ExerciseSession.__table__, RepRecord.__table__])
+    local_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with local_session() as db:
+        user = User(email=f"bench-{time.time_ns()}@example.com", password_hash="x", role="trainee")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+
+    def get_bench_db():
+        db = local_session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(exercise_routes.router)
+    app.dependency_overrides[get_db] = get_bench_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app), local_session
+
+
+def rows_per_second(client: TestClient, reps: List[Dict], batched: bool, workouts: int) -> float:
+    start = time.perf_counter()
+    for _ in range(workouts):
+        session_id = client.post("/exercise/session/start", json={"exercise_name": "squat"}).json()["session_id"]
+        if batched:
+            response = client.post(f"/exercise/session/{session_id}/data/batch", json=reps)
+            assert response.json()["inserted"] == len(reps), response.text
+        else:
+            for rep in reps:
+                assert client.post(f"/exercise/session/{session_id}/data", json=rep).status_code == 200
+    if exercise_routes.rep_writer is not None:
+        # Count a rep as stored once it is committed, not when it is acknowledged
+        while True:
+            stats = exercise_routes.rep_writer.stats()
+            if stats['flushed'] + stats['dead_lettered'] >= stats['appended']:
+                break
+            time.sleep(0.001)
+    return workouts * len(reps) / (time.perf_counter() - start)
+
+
+def write_behind(local_session: sessionmaker, log_dir: str) -> RepWriteBehind:
+    def write_rows(rows, replay):
+        with local_session() as db:
+            ExerciseRepository(db).insert_reps(rows, skip_existing=replay)
+    return RepWriteBehind(write_rows, log_dir, max_lag=0.5)
+
+
+def main(database_url: str = "", reps: int = 100, workouts: int = 5):
+    with tempfile.TemporaryDirectory() as directory:
+        client, local_session = client_for(database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        records = workout(reps)
+        rows_per_second(client, records[:5], True, 1)  # Warm up routes and connection
+        for label, batched in [("per-rep POST /data", False), ("POST /data/batch", True)]:
+            report(f"{label}, {reps} reps", {'rows_per_s': rows_per_second(client, records, batched, workouts),
+                                             'db_commits_per_rep': 1 / reps if batched else 1.0})
+
+        writer = exercise_routes.rep_writer = write_behind(local_session, os.path.join(directory, "rep_log"))
+        writer.start()
+        try:
+            rows_per_s = rows_per_second(client, records, False, workouts)
+            stats = writer.stats()
+        finally:
+            writer.stop()
+            exercise_routes.rep_writer = None
+        report(f"per-rep POST /data write-behind, {reps} reps", {
+            'rows_per_s': rows_per_s,
+            'db_commits_per_rep': stats['flush_size']['count'] / stats['flushed'],
+            'log_fsyncs_per_rep': stats['fsyncs'] / stats['appended'],
+            'flush_ms': stats['flush_latency_ms']['mean'],
+            'lag_ms': stats['lag_ms']['mean'],
+        })
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="", help="SQLAlchemy URL (defaults to a temporary SQLite file)")
+    parser.add_argument("--reps", type=int, default=100)
+    parser.add_argument("--workouts", type=int, default=5)
+    args = parser.parse_args()
+    main(args.database_url, args.reps, args.workouts)
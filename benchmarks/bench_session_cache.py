@@ -0,0 +1,57 @@
+"""Memory per session and landmark ingest cost of the server-side
+ExerciseSessionCache, for thousands of concurrent sessions with and
+without LRU eviction.
+
+Run from the repository root:
+    python -m benchmarks.bench_session_cache
+"""
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.pose.session_cache import ExerciseSessionCache
+from benchmarks.bench_landmark_smoothing import squat_session
+from benchmarks.common import report
+
+
+def held_bytes(sessions: int, max_sessions: int, frames: np.ndarray) -> float:
+    """Bytes per session still allocated after every session ingested a batch."""
+    cache = ExerciseSessionCache(max_sessions=max_sessions)
+    cache.analyze("warmup", "squat", frames[:5])
+    cache.end("warmup")
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for session in range(sessions):
+        cache.analyze(str(session), "squat", frames[:5])
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename')) / sessions
+
+
+def ingest(sessions: int, max_sessions: int, frames: np.ndarray, batch: int, rounds: int):
+    """Round-robin batches over all sessions; returns mean ms per request and the cache stats."""
+    cache = ExerciseSessionCache(max_sessions=max_sessions)
+    start = time.perf_counter()
+    for round_index in range(rounds):
+        chunk = frames[round_index * batch % len(frames):][:batch]
+        for session in range(sessions):
+            cache.analyze(str(session), "squat", chunk)
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000 / (sessions * rounds), cache.stats()
+
+
+def main(sessions: int = 5000, batch: int = 5, rounds: int = 4):
+    frames = squat_session(5, 0)
+    for label, max_sessions in [("all live", sessions), ("LRU of 1000", 1000)]:
+        bytes_per_session = held_bytes(sessions, max_sessions, frames)
+        ms_per_request, stats = ingest(sessions, max_sessions, frames, batch, rounds)
+        report(f"{sessions} sessions, {label}", {
+            'bytes_per_session': bytes_per_session,
+            'ms_per_request': ms_per_request,
+            'restored': stats['restored'],
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Session state store backends: record size of the binary serialization
+and the cost of one landmark batch through ExerciseSessionCache with
+state kept per process, in shared memory, and on a Redis-protocol server
+(a local stand-in speaking the subset of RESP the store uses). Two cache
+instances alternate on each session, as two API workers would without
+sticky routing, and the rep counts must match a single in-process run.
+
+Run from the repository root:
+    python -m benchmarks.bench_session_store
+"""
+import os
+import pickle
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.pose.exercise_rules import EXERCISE_RULES
+from app.pose.session_cache import ExerciseSessionCache
+from app.pose.session_store import InProcessStore, RespStore, SharedMemoryStore, encode_session
+from benchmarks.bench_landmark_smoothing import squat_session
+from benchmarks.common import report
+
+
+class _RespState:
+    def __init__(self):
+        self.values: Dict[bytes, Tuple[bytes, Optional[float]]] = {}  # value, expires at
+        self.modified: Dict[bytes, int] = {}  # Write counter per key, checked by EXEC against WATCH
+        self.lock = threading.Lock()
+
+    def touch(self, key: bytes):
+        self.modified[key] = self.modified.get(key, 0) + 1
+
+    def read(self, key: bytes) -> Optional[bytes]:
+        entry = self.values.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.monotonic()):
+            return None
+        return entry[0]
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """Local Redis stand-in: GET, SET [PX], DEL, WATCH, UNWATCH, MULTI, EXEC and PING."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(('127.0.0.1', port), _RespHandler)
+        self.state = _RespState()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True  # Redis replies unbuffered as well
+
+    def _command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        arguments = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            arguments.append(self.rfile.read(length + 2)[:-2])
+        return arguments
+
+    @staticmethod
+    def _encode(reply) -> bytes:
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, str):
+            return b'+%s\r\n' % reply.encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, bytes):
+            return b'$%d\r\n%s\r\n' % (len(reply), reply)
+        return b'*%d\r\n' % len(reply) + b''.join(_RespHandler._encode(item) for item in reply)
+
+    def _apply(self, state: _RespState, name: bytes, arguments: List[bytes]):
+        # Called with the state lock held
+        if name == b'GET':
+            return state.read(arguments[0])
+        if name == b'SET':
+            expires = None
+            if len(arguments) == 4 and arguments[2].upper() == b'PX':
+                expires = time.monotonic() + int(arguments[3]) / 1000
+            state.values[arguments[0]] = (arguments[1], expires)
+            state.touch(arguments[0])
+            return 'OK'
+        if name == b'DEL':
+            removed = sum(state.values.pop(key, None) is not None for key in arguments)
+            for key in arguments:
+                state.touch(key)
+            return removed
+        return 'OK'
+
+    def handle(self):
+        state = self.server.state
+        watched: Dict[bytes, int] = {}
+        queued: Optional[List[Tuple[bytes, List[bytes]]]] = None
+        while True:
+            command = self._command()
+            if command is None:
+                return
+            name, arguments = command[0].upper(), command[1:]
+            with state.lock:
+                if name == b'WATCH':
+                    watched.update((key, state.modified.get(key, 0)) for key in arguments)
+                    reply = 'OK'
+                elif name == b'UNWATCH':
+                    watched.clear()
+                    reply = 'OK'
+                elif name == b'MULTI':
+                    queued = []
+                    reply = 'OK'
+                elif name == b'EXEC':
+                    intact = all(state.modified.get(key, 0) == count for key, count in watched.items())
+                    reply = [self._apply(state, *item) for item in queued] if intact else None
+                    queued = None
+                    watched.clear()
+                elif queued is not None:
+                    queued.append((name, arguments))
+                    reply = 'QUEUED'
+                elif name == b'PING':
+                    reply = 'PONG'
+                else:
+                    reply = self._apply(state, name, arguments)
+            self.wfile.write(self._encode(reply))
+
+
+def alternate_workers(caches: List[ExerciseSessionCache], sessions: int, frames, batch: int) -> Tuple[float, List[int]]:
+    """Stream every session's frames in batches, alternating caches per batch; returns ms per batch and rep counts."""
+    rep_counts = [0] * sessions
+    requests = 0
+    start = time.perf_counter()
+    for offset in range(0, len(frames), batch):
+        chunk = frames[offset:offset + batch]
+        for session in range(sessions):
+            cache = caches[(offset // batch + session) % len(caches)]
+            rep_counts[session] = cache.analyze(str(session), "squat", chunk, owner=session)['rep_count']
+            requests += 1
+    return (time.perf_counter() - start) * 1000 / requests, rep_counts
+
+
+def main(sessions: int = 50, batch: int = 5):
+    frames = squat_session(5, 0)
+    expected = ExerciseSessionCache().analyze("0", "squat", frames)['rep_count']
+
+    state = ("squat", 12, "down", tuple(EXERCISE_RULES.messages[:2]))
+    report("record size", {'binary_bytes': len(encode_session(state, 123456)),
+                           'pickle_bytes': len(pickle.dumps((state, 123456)))})
+
+    server = RespStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    shm_name = f"bench-sessions-{os.getpid()}"
+    shm_stores = [SharedMemoryStore(shm_name, slots=4096), SharedMemoryStore(shm_name)]
+    backends = [
+        ("memory, one worker", [ExerciseSessionCache(store=InProcessStore())]),
+        ("shared_memory, two workers", [ExerciseSessionCache(store=store) for store in shm_stores]),
+        ("redis stand-in, two workers", [ExerciseSessionCache(store=RespStore(server.url)) for _ in range(2)]),
+    ]
+    try:
+        for label, caches in backends:
+            ms_per_batch, rep_counts = alternate_workers(caches, sessions, frames, batch)
+            report(label, {'ms_per_batch': ms_per_batch,
+                           'reps_match': float(all(count == expected for count in rep_counts))})
+    finally:
+        for _, caches in backends:
+            for cache in caches:
+                cache.store.close()
+        shm_stores[0].unlink()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
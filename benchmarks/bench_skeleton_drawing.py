@@ -0,0 +1,70 @@
+"""Skeleton draw time per 720p frame: the previous per-landmark loops of
+PoseDetector.draw_landmarks and FeedbackRenderer.draw_pose against the
+shared SkeletonRasterizer, with one colour and with per-bone error
+highlighting.
+
+Run from the repository root:
+    python -m benchmarks.bench_skeleton_drawing
+"""
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from app.pose.feedback_renderer import MIRROR_CONNECTIONS
+from app.pose.skeleton import SkeletonRasterizer
+from benchmarks.bench_feedback_renderer import standing_pose
+from benchmarks.common import measure, report, synthetic_frame
+
+_MP_POSE = mp.solutions.pose
+
+
+def _detector_loop(image: np.ndarray, landmarks: np.ndarray):
+    # Previous PoseDetector.draw_landmarks body, without its frame copy
+    landmark_list = []
+    for idx in range(landmarks.shape[0]):
+        landmark_list.append(_MP_POSE.PoseLandmark(idx))
+        x = int(landmarks[idx, 0] * image.shape[1])
+        y = int(landmarks[idx, 1] * image.shape[0])
+        cv2.circle(image, (x, y), 5, (0, 255, 0), -1)
+    for start_idx, end_idx in _MP_POSE.POSE_CONNECTIONS:
+        if (0 <= start_idx < len(landmark_list)) and (0 <= end_idx < len(landmark_list)):
+            start_point = (int(landmarks[start_idx, 0] * image.shape[1]), int(landmarks[start_idx, 1] * image.shape[0]))
+            end_point = (int(landmarks[end_idx, 0] * image.shape[1]), int(landmarks[end_idx, 1] * image.shape[0]))
+            cv2.line(image, start_point, end_point, (0, 255, 0), 2)
+
+
+def _renderer_loop(image: np.ndarray, landmarks: np.ndarray):
+    # Previous FeedbackRenderer.draw_pose body: connection table rebuilt per call, face rows past index 32
+    connections = list(MIRROR_CONNECTIONS) + [
+        (17, 18), (18, 19), (19, 20), (20, 21), (22, 23), (23, 24), (24, 25), (25, 26),
+        (30, 31), (31, 32), (32, 33), (33, 34),
+        (35, 36), (36, 37), (37, 38), (38, 39), (39, 40), (40, 41), (41, 36),
+    ]
+    height, width = image.shape[:2]
+    points = (landmarks[:, :2] * (width, height)).astype(np.int32).tolist()
+    for start_idx, end_idx in connections:
+        if (0 <= start_idx < len(points)) and (0 <= end_idx < len(points)):
+            cv2.line(image, tuple(points[start_idx]), tuple(points[end_idx]), (0, 255, 0), 2)
+    for point in points:
+        cv2.circle(image, tuple(point), 4, (0, 255, 0), -1)
+
+
+def main(repeats: int = 2000):
+    image = synthetic_frame()
+    landmarks = standing_pose()
+    detector_skeleton = SkeletonRasterizer(line_thickness=2, point_radius=5)
+    mirror_skeleton = SkeletonRasterizer(MIRROR_CONNECTIONS, line_thickness=2, point_radius=4)
+    highlighted = mirror_skeleton.bone_colors((0, 255, 0), highlight_joints=[13, 25], highlight_color=(0, 0, 255))
+
+    for label, fn in [
+        ("draw_landmarks loop", lambda: _detector_loop(image, landmarks)),
+        ("draw_landmarks rasterizer", lambda: detector_skeleton.draw(image, landmarks, (0, 255, 0))),
+        ("draw_pose loop", lambda: _renderer_loop(image, landmarks)),
+        ("draw_pose rasterizer", lambda: mirror_skeleton.draw(image, landmarks, (0, 255, 0))),
+        ("draw_pose highlighted", lambda: mirror_skeleton.draw(image, landmarks, (0, 255, 0), highlighted)),
+    ]:
+        report(label, measure(fn, repeats=repeats, warmup=50))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import time
+from typing import Callable, Dict
+
+import cv2
+import numpy as np
+
+
+def synthetic_frame(width: int = 1280, height: int = 720, seed: int = 0) -> np.ndarray:
+    """Build a BGR frame with webcam-like content (gradients, shapes and sensor noise)."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.dstack([np.broadcast_to(x, (height, width)),
+                       np.broadcast_to(y, (height, width)),
+                       np.full((height, width), 128, np.float32)])
+    frame += rng.normal(0, 8, frame.shape).astype(np.float32)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+    cv2.rectangle(frame, (width // 3, height // 6), (2 * width // 3, 5 * height // 6), (40, 90, 160), -1)
+    cv2.circle(frame, (width // 2, height // 8), height // 12, (120, 160, 200), -1)
+    return frame
+
+
+def measure(fn: Callable[[], object], repeats: int = 200, warmup: int = 10) -> Dict[str, float]:
+    """Time a callable, returning wall-clock and CPU milliseconds per call."""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    cpu_start = time.process_time()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    cpu_ms = (time.process_time() - cpu_start) * 1000 / repeats
+    latencies = np.array(latencies)
+    return {
+        'mean_ms': float(latencies.mean()),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'cpu_ms': cpu_ms,
+    }
+
+
+def report(label: str, result: Dict[str, float]):
+    """Print one benchmark result line."""
+    fields = "  ".join(f"{key}={value:.3f}" for key, value in result.items())
+    print(f"{label:<32} {fields}")
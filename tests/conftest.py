@@ -0,0 +1,5 @@
+import os
+
+# Settings are read at import time; tests build their own engines and never use these
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from app.pose.detector_pool import DetectorPool, PoolExhaustedError
+
+
+class FakeDetector:
+    def __init__(self):
+        self.released = False
+
+    def detect_landmarks(self, image):
+        return None
+
+    def release(self):
+        self.released = True
+
+
+def test_recycling_wakes_a_waiting_checkout():
+    pool = DetectorPool(size=1, max_uses=1, factory=FakeDetector)
+    checked_out, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.checkout():
+            checked_out.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    assert checked_out.wait(5)
+    threading.Timer(0.1, release.set).start()
+
+    start = time.monotonic()
+    with pool.checkout(timeout=5.0) as detector:
+        assert not detector.released  # A replacement for the recycled detector
+    assert time.monotonic() - start < 1.0
+    holder.join()
+    assert pool.stats()['recycled'] == 2
+
+
+def test_checkout_times_out_while_every_detector_is_in_use():
+    pool = DetectorPool(size=1, factory=FakeDetector)
+    with pool.checkout():
+        with pytest.raises(PoolExhaustedError):
+            with pool.checkout(timeout=0.05):
+                pass
+
+
+def test_failed_creation_gives_its_slot_back():
+    calls = []
+
+    def flaky_factory():
+        calls.append(None)
+        if len(calls) == 2:
+            raise RuntimeError("model failed to load")
+        return FakeDetector()
+
+    pool = DetectorPool(size=2, factory=flaky_factory)
+    with pytest.raises(RuntimeError):
+        pool.warm()
+    assert pool.stats()['created'] == 1
+
+    with pool.checkout(timeout=0.05), pool.checkout(timeout=0.05):
+        assert pool.stats()['created'] == 2
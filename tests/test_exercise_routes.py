@@ -0,0 +1,74 @@
+import pytest
+
+from app.pose.session_cache import ExerciseSessionCache
+from app.pose.session_store import InProcessStore, RespError, SessionStoreFull
+from app.routes import exercise_routes
+from benchmarks.bench_feedback_renderer import standing_pose
+from benchmarks.bench_rep_ingest import client_for
+
+
+@pytest.fixture
+def client(tmp_path):
+    client, _ = client_for(f"sqlite:///{tmp_path / 'test.db'}")
+    yield client
+    client.close()
+
+
+def _start(client) -> int:
+    return client.post("/exercise/session/start", json={"exercise_name": "squat"}).json()["session_id"]
+
+
+def test_client_total_is_used_when_no_landmarks_were_streamed(client):
+    session_id = _start(client)
+    response = client.post(f"/exercise/session/{session_id}/end", json={"total_reps": 5})
+    assert response.json()["session_summary"]["total_reps"] == 5
+
+
+def test_ending_twice_is_a_conflict(client):
+    session_id = _start(client)
+    assert client.post(f"/exercise/session/{session_id}/end", json={"total_reps": 5}).status_code == 200
+
+    response = client.post(f"/exercise/session/{session_id}/end", json={"total_reps": 50})
+    assert response.status_code == 409
+
+
+def test_server_count_is_kept_when_the_detector_state_is_gone(client):
+    session_id = _start(client)
+    frames = [standing_pose()[:, :3].tolist()] * 3
+    assert client.post(f"/exercise/session/{session_id}/landmarks", json={"frames": frames}).status_code == 200
+
+    exercise_routes.session_cache.end(str(session_id))  # Evicted and expired, or held by another worker
+    response = client.post(f"/exercise/session/{session_id}/end", json={"total_reps": 50})
+    assert response.json()["session_summary"]["total_reps"] == 0
+
+
+class _FailingStore(InProcessStore):
+    shared = True
+
+    def __init__(self, error: Exception):
+        super().__init__()
+        self.error = error
+
+    def get(self, key):
+        if isinstance(self.error, SessionStoreFull):
+            return super().get(key)
+        raise self.error
+
+    def compare_and_set(self, key, value, version):
+        raise self.error
+
+
+@pytest.mark.parametrize('error, detail', [
+    (ConnectionRefusedError("connection refused"), "Session store unavailable, retry later"),
+    (RespError("LOADING Redis is loading the dataset in memory"), "Session store unavailable, retry later"),
+    (SessionStoreFull("no free slot"), "Session store full, retry later"),
+], ids=['unreachable', 'error-reply', 'full'])
+def test_session_store_failures_are_retryable(client, monkeypatch, error, detail):
+    monkeypatch.setattr(exercise_routes, 'session_cache', ExerciseSessionCache(store=_FailingStore(error)))
+    session_id = _start(client)
+    frames = [standing_pose()[:, :3].tolist()]
+
+    response = client.post(f"/exercise/session/{session_id}/landmarks", json={"frames": frames})
+    assert response.status_code == 503
+    assert response.json() == {"detail": detail}
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,103 @@
+import numpy as np
+
+from app.pose.exercise_detector import ExerciseDetector, analyze_sessions
+from app.pose.exercise_rules import EXERCISE_RULES
+from app.pose.exercises import EXERCISES
+from app.pose.joint_angles import BODY_JOINTS
+
+# Rep angle triples of the exercises under test; they share no landmarks
+_REP_TRIPLES = [BODY_JOINTS[name] for name in ('left_knee', 'right_knee', 'left_elbow', 'right_elbow')]
+
+
+def pose(angle: float) -> np.ndarray:
+    """Landmarks whose knee and elbow angles all equal `angle` degrees."""
+    landmarks = np.zeros((33, 4))
+    landmarks[:, 3] = 1.0
+    theta = np.radians(angle)
+    for offset, (a, b, c) in enumerate(_REP_TRIPLES):
+        landmarks[b, :2] = (3 * offset, 0.0)
+        landmarks[a, :2] = (3 * offset, 1.0)
+        landmarks[c, :2] = (3 * offset + np.sin(theta), np.cos(theta))
+    return landmarks
+
+
+def reference_reps(angles, rep_range, down=False):
+    """The frame-by-frame hysteresis the vectorized evaluation replaced.
+
+    Returns:
+        Tuple of (phase after each frame, whether each frame completed a rep, final phase)
+    """
+    low, high = rep_range
+    phases, completed = [], []
+    for angle in angles:
+        finished = False
+        if angle < low:
+            down = True
+        elif angle > high:
+            finished = down
+            down = False
+        phases.append(down)
+        completed.append(finished)
+    return phases, completed, down
+
+
+def _angle_sequence(rng, frames):
+    # Sweeps through both thresholds with jitter, so runs hold several reps and in-between frames.
+    # Half degrees keep the small error of the joint angle kernel from crossing the integer thresholds
+    sweep = 125 + 55 * np.sin(np.linspace(0, rng.uniform(4, 12) * np.pi, frames)) + rng.normal(0, 8, frames)
+    return np.clip(np.round(sweep), 5, 177) + 0.5
+
+
+def poses(angles) -> np.ndarray:
+    """Frames of shape (T, 33, 4) for a sequence of angles."""
+    return np.array([pose(angle) for angle in angles]).reshape(-1, 33, 4)
+
+
+def test_interleaved_sessions_match_the_sequential_hysteresis():
+    rng = np.random.default_rng(0)
+    names = ['squat', 'pushup', 'squat', 'lunge']
+    initial_down = np.array([False, False, True, True])
+    angles = [_angle_sequence(rng, frames) for frames in (120, 80, 1, 150)]
+
+    # Interleaved at random; a session's frames keep their time order
+    sessions = rng.permutation(np.concatenate([np.full(len(a), s) for s, a in enumerate(angles)]))
+    frame_angles = np.empty(len(sessions))
+    for session, session_angles in enumerate(angles):
+        frame_angles[sessions == session] = session_angles
+    landmarks = poses(frame_angles)
+    exercises = np.array([EXERCISE_RULES.index(names[s]) for s in sessions])
+
+    evaluation = EXERCISE_RULES.evaluate(landmarks, exercises, sessions, initial_down)
+
+    for session, name in enumerate(names):
+        phases, completed, final = reference_reps(angles[session], EXERCISES[name].rep_range,
+                                                  initial_down[session])
+        frames = np.flatnonzero(sessions == session)
+        np.testing.assert_allclose(evaluation.rep_angle[frames], angles[session], atol=0.05)
+        assert evaluation.down[frames].tolist() == phases
+        assert evaluation.rep_completed[frames].tolist() == completed
+        assert evaluation.reps[session] == sum(completed)
+        assert evaluation.final_down[session] == final
+    assert evaluation.reps.sum() > len(names)
+
+
+def test_chunked_analysis_carries_the_phase_between_calls():
+    rng = np.random.default_rng(1)
+    names = ['squat', 'pushup', 'lunge']
+    angles = [_angle_sequence(rng, 90) for _ in names]
+    detectors = [ExerciseDetector(name) for name in names]
+
+    # Uneven chunks per session, including empty ones, so phase changes straddle call boundaries
+    splits = [np.sort(rng.integers(0, 91, 12)) for _ in names]
+    for chunk in range(13):
+        frames = []
+        for session, bounds in zip(angles, splits):
+            start = bounds[chunk - 1] if chunk else 0
+            stop = bounds[chunk] if chunk < len(bounds) else len(session)
+            frames.append(poses(session[start:stop]))
+        analyze_sessions(detectors, frames)
+
+    for detector, name, session in zip(detectors, names, angles):
+        _, completed, final = reference_reps(session, EXERCISES[name].rep_range)
+        assert detector.rep_count == sum(completed)
+        assert detector.current_phase == ('down' if final else 'up')
@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.pose import inference_executor
+from app.pose.detector_pool import DetectorPool
+
+
+class RecordingDetector:
+    """PoseDetector stand-in recording whether each frame was detected with ROI tracking."""
+
+    def __init__(self):
+        self.roi_tracking = False
+        self.tracked = []
+        self.resets = 0
+
+    def set_model_complexity(self, model_complexity):
+        pass
+
+    def detect_landmarks(self, image):
+        self.tracked.append(self.roi_tracking)
+        return np.zeros((33, 4), dtype=np.float32)
+
+    def reset_tracking(self):
+        self.resets += 1
+
+    def release(self):
+        pass
+
+
+def test_ordered_frames_are_tracked_within_their_batch_only(monkeypatch):
+    detector = RecordingDetector()
+    monkeypatch.setattr(inference_executor, '_worker_pool', DetectorPool(size=1, factory=lambda: detector))
+    images = [np.zeros((8, 8, 3), dtype=np.uint8)] * 3
+
+    results = inference_executor.detect_frames(images, track=True)
+    assert len(results) == 3
+    assert detector.tracked == [True, True, True]
+    assert detector.resets == 2  # Nothing carries over from or into other checkouts
+    assert detector.roi_tracking is False
+
+    inference_executor.detect_frames(images)
+    assert detector.tracked[3:] == [False, False, False]
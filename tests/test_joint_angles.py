@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from app.pose.joint_angles import BODY_JOINTS, AngleTable, joint_angles
+
+
+def reference_angle(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> float:
+    """The per-triple calculation the batched kernel replaced."""
+    ba = a - b
+    bc = c - b
+    cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
+    return np.degrees(np.arccos(np.clip(cosine_angle, -1.0, 1.0)))
+
+
+@pytest.mark.parametrize('dims', [2, 3])
+def test_batched_angles_match_the_per_triple_calculation(dims):
+    landmarks = np.random.default_rng(0).uniform(0, 1, (50, 33, 4))
+    table = AngleTable(BODY_JOINTS)
+
+    angles = joint_angles(landmarks, table, dims=dims)
+
+    assert angles.shape == (50, len(BODY_JOINTS))
+    expected = [[reference_angle(frame[a, :dims], frame[b, :dims], frame[c, :dims])
+                 for a, b, c in BODY_JOINTS.values()] for frame in landmarks]
+    np.testing.assert_allclose(angles, expected, atol=1e-6)
+    np.testing.assert_allclose(joint_angles(landmarks[7], table, dims=dims), expected[7], atol=1e-6)
+
+
+def test_known_angles_and_degenerate_points():
+    table = AngleTable({'corner': (0, 1, 2)})
+    points = np.zeros((33, 2))
+    points[0], points[1], points[2] = (1, 0), (0, 0), (0, 1)
+    assert joint_angles(points, table)[0] == pytest.approx(90.0)
+    points[2] = (-1, 0)
+    assert joint_angles(points, table)[0] == pytest.approx(180.0, abs=0.1)  # The 1e-6 guard shifts arccos(-1)
+    points[0] = points[1]  # Coincident points give a finite angle, not NaN
+    assert np.isfinite(joint_angles(points, table)[0])
+
+
+def test_triples_must_have_three_indices():
+    with pytest.raises(ValueError):
+        AngleTable({'bad': (0, 1)})
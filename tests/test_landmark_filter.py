@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.pose.landmark_filter import OneEuroFilter
+
+
+class ScalarOneEuro:
+    """The textbook per-coordinate One Euro filter (Casiez et al.) the batched filter follows."""
+
+    def __init__(self, min_cutoff, beta, d_cutoff):
+        self.min_cutoff, self.beta, self.d_cutoff = min_cutoff, beta, d_cutoff
+        self.value = self.derivative = self.timestamp = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        return 1.0 / (1.0 + 1.0 / (2 * math.pi * cutoff * dt))
+
+    def __call__(self, value, timestamp):
+        if self.value is None:
+            self.value, self.derivative, self.timestamp = value, 0.0, timestamp
+            return value
+        dt = timestamp - self.timestamp
+        derivative = (value - self.value) / dt
+        self.derivative += self._alpha(self.d_cutoff, dt) * (derivative - self.derivative)
+        cutoff = self.min_cutoff + self.beta * abs(self.derivative)
+        self.value += self._alpha(cutoff, dt) * (value - self.value)
+        self.timestamp = timestamp
+        return self.value
+
+
+def _pose(x, y=0.5, visibility=1.0):
+    landmarks = np.zeros((33, 3), dtype=np.float32)
+    landmarks[:, 0] = x
+    landmarks[:, 1] = y + np.linspace(0, 0.3, 33)
+    landmarks[:, 2] = visibility
+    return landmarks
+
+
+def test_one_dimensional_motion_matches_the_scalar_filter():
+    rng = np.random.default_rng(0)
+    smoother = OneEuroFilter(min_cutoff=1.0, beta=5.0, d_cutoff=1.0)
+    reference = ScalarOneEuro(1.0, 5.0, 1.0)
+
+    # Uneven frame times, a slow drift, a fast swing and detector jitter; y stays put so speed is |dx/dt|
+    timestamps = np.cumsum(rng.uniform(1 / 60, 1 / 20, 120))
+    xs = 0.5 + 0.2 * np.sin(timestamps * 3) ** 3 + rng.normal(0, 0.005, len(timestamps))
+    for timestamp, x in zip(timestamps, xs):
+        x = float(np.float32(x))
+        output = smoother(_pose(x), timestamp)
+        assert output[:, 0] == pytest.approx(reference(x, timestamp), abs=1e-6)
+        np.testing.assert_allclose(output[:, 1], _pose(x)[:, 1], atol=1e-6)
+
+
+def test_constant_pose_converges_to_it():
+    smoother = OneEuroFilter()
+    smoother(_pose(0.2), 0.0)
+    for frame in range(1, 91):
+        output = smoother(_pose(0.6), frame / 30)
+    np.testing.assert_allclose(output[:, :2], _pose(0.6)[:, :2], atol=1e-4)
+
+
+def test_repeated_timestamp_returns_the_previous_filtered_pose():
+    smoother = OneEuroFilter()
+    smoother(_pose(0.2), 0.0)
+    filtered = smoother(_pose(0.4), 1 / 30).copy()
+    assert 0.2 < filtered[0, 0] < 0.4
+
+    for timestamp in (1 / 30, 0.0):  # Repeated, then earlier
+        output = smoother(_pose(0.9), timestamp)
+        np.testing.assert_array_equal(output, filtered)
+
+    # The ignored frames leave no trace in the filter state
+    following = OneEuroFilter()
+    following(_pose(0.2), 0.0)
+    following(_pose(0.4), 1 / 30)
+    np.testing.assert_array_equal(smoother(_pose(0.5), 2 / 30), following(_pose(0.5), 2 / 30))
+
+
+def test_dropout_is_extrapolated_within_max_gap_then_resets():
+    smoother = OneEuroFilter(max_gap=0.2)
+    for frame in range(30):
+        smoother(_pose(0.2 + 0.01 * frame), frame / 30)  # 0.3 units per second
+    last = smoother(_pose(0.5), 1.0)
+    position, velocity = last[0, 0], smoother._velocity[0, 0]
+    assert velocity > 0
+
+    predicted = smoother(None, 1.1)
+    assert predicted[0, 0] == pytest.approx(position + velocity * 0.1, abs=1e-6)
+    assert predicted[0, 2] == pytest.approx(1.0)
+    assert smoother.interpolated == 1
+
+    assert smoother(None, 1.25) is None  # 0.25 s since the last detection
+    # Reset: the next detection is taken as is instead of blended with the stale pose
+    np.testing.assert_array_equal(smoother(_pose(0.1), 1.3), _pose(0.1))
+
+
+def test_occluded_landmarks_hold_their_position():
+    smoother = OneEuroFilter(min_visibility=0.5)
+    smoother(_pose(0.2), 0.0)
+    hidden = _pose(0.8)
+    hidden[:10, 2] = 0.0
+
+    output = smoother(hidden, 1 / 30)
+
+    np.testing.assert_allclose(output[:10, 0], 0.2, atol=1e-6)
+    assert np.all(output[10:, 0] > 0.2)
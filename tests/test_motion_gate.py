@@ -0,0 +1,30 @@
+import numpy as np
+
+from app.pose.motion_gate import MotionGate
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def test_still_frames_reuse_the_last_landmarks():
+    gate = MotionGate(threshold=2.0, max_skip=5)
+    landmarks = np.ones((33, 4), dtype=np.float32)
+    assert gate.check(_frame(0)) == (True, None)
+    gate.record(landmarks)
+
+    infer, reused = gate.check(_frame(1))
+    assert not infer
+    np.testing.assert_array_equal(reused, landmarks)
+
+
+def test_failed_inference_keeps_the_reference_of_the_recorded_landmarks():
+    gate = MotionGate(threshold=2.0, max_skip=5)
+    gate.check(_frame(0))
+    gate.record(np.ones((33, 4), dtype=np.float32))
+
+    assert gate.check(_frame(100))[0]  # Moved; inference then fails and nothing is recorded
+    # A frame like the failed one must not get the landmarks of the frame at 0
+    assert gate.check(_frame(101))[0]
+    # Frames still like the recorded one may reuse them
+    assert not gate.check(_frame(1))[0]
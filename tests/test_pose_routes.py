@@ -0,0 +1,13 @@
+import pytest
+
+from app.routes import pose_routes
+
+
+@pytest.mark.parametrize('message, error', [
+    ({"image_bytes": "abc"}, "Invalid image data"),  # Looks like the old binary-frame tag
+    ({"image_base64": ["abc"]}, "Invalid image data"),
+    (pose_routes._BinaryFrame(b"not an image"), "Invalid image data"),
+    (["abc"], "Frame messages must be JSON objects"),
+])
+def test_malformed_stream_frames_get_an_error_frame(message, error):
+    assert pose_routes._analyze_stream_frame(None, None, None, None, message) == {"error": error}
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app.pose.pose_comparator import PoseComparator
+
+
+def _references(count, rng):
+    # A few base poses with per-reference joint jitter, like recorded exercise phases
+    bases = rng.random((8, 33, 3))
+    poses = bases[rng.integers(0, len(bases), count)] + rng.normal(0, 0.03, (count, 33, 3))
+    poses[..., 2] = rng.uniform(0.5, 1.0, (count, 33))
+    return poses
+
+
+def brute_force(comparator, references, pose, k):
+    """The full scan the KD-tree search replaced: score every reference, keep the k best."""
+    similarity = np.array([comparator.calculate_pose_similarity(reference, pose) for reference in references])
+    order = np.argsort(-similarity, kind='stable')[:k]
+    angles = comparator.calculate_joint_angles(pose)
+    return [{
+        'index': int(i),
+        'similarity': similarity[i],
+        'angle_differences': {name: abs(value - angles[name])
+                              for name, value in comparator.calculate_joint_angles(references[i]).items()},
+    } for i in order]
+
+
+def _assert_same_matches(matches, expected):
+    assert [match['index'] for match in matches] == [match['index'] for match in expected]
+    for match, reference in zip(matches, expected):
+        assert match['similarity'] == pytest.approx(reference['similarity'], abs=1e-9)
+        assert match['angle_differences'] == pytest.approx(reference['angle_differences'], abs=1e-6)
+
+
+def test_exhaustive_candidates_match_the_full_scan():
+    rng = np.random.default_rng(0)
+    references = _references(300, rng)
+    comparator = PoseComparator()
+    comparator.reference_library.add(references)
+
+    for pose in rng.random((10, 33, 3)):
+        matches = comparator.reference_library.query(pose, k=5, candidates=len(references))
+        _assert_same_matches(matches, brute_force(comparator, references, pose, 5))
+
+
+def test_default_candidates_match_the_full_scan_near_references():
+    rng = np.random.default_rng(1)
+    references = _references(1200, rng)
+    comparator = PoseComparator()
+    comparator.reference_library.add(references[:900])
+    comparator.reference_library.add(references[900:])  # The index is rebuilt after adding
+
+    probes = references[rng.integers(0, len(references), 15)] + rng.normal(0, 0.01, (15, 33, 3))
+    for pose in probes:
+        _assert_same_matches(comparator.match_references(pose, k=5), brute_force(comparator, references, pose, 5))
+
+
+def test_libraries_smaller_than_k_return_every_reference():
+    rng = np.random.default_rng(2)
+    references = _references(3, rng)
+    comparator = PoseComparator()
+    comparator.reference_library.add(references, labels=['up', 'down', 'up'])
+
+    matches = comparator.match_references(references[1], k=5)
+    _assert_same_matches(matches, brute_force(comparator, references, references[1], 5))
+    assert matches[0]['label'] == 'down'
+    assert matches[0]['similarity'] == pytest.approx(1.0)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.pose.rep_dtw import RepLibrary, rep_features
+
+
+def _rep(rng, base, frames):
+    """A rep following one of a few base motions, with its own speed and joint jitter."""
+    phase = np.linspace(0, 1, frames) ** rng.uniform(0.7, 1.4)
+    poses = base[0] + np.sin(np.pi * phase)[:, None, None] * base[1] + rng.normal(0, 0.02, (frames, 33, 3))
+    poses[..., 2] = 1.0
+    return poses
+
+
+def full_dtw(query: np.ndarray, reference: np.ndarray, band: int) -> float:
+    """The exhaustive banded DTW the pruned search replaced, without bounds or early abandoning."""
+    length = len(query)
+    accumulated = np.full((length + 1, length + 1), np.inf)
+    accumulated[0, 0] = 0.0
+    for i in range(1, length + 1):
+        for j in range(max(1, i - band), min(length, i + band) + 1):
+            cost = np.linalg.norm(query[i - 1] - reference[j - 1], axis=-1).sum()
+            accumulated[i, j] = cost + min(accumulated[i - 1, j - 1], accumulated[i - 1, j], accumulated[i, j - 1])
+    return accumulated[length, length]
+
+
+def test_pruned_matches_equal_the_exhaustive_search():
+    rng = np.random.default_rng(0)
+    bases = [(rng.random((33, 3)), rng.normal(0, 0.2, (33, 3))) for _ in range(4)]
+    library = RepLibrary(length=24)
+    reps = [_rep(rng, bases[rng.integers(0, len(bases))], rng.integers(20, 60)) for _ in range(120)]
+    for number, rep in enumerate(reps):
+        library.add(rep, label=f"rep-{number}")
+    scale = library.length * len(library.landmarks)
+    references = [rep_features(rep, library.length).astype(np.float32) for rep in reps]
+
+    for base in bases[:3]:
+        rep = _rep(rng, base, 45)
+        query = rep_features(rep, library.length).astype(np.float32)
+        distances = np.array([full_dtw(query, reference, library.band) for reference in references]) / scale
+        expected = np.argsort(distances, kind='stable')[:5]
+
+        matches = library.match(rep, k=5, chunk=8)
+
+        assert [match['index'] for match in matches] == expected.tolist()
+        assert [match['label'] for match in matches] == [f"rep-{i}" for i in expected]
+        assert [match['distance'] for match in matches] == pytest.approx(distances[expected].tolist(), rel=1e-5)
+        # The bounds must actually have skipped work for the comparison to cover them
+        assert library.last_stats['lb_pruned'] + library.last_stats['abandoned'] > 0
+
+
+def test_library_smaller_than_k_returns_every_rep_in_distance_order():
+    rng = np.random.default_rng(1)
+    base = (rng.random((33, 3)), rng.normal(0, 0.2, (33, 3)))
+    library = RepLibrary(length=16)
+    reps = [_rep(rng, base, frames) for frames in (18, 30)]
+    for rep in reps:
+        library.add(rep)
+
+    matches = library.match(reps[1], k=3)
+
+    assert [match['index'] for match in matches] == [1, 0]
+    assert matches[0]['distance'] == pytest.approx(0.0, abs=1e-6)
+    assert matches[0]['similarity'] == pytest.approx(1.0)
+    assert library.last_stats['computed'] == 2
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from app.services.rep_writer import RepWriteBehind, _encode_rows, _read_segment, _try_lock
+
+
+class FakeDatabase:
+    """write_rows stand-in with a unique record_id that rejects batches holding a bad rep, or everything while down."""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.down = False
+        self.lost_acknowledgements = 0  # Writes that commit but then fail as if the connection dropped
+        self.rows = []
+        self.lock = threading.Lock()
+
+    def write_rows(self, rows, replay):
+        with self.lock:
+            if self.down:
+                raise ConnectionError("database is down")
+            if any(row["rep_number"] in self.bad for row in rows):
+                raise ValueError("value out of range")
+            stored = {row.get("record_id") for row in self.rows} - {None}
+            if replay:
+                rows = [row for row in rows if row.get("record_id") not in stored]
+            elif any(row.get("record_id") in stored for row in rows):
+                raise ValueError("duplicate key value violates unique constraint")
+            self.rows.extend(rows)
+            if self.lost_acknowledgements:
+                self.lost_acknowledgements -= 1
+                raise ConnectionError("server closed the connection unexpectedly")
+
+    def rep_numbers(self):
+        with self.lock:
+            return sorted(row["rep_number"] for row in self.rows)
+
+
+def _rows(numbers):
+    return [{"session_id": 1, "rep_number": number, "timestamp": datetime(2024, 5, 1), "correctness": 1.0,
+             "feedback": "", "landmarks": []} for number in numbers]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def writer_for(tmp_path):
+    writers = []
+
+    def make(database, **kwargs):
+        writer = RepWriteBehind(database.write_rows, log_dir=str(tmp_path), max_lag=0.05, **kwargs)
+        writer.start()
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.stop()
+
+
+def test_rejected_row_is_dead_lettered_and_the_rest_committed(writer_for):
+    database = FakeDatabase(bad={7})
+    writer = writer_for(database)
+    writer.append(_rows(range(1, 21)))
+
+    _wait_for(lambda: writer.stats()['buffer_depth'] == 0)
+    assert database.rep_numbers() == [number for number in range(1, 21) if number != 7]
+    assert writer.stats()['dead_lettered'] == 1
+    assert writer.stats()['flushed'] == 19
+
+    # Later reps are no longer blocked
+    writer.append(_rows([21]))
+    _wait_for(lambda: 21 in database.rep_numbers())
+    dead_letters = [name for name in os.listdir(writer._directory) if name.startswith("dead-letter-")]
+    assert [row["rep_number"] for row in _read_segment(os.path.join(writer._directory, dead_letters[0]))] == [7]
+
+
+def test_outage_keeps_every_row_for_retry(writer_for):
+    database = FakeDatabase()
+    database.down = True
+    writer = writer_for(database)
+    writer.append(_rows(range(1, 17)))
+
+    _wait_for(lambda: writer.stats()['flush_failures'] >= 3)
+    assert writer.stats()['dead_lettered'] == 0
+    assert writer.stats()['buffer_depth'] == 16
+
+    database.down = False
+    _wait_for(lambda: writer.stats()['buffer_depth'] == 0)
+    assert database.rep_numbers() == list(range(1, 17))
+    assert len({row["record_id"] for row in database.rows}) == 16
+
+
+def _leave_segment(directory, numbers):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "segment-000000000000.log"), 'wb') as file:
+        file.write(_encode_rows(_rows(numbers)))
+
+
+def test_segments_of_directories_no_worker_holds_are_replayed(tmp_path, writer_for):
+    # Left by workers 2 and 3 before a restart with fewer workers; worker 4 is still running
+    _leave_segment(tmp_path / "worker-2", [1, 2])
+    _leave_segment(tmp_path / "worker-3", [3])
+    _leave_segment(tmp_path / "worker-4", [4])
+    running = open(tmp_path / "worker-4" / "lock", 'a+b')
+    assert _try_lock(running)
+
+    database = FakeDatabase()
+    writer = writer_for(database)
+    assert writer._directory == str(tmp_path / "worker-0")
+    _wait_for(lambda: database.rep_numbers() == [1, 2, 3])
+
+    def released(directory):
+        with open(directory / "lock", 'a+b') as lock:
+            return _try_lock(lock)
+
+    # Adopted directories are emptied and released once their rows are committed
+    _wait_for(lambda: released(tmp_path / "worker-2") and released(tmp_path / "worker-3"))
+    assert not [name for name in os.listdir(tmp_path / "worker-2") if name.startswith("segment-")]
+    assert sorted(os.listdir(tmp_path / "worker-4")) == ["lock", "segment-000000000000.log"]
+    running.close()
+
+
+def test_retry_after_an_unacknowledged_commit_skips_committed_rows(writer_for):
+    database = FakeDatabase()
+    database.lost_acknowledgements = 2  # The retry fails the same way and is bisected
+    writer = writer_for(database)
+    writer.append(_rows(range(1, 9)))
+
+    _wait_for(lambda: writer.stats()['buffer_depth'] == 0 and writer.stats()['flush_failures'] == 2)
+    writer.append(_rows([9]))
+    _wait_for(lambda: 9 in database.rep_numbers())
+    assert database.rep_numbers() == list(range(1, 10))
+    assert writer.stats()['dead_lettered'] == 0
+
+
+def test_stop_leaves_the_log_to_a_flusher_still_writing(tmp_path):
+    entered, release = threading.Event(), threading.Event()
+    database = FakeDatabase()
+
+    def slow_write(rows, replay):
+        entered.set()
+        release.wait()
+        database.write_rows(rows, replay)
+
+    writer = RepWriteBehind(slow_write, log_dir=str(tmp_path), max_lag=0.05)
+    writer.start()
+    writer.append(_rows([1]))
+    assert entered.wait(5)
+
+    writer.stop(timeout=0.05)
+    assert writer._file is not None  # Not closed under the flusher
+
+    release.set()
+    _wait_for(lambda: writer._file is None)
+    assert database.rep_numbers() == [1]
+    with open(tmp_path / "worker-0" / "lock", 'a+b') as lock:
+        assert _try_lock(lock)
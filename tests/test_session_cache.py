@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from app.pose.session_cache import ExerciseSessionCache, SessionExpired
+from app.pose.session_store import InProcessStore, SessionStoreBusy
+
+
+class _SharedStore(InProcessStore):
+    shared = True
+
+
+class _ConflictingStore(_SharedStore):
+    def compare_and_set(self, key, value, version):
+        return None
+
+
+def _frames(count: int = 2) -> np.ndarray:
+    frames = np.zeros((count, 33, 4), dtype=np.float32)
+    frames[..., 2] = 1.0
+    return frames
+
+
+@pytest.mark.parametrize('store', [InProcessStore(), _SharedStore()], ids=['local', 'shared'])
+def test_known_session_without_state_is_not_started_anew(store):
+    cache = ExerciseSessionCache(store=store)
+    cache.analyze("1", "squat", _frames(), owner=7)
+    assert cache.owner("1") == (True, 7)
+
+    cache.end("1")  # Ends between the route's owner() check and analyze()
+    with pytest.raises(SessionExpired):
+        cache.analyze("1", None, _frames(), owner=7)
+    assert cache.owner("1") == (False, None)
+
+
+def test_shared_analysis_gives_up_after_max_attempts():
+    cache = ExerciseSessionCache(store=_ConflictingStore(), max_attempts=3)
+    with pytest.raises(SessionStoreBusy):
+        cache.analyze("1", "squat", _frames(), owner=7)
+    assert cache.conflicts == 3
@@ -0,0 +1,147 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from app.pose.session_store import InProcessStore, RespStore, SessionStoreBusy, SharedMemoryStore
+from benchmarks.bench_session_store import RespStandIn
+
+TTL = 0.3
+
+
+@pytest.fixture
+def shared_memory_store(tmp_path):
+    store = SharedMemoryStore(name=f"fittrack-test-{uuid.uuid4().hex[:12]}", slots=64, ttl=TTL,
+                              lock_path=str(tmp_path / "store.lock"))
+    yield store
+    store.unlink()
+    store.close()
+
+
+@pytest.fixture
+def resp_server():
+    server = RespStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['memory', 'shared_memory', 'redis'])
+def store(request):
+    if request.param == 'memory':
+        store = InProcessStore(ttl=TTL)
+    elif request.param == 'shared_memory':
+        store = request.getfixturevalue('shared_memory_store')
+    else:
+        store = RespStore(request.getfixturevalue('resp_server').url, ttl=TTL)
+    yield store
+    if request.param == 'redis':
+        store.close()
+
+
+def test_create_read_update(store):
+    assert store.get("a") is None
+    first = store.compare_and_set("a", b"one", 0)
+    assert first is not None
+    assert store.get("a") == (b"one", first)
+
+    second = store.compare_and_set("a", b"two", first)
+    assert second is not None and second != first
+    assert store.get("a") == (b"two", second)
+
+
+def test_conflicting_writes_fail(store):
+    first = store.compare_and_set("a", b"one", 0)
+    second = store.compare_and_set("a", b"two", first)
+
+    assert store.compare_and_set("a", b"stale", first) is None
+    assert store.compare_and_set("a", b"recreate", 0) is None
+    assert store.get("a") == (b"two", second)
+
+
+def test_delete_then_recreate_rejects_stale_version(store):
+    stale = store.compare_and_set("a", b"one", 0)
+    store.delete("a")
+    assert store.get("a") is None
+    assert store.compare_and_set("a", b"stale", stale) is None
+
+    recreated = store.compare_and_set("a", b"two", 0)
+    assert recreated is not None and recreated != stale
+    assert store.compare_and_set("a", b"stale", stale) is None
+    assert store.get("a") == (b"two", recreated)
+
+
+def test_expired_value_is_absent_and_recreatable(store):
+    expired = store.compare_and_set("a", b"one", 0)
+    time.sleep(TTL * 2)
+
+    assert store.get("a") is None
+    assert store.compare_and_set("a", b"stale", expired) is None
+    assert store.compare_and_set("a", b"two", 0) is not None
+    assert store.get("a")[0] == b"two"
+
+
+def test_concurrent_increments_are_not_lost(store):
+    def increment(times):
+        for _ in range(times):
+            while True:
+                current = store.get("counter")
+                value, version = current if current is not None else (b"0", 0)
+                if store.compare_and_set("counter", str(int(value) + 1).encode(), version) is not None:
+                    break
+
+    threads = [threading.Thread(target=increment, args=(100,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get("counter")[0] == b"400"
+
+
+def test_shared_memory_reads_are_never_torn(shared_memory_store):
+    stop = threading.Event()
+
+    def write():
+        version, size = shared_memory_store.compare_and_set("a", b"\x00", 0), 1
+        while not stop.is_set():
+            size = size % shared_memory_store.value_size + 1
+            version = shared_memory_store.compare_and_set("a", bytes([size % 256]) * size, version)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            value, _ = shared_memory_store.get("a") or (b"\x01", 0)
+            assert value == bytes([len(value) % 256]) * len(value)
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_shared_memory_repairs_slot_of_dead_writer(shared_memory_store):
+    shared_memory_store.compare_and_set("a", b"one", 0)
+    slot = shared_memory_store._find(shared_memory_store._hash("a"))
+    shared_memory_store._versions[slot] += 1  # A writer died between its two version bumps
+
+    start = time.monotonic()
+    assert shared_memory_store.get("a") is None  # The torn value is dropped
+    assert time.monotonic() - start < 1.0
+    assert shared_memory_store.repairs == 1
+    assert int(shared_memory_store._versions[slot]) % 2 == 0
+
+    assert shared_memory_store.compare_and_set("a", b"two", 0) is not None
+    assert shared_memory_store.get("a")[0] == b"two"
+
+
+def test_shared_memory_read_gives_up_while_slot_keeps_changing(shared_memory_store):
+    shared_memory_store.compare_and_set("a", b"one", 0)
+    slot = shared_memory_store._find(shared_memory_store._hash("a"))
+    shared_memory_store._repair = lambda slot: None  # Nothing can fix the odd version
+    shared_memory_store._versions[slot] += 1
+
+    with pytest.raises(SessionStoreBusy):
+        shared_memory_store.get("a")